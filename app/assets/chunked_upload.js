@@ -0,0 +1,130 @@
+// Streams files dropped on a .chunked-upload zone to /upload in fixed-size chunks. Each chunk is sent
+// from the offset the server reports, so a failed request resumes instead of restarting the file.
+(function () {
+    const maxAttempts = 5;
+    const stagedUploads = {};
+
+    function uploadZone(element) {
+        return element.closest ? element.closest('.chunked-upload') : null;
+    }
+
+    function isDisabled(zone) {
+        return zone.classList.contains('disabled');
+    }
+
+    function newUploadId() {
+        if (window.crypto && window.crypto.randomUUID) {
+            return window.crypto.randomUUID();
+        }
+        return Date.now().toString(36) + Math.random().toString(36).slice(2);
+    }
+
+    async function fetchJson(url, options) {
+        for (let attempt = 1; ; attempt++) {
+            let response = null;
+            try {
+                response = await fetch(url, options);
+            } catch (error) {
+                if (attempt === maxAttempts) {
+                    throw error;
+                }
+            }
+
+            if (response && response.ok) {
+                return await response.json();
+            }
+            if (response && (response.status < 500 || attempt === maxAttempts)) {
+                throw new Error(`${response.status} ${response.statusText}`);
+            }
+            await new Promise(resolve => setTimeout(resolve, 500 * 2 ** attempt));
+        }
+    }
+
+    // Uploads belong to the session that started them, which the server checks on every request
+    function sessionHeaders() {
+        return {'X-Session-Id': JSON.parse(sessionStorage.getItem('navbar_navbar__session_id__store')) || ''};
+    }
+
+    async function uploadFile(url, file, chunkSize, onProgress) {
+        const headers = sessionHeaders();
+        let received = (await fetchJson(url, {headers: headers})).received;
+
+        do {
+            const query = new URLSearchParams({offset: received, size: file.size, filename: file.name});
+            const chunk = file.slice(received, received + chunkSize);
+            received = (await fetchJson(`${url}?${query}`, {method: 'PUT', headers: headers, body: chunk})).received;
+            onProgress(received);
+        } while (received < file.size);
+    }
+
+    async function upload(zone, files) {
+        if (files.length === 0 || isDisabled(zone)) {
+            return;
+        }
+
+        const container = zone.parentElement;
+        const progress = container.querySelector('progress');
+        const chunkSize = Number(zone.dataset.chunkSize);
+        const uploadId = newUploadId();
+        const staged = {upload_id: uploadId, filenames: files.map(file => file.name)};
+
+        zone.classList.add('disabled');
+        progress.max = Math.max(files.reduce((total, file) => total + file.size, 0), 1);
+        progress.value = 0;
+        progress.hidden = false;
+
+        try {
+            let uploadedBytes = 0;
+            for (const [fileIndex, file] of files.entries()) {
+                await uploadFile(`upload/${uploadId}/${fileIndex}`, file, chunkSize, received => {
+                    progress.value = uploadedBytes + received;
+                });
+                uploadedBytes += file.size;
+            }
+        } catch (error) {
+            staged.error = `Upload failed: ${error.message}`;
+        }
+
+        stagedUploads[zone.id] = staged;
+        progress.hidden = true;
+        zone.classList.remove('disabled');
+
+        // Clicking the hidden button hands the staged upload over to the Dash callbacks
+        container.querySelector('button').click();
+    }
+
+    document.addEventListener('click', event => {
+        const zone = uploadZone(event.target);
+        if (!zone || isDisabled(zone)) {
+            return;
+        }
+
+        const input = document.createElement('input');
+        input.type = 'file';
+        input.multiple = true;
+        input.addEventListener('change', () => upload(zone, Array.from(input.files)));
+        input.click();
+    });
+
+    document.addEventListener('dragover', event => {
+        if (uploadZone(event.target)) {
+            event.preventDefault();
+        }
+    });
+
+    document.addEventListener('drop', event => {
+        const zone = uploadZone(event.target);
+        if (zone) {
+            event.preventDefault();
+            upload(zone, Array.from(event.dataTransfer.files));
+        }
+    });
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        uploads: {
+            staged_upload: function (n_clicks, zone_id) {
+                return stagedUploads[zone_id] || window.dash_clientside.no_update;
+            },
+        },
+    });
+})();
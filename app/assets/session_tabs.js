@@ -0,0 +1,51 @@
+// The session id is kept in the tab's session storage, which a duplicated tab copies. Every open tab
+// holds its session id in local storage, so a tab that loads with an id another live tab still holds
+// drops it before the session store reads it, and is given a new session instead of sharing the other's.
+(function () {
+    const storeKey = 'navbar_navbar__session_id__store';
+    const heartbeatMs = 1000;
+    const tabId = Date.now().toString(36) + Math.random().toString(36).slice(2);
+
+    function holderKey(sessionId) {
+        return 'vcf_observer_session_tab:' + sessionId;
+    }
+
+    function readJson(storage, key) {
+        try {
+            return JSON.parse(storage.getItem(key));
+        } catch (error) {
+            return null;
+        }
+    }
+
+    function heldByAnotherTab(sessionId) {
+        const holder = readJson(localStorage, holderKey(sessionId));
+        return holder !== null && holder.tab !== tabId && Date.now() - holder.time < 3 * heartbeatMs;
+    }
+
+    function hold() {
+        const sessionId = readJson(sessionStorage, storeKey);
+        if (sessionId !== null) {
+            localStorage.setItem(holderKey(sessionId), JSON.stringify({tab: tabId, time: Date.now()}));
+        }
+    }
+
+    // A reload releases the id before the next page loads, so it keeps its session
+    function release() {
+        const sessionId = readJson(sessionStorage, storeKey);
+        if (sessionId !== null && !heldByAnotherTab(sessionId)) {
+            localStorage.removeItem(holderKey(sessionId));
+        }
+    }
+
+    const sessionId = readJson(sessionStorage, storeKey);
+    if (sessionId !== null && heldByAnotherTab(sessionId)) {
+        sessionStorage.removeItem(storeKey);
+        sessionStorage.removeItem(storeKey + '-timestamp');
+    }
+
+    hold();
+    setInterval(hold, heartbeatMs);
+    window.addEventListener('pagehide', release);
+    window.addEventListener('pageshow', hold);
+})();
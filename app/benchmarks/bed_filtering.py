@@ -0,0 +1,96 @@
+# Run from the app directory: python -m benchmarks.bed_filtering
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_regions, synthetic_variants
+from data.filtering import filter_vcf_with_bed
+from data.variants import normalise_chroms
+
+
+def sweep_single_chrom(vcf_df: pd.DataFrame, bed_df: pd.DataFrame, outside_regions: bool) -> pd.DataFrame:
+    mask = np.zeros(len(vcf_df), dtype=bool)
+
+    positions = vcf_df['POS'].to_numpy() - 1
+    region_starts = bed_df['START'].to_numpy()
+    region_ends = bed_df['END'].to_numpy()
+
+    current_variant_index = 0
+    current_region_index = 0
+    while current_variant_index < len(vcf_df) and current_region_index < len(bed_df):
+        current_pos = positions[current_variant_index]
+
+        if current_pos < region_starts[current_region_index]:
+            current_variant_index += 1
+        elif current_pos < region_ends[current_region_index]:
+            mask[current_variant_index] = True
+            current_variant_index += 1
+        else:
+            current_region_index += 1
+
+    return vcf_df[~mask if outside_regions else mask]
+
+
+def sweep_filter(vcf_df: pd.DataFrame, bed_df: pd.DataFrame, outside_regions: bool) -> pd.DataFrame:
+    filtered_data = []
+    to_be_calculated_vcf_dfs = []
+    to_be_calculated_bed_dfs = []
+    region_groupings = bed_df.groupby('CHROM')
+
+    for chrom, variants in vcf_df.groupby('CHROM'):
+        if chrom in region_groupings.groups:
+            current_regions = region_groupings.get_group(chrom)
+
+            for _, variants_of_file in variants.groupby('FILENAME'):
+                to_be_calculated_vcf_dfs.append(variants_of_file)
+                to_be_calculated_bed_dfs.append(current_regions)
+        elif outside_regions:
+            filtered_data.append(variants)
+
+    with ProcessPoolExecutor() as executor:
+        filtered_data += list(executor.map(
+            sweep_single_chrom,
+            to_be_calculated_vcf_dfs,
+            to_be_calculated_bed_dfs,
+            repeat(outside_regions, len(to_be_calculated_vcf_dfs))
+        ))
+
+    return pd.concat(filtered_data)
+
+
+def timed(function, *args) -> (float, pd.DataFrame):
+    start_time = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start_time, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BED region filtering: per-chromosome sweep vs binary search.')
+    parser.add_argument('--variants', type=int, default=1_000_000)
+    parser.add_argument('--files', type=int, default=4)
+    parser.add_argument('--regions', type=int, nargs='+', default=[200_000, 2_000_000])
+    args = parser.parse_args()
+
+    vcf_df = synthetic_variants(args.variants)[['CHROM', 'POS', 'REF', 'ALT']]
+    vcf_df['CHROM'] = normalise_chroms(vcf_df['CHROM'])
+    vcf_df['FILENAME'] = [f'sample_{i}.vcf' for i in np.arange(args.variants) % args.files]
+    vcf_df = vcf_df.sort_values(by=['FILENAME', 'CHROM', 'POS'], ignore_index=True)
+
+    print(f'{"regions":>10} {"kept":>9} {"sweep":>9} {"vectorised":>11} {"speed-up":>9}')
+    for no_of_regions in args.regions:
+        bed_df = synthetic_regions(no_of_regions)
+
+        before, before_df = timed(sweep_filter, vcf_df, bed_df, False)
+        after, after_df = timed(filter_vcf_with_bed, vcf_df, bed_df, False)
+
+        assert before_df.index.sort_values().equals(after_df.index)
+
+        print(f'{no_of_regions:>10} {len(after_df):>9} {before:>8.2f}s {after:>10.3f}s {before / after:>8.0f}x')
+
+
+if __name__ == '__main__':
+    main()
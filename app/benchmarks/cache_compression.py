@@ -0,0 +1,87 @@
+# Run from the app directory: python -m benchmarks.cache_compression
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.session_store import session_dataset
+from data import store
+from data.store_backends import FileSessionBackend
+
+entry_configurations = [
+    ('arrow', None, False),
+    ('arrow', None, True),
+    ('arrow', 'lz4', True),
+    ('arrow', 'zstd', True),
+    ('pickle', None, False),
+    ('pickle', 'lz4', False),
+    ('pickle', 'zstd', False),
+]
+
+
+def entry_round_trip(df: pd.DataFrame, columns: list = None) -> (float, float, int):
+    start_time = time.perf_counter()
+    store.write_entry('benchmark', 'venn_sites_download', df)
+    write_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    store.read_entry('benchmark', 'venn_sites_download', columns)
+    read_time = time.perf_counter() - start_time
+
+    return write_time, read_time, os.path.getsize(store.session_backend.open_entry('benchmark', store._get_entry_name('venn_sites_download')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Disk size and read cost of session store entries per codec.')
+    parser.add_argument('--variants', type=int, nargs='+', default=[1_000_000, 5_000_000])
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--disk-mb-per-s', type=float, default=200,
+                        help='read throughput of the cache disk, used to estimate reads that miss the page cache')
+    args = parser.parse_args()
+
+    # Every configuration goes through the store's own write and read path for one entry
+    default_entry = store.session_entries['venn_sites_download']
+    entry_type = default_entry[0]
+    default_dictionary_columns = store.dictionary_columns
+
+    with tempfile.TemporaryDirectory() as store_dir, tempfile.TemporaryDirectory() as stats_dir:
+        store.session_backend = FileSessionBackend(store_dir, stats_dir, store.STORE_CONFIG['STORE_DEFAULT_TIMEOUT'])
+
+        print(f'{"variants":>10} {"format":>7} {"codec":>6} {"dict":>5} {"columns":>9} {"size":>9} {"ratio":>6} '
+              f'{"write":>8} {"read":>8} {"cold read":>10}')
+        for no_of_variants in args.variants:
+            df = session_dataset(no_of_variants, args.files)
+            df['CHROM'] = df['CHROM'].astype(str).astype(object)
+            uncompressed_size = None
+
+            for entry_format, codec, dictionary_encoded in entry_configurations:
+                store.session_entries['venn_sites_download'] = (entry_type, entry_format, codec)
+                store.dictionary_columns = default_dictionary_columns if dictionary_encoded else ()
+
+                for columns in (None, ['FILENAME']) if entry_format == 'arrow' else (None,):
+                    results = [entry_round_trip(df, columns) for _ in range(args.repeats)]
+                    write_time = min(write for write, _, _ in results)
+                    read_time = min(read for _, read, _ in results)
+                    size = results[-1][2]
+                    uncompressed_size = uncompressed_size or size
+
+                    # Reads above are served from the page cache, so they measure the CPU spent decoding.
+                    # A cold read also pays for the whole file coming off disk, which projections avoid
+                    cold_read = ''
+                    if columns is None:
+                        cold_read = f'{read_time + size / (args.disk_mb_per_s * 2**20):.3f}s'
+
+                    label = 'all' if columns is None else ','.join(columns)
+                    print(f'{no_of_variants:>10} {entry_format:>7} {codec or "none":>6} {"yes" if dictionary_encoded else "no":>5} '
+                          f'{label:>9} {size / 2**20:>7.1f}MB {uncompressed_size / size:>5.1f}x '
+                          f'{write_time:>7.3f}s {read_time:>7.3f}s {cold_read:>10}')
+
+    store.session_entries['venn_sites_download'] = default_entry
+    store.dictionary_columns = default_dictionary_columns
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Run from the app directory: python -m benchmarks.jaccard
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from data.incidence import build_variant_incidence, group_variant_incidence
+from figures.clustergram import _jaccard_distances
+
+
+def synthetic_files(no_of_files: int, variants_per_file: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    shared_variants = rng.choice(2**40, variants_per_file * 4, replace=False).astype(np.uint64)
+
+    return pd.DataFrame({
+        'FILENAME': np.repeat([f'sample_{i}.vcf' for i in range(no_of_files)], variants_per_file),
+        'VID': np.concatenate([
+            rng.choice(shared_variants, variants_per_file, replace=False) for _ in range(no_of_files)
+        ]),
+    })
+
+
+def pairwise_sets_jaccard(sets: list, pairs: list) -> list:
+    distances = []
+    for i, j in pairs:
+        union_size = len(sets[i].union(sets[j]))
+        distances.append(len(sets[i].intersection(sets[j])) / union_size if union_size else 0.0)
+    return distances
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pairwise Jaccard distances: set operations vs one sparse product.')
+    parser.add_argument('--groups', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--variants-per-file', type=int, default=20_000)
+    parser.add_argument('--sampled-pairs', type=int, default=5_000)
+    args = parser.parse_args()
+
+    print(f'{"groups":>7} {"set pairs":>12} {"sparse product":>15} {"speed-up":>9}')
+    for no_of_groups in args.groups:
+        df = synthetic_files(no_of_groups, args.variants_per_file)
+        sets_files = [[filename] for filename in sorted(df['FILENAME'].unique())]
+        group_matrix = group_variant_incidence(build_variant_incidence(df), sets_files, 'union')
+
+        start_time = time.perf_counter()
+        after = _jaccard_distances(group_matrix)
+        after_time = time.perf_counter() - start_time
+
+        # Set operations scale with the square of the group count, so larger runs time a sample of pairs
+        sets = [set(group) for group in df.groupby('FILENAME', sort=True)['VID'].agg(list)]
+        pairs = [(i, j) for i in range(no_of_groups) for j in range(no_of_groups)]
+        sampled = len(pairs) > args.sampled_pairs
+        if sampled:
+            pairs = [pairs[k] for k in np.random.default_rng(0).choice(len(pairs), args.sampled_pairs, replace=False)]
+
+        start_time = time.perf_counter()
+        before = pairwise_sets_jaccard(sets, pairs)
+        before_time = (time.perf_counter() - start_time) * no_of_groups ** 2 / len(pairs)
+
+        assert before == [after[i, j] for i, j in pairs]
+
+        estimate_marker = '~' if sampled else ''
+        print(f'{no_of_groups:>7} {estimate_marker:>1}{before_time:>10.2f}s {after_time:>14.3f}s '
+              f'{before_time / after_time:>8.0f}x')
+
+
+if __name__ == '__main__':
+    main()
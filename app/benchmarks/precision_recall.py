@@ -0,0 +1,73 @@
+# Run from the app directory: python -m benchmarks.precision_recall
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from figures.prerec import precision_recall_table
+
+
+def synthetic_benchmark(no_of_files: int, variants_per_file: int, truth_size: int, seed: int = 0) -> (pd.DataFrame, pd.DataFrame, pd.DataFrame):
+    rng = np.random.default_rng(seed)
+    truth_ids = rng.choice(2**40, truth_size, replace=False).astype(np.uint64)
+    false_ids = rng.choice(2**40, variants_per_file, replace=False).astype(np.uint64) | np.uint64(2**41)
+
+    filenames = [f'sample_{i}.vcf' for i in range(no_of_files)]
+    data = pd.DataFrame({
+        'FILENAME': np.repeat(filenames, variants_per_file),
+        'VID': np.concatenate([
+            np.where(rng.random(variants_per_file) < 0.9,
+                     rng.choice(truth_ids, variants_per_file, replace=False),
+                     false_ids)
+            for _ in filenames
+        ]),
+    }).drop_duplicates()
+    metadata = pd.DataFrame({'FILENAME': filenames, 'GROUP': [f'group_{i % 100}' for i in range(no_of_files)]})
+
+    return data, pd.DataFrame({'VID': truth_ids}), metadata
+
+
+def per_group_sets(data: pd.DataFrame, validation_data: pd.DataFrame, metadata: pd.DataFrame) -> (set, list):
+    validation_set = set(validation_data['VID'])
+    sets = [set(data.loc[data['FILENAME'] == filename, 'VID']) for filename in metadata['FILENAME']]
+    return validation_set, sets
+
+
+def set_precision_recall(validation_set: set, sets: list) -> list:
+    return [(len(s.intersection(validation_set)) / len(s), len(s.intersection(validation_set)) / len(validation_set))
+            for s in sets]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precision/recall for every group against a truth set.')
+    parser.add_argument('--files', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--variants-per-file', type=int, default=20_000)
+    parser.add_argument('--truth-size', type=int, default=3_000_000)
+    args = parser.parse_args()
+
+    print(f'{"groups":>7} {"truth size":>11} {"set loop (N x N)":>17} {"one pass":>9} {"speed-up":>9}')
+    for no_of_files in args.files:
+        data, validation_data, metadata = synthetic_benchmark(no_of_files, args.variants_per_file, args.truth_size)
+
+        start_time = time.perf_counter()
+        after = precision_recall_table(data, validation_data, metadata, ['FILENAME'], 'union')
+        after_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        validation_set, sets = per_group_sets(data, validation_data, metadata.sort_values(by='FILENAME'))
+        build_time = time.perf_counter() - start_time
+
+        # The old plot recomputed every group's intersections once per group, so one pass is scaled up by N
+        start_time = time.perf_counter()
+        before = set_precision_recall(validation_set, sets)
+        before_time = build_time + (time.perf_counter() - start_time) * no_of_files
+
+        assert before == list(zip(after['Precision'], after['Recall']))
+
+        print(f'{no_of_files:>7} {args.truth_size:>11,} {before_time:>16.1f}s {after_time:>8.2f}s '
+              f'{before_time / after_time:>8.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# Run from the app directory: python -m benchmarks.read_vcf_memory
+import argparse
+import gc
+import time
+import tracemalloc
+from io import BytesIO
+
+from benchmarks.synthetic import synthetic_vcf_bytes
+from data.file_readers import read_vcf
+
+
+def measure(vcf_bytes: bytes, chunk_length: int) -> tuple:
+    start_time = time.perf_counter()
+    df = read_vcf(BytesIO(vcf_bytes), chunk_length=chunk_length)
+    elapsed = time.perf_counter() - start_time
+
+    rows = len(df)
+    result_mb = df.memory_usage(deep=True).sum() / 2**20
+    del df
+    gc.collect()
+
+    tracemalloc.start()
+    df = read_vcf(BytesIO(vcf_bytes), chunk_length=chunk_length)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del df
+    gc.collect()
+
+    return rows, elapsed, peak / 2**20, result_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Peak memory of whole-file vs chunked VCF ingestion.')
+    parser.add_argument('--variants', type=int, nargs='+', default=[1_000_000, 5_000_000])
+    parser.add_argument('--chunk-lengths', type=int, nargs='+', default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f'{"variants":>10} {"mode":>18} {"rows":>10} {"seconds":>8} {"peak MB":>9} {"result MB":>10}')
+    for no_of_variants in args.variants:
+        vcf_bytes = synthetic_vcf_bytes(no_of_variants)
+
+        for chunk_length in [None] + args.chunk_lengths:
+            mode = 'whole file' if chunk_length is None else f'chunks of {chunk_length}'
+            rows, elapsed, peak_mb, result_mb = measure(vcf_bytes, chunk_length)
+            print(f'{no_of_variants:>10} {mode:>18} {rows:>10} {elapsed:>8.2f} {peak_mb:>9.1f} {result_mb:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
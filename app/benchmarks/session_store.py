@@ -0,0 +1,83 @@
+# Run from the app directory: python -m benchmarks.session_store
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_variants
+from data import store
+from data.store_backends import FileSessionBackend
+from data.variants import normalise_chroms, pack_variant_ids, standard_chroms
+
+
+def session_dataset(no_of_variants: int, no_of_files: int) -> pd.DataFrame:
+    df = synthetic_variants(no_of_variants)[['CHROM', 'POS', 'REF', 'ALT', 'FILTER']]
+    df['CHROM'] = normalise_chroms(df['CHROM'], categories=standard_chroms + ['null_chr'])
+    df['FILTER_PASS'] = df.pop('FILTER') == 'PASS'
+    df['FILENAME'] = np.array([f'sample_{i}.vcf' for i in range(no_of_files)], dtype=object)[
+        np.arange(no_of_variants) % no_of_files
+    ]
+    df['VID'] = pack_variant_ids(df)
+    return df
+
+
+def pickle_round_trip(df: pd.DataFrame, path: str, columns: list = None) -> (float, float):
+    start_time = time.perf_counter()
+    with open(path, 'wb') as f:
+        pickle.dump(df, f, pickle.HIGHEST_PROTOCOL)
+    write_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    with open(path, 'rb') as f:
+        loaded = pickle.load(f)
+    if columns is not None:
+        loaded = loaded[columns]
+    return write_time, time.perf_counter() - start_time
+
+
+def store_round_trip(df: pd.DataFrame, columns: list = None) -> (float, float):
+    start_time = time.perf_counter()
+    store.write_entry('benchmark', 'compare_set_files', df)
+    write_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    store.read_entry('benchmark', 'compare_set_files', columns)
+    return write_time, time.perf_counter() - start_time
+
+
+def best_of(function, repeats: int, *args) -> (float, float):
+    results = [function(*args) for _ in range(repeats)]
+    return min(write for write, _ in results), min(read for _, read in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write and load latency of pickled vs Arrow session datasets.')
+    parser.add_argument('--variants', type=int, nargs='+', default=[1_000_000, 5_000_000])
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as store_dir, tempfile.TemporaryDirectory() as stats_dir:
+        store.session_backend = FileSessionBackend(store_dir, stats_dir, store.STORE_CONFIG['STORE_DEFAULT_TIMEOUT'])
+        pickle_path = os.path.join(store_dir, 'compare_set.pickle')
+
+        print(f'{"variants":>10} {"columns":>9} {"pickle write":>13} {"pickle load":>12} '
+              f'{"arrow write":>12} {"arrow load":>11} {"speed-up":>9}')
+        for no_of_variants in args.variants:
+            df = session_dataset(no_of_variants, args.files)
+
+            for columns in (None, ['FILENAME']):
+                pickle_write, pickle_read = best_of(pickle_round_trip, args.repeats, df, pickle_path, columns)
+                arrow_write, arrow_read = best_of(store_round_trip, args.repeats, df, columns)
+
+                label = 'all' if columns is None else ','.join(columns)
+                print(f'{no_of_variants:>10} {label:>9} {pickle_write:>12.3f}s {pickle_read:>11.3f}s '
+                      f'{arrow_write:>11.3f}s {arrow_read:>10.3f}s {pickle_read / arrow_read:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
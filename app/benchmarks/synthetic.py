@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+
+vcf_header = (
+    '##fileformat=VCFv4.2\n'
+    '##FILTER=<ID=PASS,Description="All filters passed">\n'
+    '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n'
+)
+
+
+def synthetic_variants(no_of_variants: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    bases = np.array(list('ACGT'), dtype=object)
+
+    chroms = np.array([str(i) for i in range(1, 23)] + ['X', 'Y'], dtype=object)
+    chrom_codes = np.sort(rng.integers(0, len(chroms), no_of_variants))
+    positions = rng.integers(1, 250_000_000, no_of_variants)
+
+    refs = bases[rng.integers(0, 4, no_of_variants)]
+    alts = bases[(rng.integers(1, 4, no_of_variants) + rng.integers(0, 4, no_of_variants)) % 4]
+    insertions = rng.random(no_of_variants) < 0.1
+    alts[insertions] = refs[insertions] + bases[rng.integers(0, 4, insertions.sum())] + 'T'
+
+    df = pd.DataFrame({
+        'CHROM': chroms[chrom_codes],
+        'POS': positions,
+        'ID': '.',
+        'REF': refs,
+        'ALT': alts,
+        'QUAL': '50',
+        'FILTER': np.where(rng.random(no_of_variants) < 0.9, 'PASS', 'LowQual'),
+        'INFO': '.',
+    })
+    return df.sort_values(by=['CHROM', 'POS'], kind='stable', ignore_index=True)
+
+
+def synthetic_vcf_bytes(no_of_variants: int, seed: int = 0) -> bytes:
+    body = synthetic_variants(no_of_variants, seed).to_csv(sep='\t', header=False, index=False)
+    return (vcf_header + body).encode('utf-8')
+
+
+def synthetic_regions(no_of_regions: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+
+    chroms = np.array([f'chr{i}' for i in range(1, 23)] + ['chrX', 'chrY'], dtype=object)
+    starts = rng.integers(0, 250_000_000, no_of_regions)
+    lengths = rng.integers(50, 400, no_of_regions)
+
+    df = pd.DataFrame({
+        'CHROM': chroms[rng.integers(0, len(chroms), no_of_regions)],
+        'START': starts,
+        'END': starts + lengths,
+    })
+    return df.sort_values(by=['START', 'END'], ignore_index=True)
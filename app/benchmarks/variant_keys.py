@@ -0,0 +1,61 @@
+# Run from the app directory: python -m benchmarks.variant_keys
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_variants
+from data.variants import generate_keys, normalise_chroms, prepend_chr, standard_chroms
+
+
+def per_row_keys(df: pd.DataFrame) -> (pd.Categorical, list):
+    normalised_chroms = [prepend_chr(chrom) for chrom in df['CHROM'].values]
+    nonstandard_chroms = list(set(normalised_chroms).difference(standard_chroms))
+    chroms = pd.Categorical(values=normalised_chroms, categories=standard_chroms + nonstandard_chroms + ['null_chr'])
+
+    vals = df.assign(CHROM=normalised_chroms)[['CHROM', 'POS', 'REF', 'ALT']].values
+    keys = ['-'.join([row[0], str(row[1]), row[2], row[3]]) for row in vals]
+
+    return chroms, keys
+
+
+def vectorised_keys(df: pd.DataFrame) -> (pd.Categorical, pd.Series):
+    raw_chroms = pd.Categorical(df['CHROM'])
+    nonstandard_chroms = [chrom for chrom in map(prepend_chr, raw_chroms.categories) if chrom not in standard_chroms]
+    chroms = normalise_chroms(raw_chroms, categories=standard_chroms + nonstandard_chroms + ['null_chr'])
+
+    keys = generate_keys(df.assign(CHROM=chroms))
+
+    return chroms, keys
+
+
+def rows_per_second(function, df: pd.DataFrame, repeats: int) -> (float, tuple):
+    best = float('inf')
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        result = function(df)
+        best = min(best, time.perf_counter() - start_time)
+    return len(df) / best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rows/second of KEY generation and chromosome normalisation.')
+    parser.add_argument('--variants', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f'{"variants":>10} {"per-row rows/s":>16} {"vectorised rows/s":>18} {"speed-up":>9}')
+    for no_of_variants in args.variants:
+        df = synthetic_variants(no_of_variants)[['CHROM', 'POS', 'REF', 'ALT']]
+
+        before, (before_chroms, before_keys) = rows_per_second(per_row_keys, df, args.repeats)
+        after, (after_chroms, after_keys) = rows_per_second(vectorised_keys, df, args.repeats)
+
+        assert (before_chroms.astype(str) == after_chroms.astype(str)).all()
+        assert before_keys == after_keys.tolist()
+
+        print(f'{no_of_variants:>10} {before:>16,.0f} {after:>18,.0f} {after / before:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# Run from the app directory: python -m benchmarks.venn_regions
+import argparse
+import time
+
+import numpy as np
+from scipy import sparse
+from venn._venn import generate_petal_labels
+
+from figures.venn_figure import _venn_petal_sizes
+
+
+def synthetic_groups(no_of_groups: int, no_of_variants: int, seed: int = 0) -> sparse.csr_matrix:
+    rng = np.random.default_rng(seed)
+    return sparse.csr_matrix(rng.random((no_of_groups, no_of_variants)) < 0.5)
+
+
+def set_algebra(group_matrix: sparse.csr_matrix) -> (float, list):
+    sets = [set(group_matrix.indices[start:end].tolist())
+            for start, end in zip(group_matrix.indptr[:-1], group_matrix.indptr[1:])]
+
+    start_time = time.perf_counter()
+    petal_labels = generate_petal_labels(sets)
+    elapsed = time.perf_counter() - start_time
+
+    intersection = sets[0].intersection(*sets[1:])
+    return elapsed, [int(label) for label in petal_labels.values()] + [len(intersection)]
+
+
+def bitmask(group_matrix: sparse.csr_matrix) -> (float, list):
+    start_time = time.perf_counter()
+    membership_codes, petal_sizes = _venn_petal_sizes(group_matrix)
+    intersection = np.flatnonzero(membership_codes == 2 ** group_matrix.shape[0] - 1)
+    elapsed = time.perf_counter() - start_time
+
+    return elapsed, petal_sizes[1:].tolist() + [len(intersection)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Venn region sizes: set algebra vs one bincount over membership codes.')
+    parser.add_argument('--groups', type=int, default=6)
+    parser.add_argument('--variants', type=int, nargs='+', default=[1_000_000, 5_000_000])
+    args = parser.parse_args()
+
+    print(f'{"groups":>7} {"variants":>10} {"set algebra":>12} {"bitmask":>9} {"speed-up":>9}')
+    for no_of_variants in args.variants:
+        group_matrix = synthetic_groups(args.groups, no_of_variants)
+
+        after, after_sizes = bitmask(group_matrix)
+        before, before_sizes = set_algebra(group_matrix)
+
+        assert before_sizes == after_sizes
+
+        print(f'{args.groups:>7} {no_of_variants:>10} {before:>11.2f}s {after:>8.3f}s {before / after:>8.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@ from dash import dcc
 from dash.dependencies import Input, Output, State
 
 from dash_app import app
-from callbacks.helpers import normalize_dropdown_value, placeholder
+from callbacks.helpers import job_progress, normalize_dropdown_value
 from data.retrieval import get_uploaded_data
 from figures.clustergram import clustergram
 from layout import ids
@@ -38,7 +38,7 @@ def on_select_heatmap_color(heatmap_color):
 
     Input(ids.navbar_analyze_clustergram__submit__button, 'n_clicks'),
 
-    Input(ids.navbar_navbar__session_id__store, 'data'),
+    State(ids.navbar_navbar__session_id__store, 'data'),
 
     State(ids.navbar_analyze_clustergram__grouping_columns__dropdown, 'value'),
     State(ids.navbar_analyze_clustergram__grouping_method__dropdown, 'value'),
@@ -56,9 +56,23 @@ def on_select_heatmap_color(heatmap_color):
     State(ids.navbar_upload__compare_set_valid__store, 'data'),
     State(ids.navbar_upload__metadata_valid__store, 'data'),
     State(ids.navbar_upload__regions_valid__store, 'data'),
+
+    background=True,
+    running=[
+        (Output(ids.navbar_analyze_clustergram__submit__button, 'disabled'), True, False),
+        (Output(ids.navbar_analyze_clustergram__progress__div, 'hidden'), False, True),
+    ],
+    cancel=[Input(ids.navbar_analyze_clustergram__cancel__button, 'n_clicks')],
+    progress=[
+        Output(ids.navbar_analyze_clustergram__progress__bar, 'value'),
+        Output(ids.navbar_analyze_clustergram__progress__bar, 'label'),
+    ],
+    progress_default=[0, ''],
+    cache_args_to_ignore=[0],
+    prevent_initial_call=True,
 )
 def on_request_clustergram(
-        n_clicks, session_id,
+        set_progress, n_clicks, session_id,
         grouping_columns, grouping_method,
         labeling_columns, labeling_method,
         heatmap_colors, font_size,
@@ -78,9 +92,7 @@ def on_request_clustergram(
 
     results = []
 
-    if n_clicks is None:
-        return placeholder
-
+    set_progress(job_progress(0, 2, 'Loading variants...'))
     (
         (compare_set, metadata),
         notices,
@@ -95,11 +107,13 @@ def on_request_clustergram(
         inside_outside_regions=inside_outside_regions,
         on_chromosome=on_chromosome,
         variant_type=variant_type,
+        partitioned=True,
     )
 
     results += notices
 
     if not any_invalidity:
+        set_progress(job_progress(1, 2, 'Clustering groups...'))
         results += [dcc.Graph(figure=clustergram(
             compare_set,
             metadata,
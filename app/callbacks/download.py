@@ -1,14 +1,13 @@
+import json
 from base64 import b64decode
-from io import BytesIO
-from gzip import GzipFile
+from urllib.parse import urlencode
 
 from dash import dcc
 from dash.dependencies import Input, Output, State
 
 from dash_app import app
 from layout import ids
-from data import cache
-from figures.tables import df_to_csv, variant_df_to_vcf
+from data.store import read_entry
 
 
 @app.callback(
@@ -19,58 +18,75 @@ from figures.tables import df_to_csv, variant_df_to_vcf
 )
 def download_venn_figure(n_clicks, session_id):
     if n_clicks:
-        image_data = cache.get_venn_figure_download_cache(session_id)
+        image_data = read_entry(session_id, 'venn_figure_download')
         return dcc.send_bytes(b64decode(image_data), 'venn.png')
 
 
 @app.callback(
-    Output(ids.navbar_analyze_venn__sites_download__download, 'data'),
+    Output(ids.navbar_analyze_venn__sites_download__iframe, 'src'),
     Input(ids.navbar_analyze_venn__sites_download__button, 'n_clicks'),
     Input(ids.navbar_navbar__session_id__store, 'data'),
     prevent_initial_call=True
 )
 def download_venn_sites(n_clicks, session_id):
     if n_clicks:
-        intersection_sites = cache.get_venn_sites_download_cache(session_id)
-        vcf = variant_df_to_vcf(intersection_sites)
+        return _get_download_url(session_id, 'venn_sites', n_clicks)
 
-        vcf_gz = BytesIO()
-        GzipFile(fileobj=vcf_gz, mode='w').write(vcf.encode('utf-8'))
 
-        return dcc.send_bytes(vcf_gz.getvalue(), 'intersection.vcf.gz')
+@app.callback(
+    Output(ids.navbar_analyze_venn__regions_download__iframe, 'src'),
+    Input(ids.navbar_analyze_venn__regions_download__button, 'n_clicks'),
+    Input(ids.navbar_navbar__session_id__store, 'data'),
+    prevent_initial_call=True
+)
+def download_venn_regions(n_clicks, session_id):
+    if n_clicks:
+        return _get_download_url(session_id, 'venn_regions', n_clicks)
 
 
 @app.callback(
-    Output(ids.navbar_analyze_summary__filename_download__download, 'data'),
+    Output(ids.navbar_analyze_summary__filename_download__iframe, 'src'),
     Input(ids.navbar_analyze_summary__filename_download__button, 'n_clicks'),
     Input(ids.navbar_navbar__session_id__store, 'data'),
     prevent_initial_call=True
 )
 def download_filename_summary(n_clicks, session_id):
     if n_clicks:
-        data = cache.get_filename_download_cache(session_id)
-        return dcc.send_string(df_to_csv(data), 'summary.csv')
+        return _get_download_url(session_id, 'filename_summary', n_clicks)
 
 
 @app.callback(
-    Output(ids.navbar_analyze_summary__metadata_download__download, 'data'),
+    Output(ids.navbar_analyze_summary__metadata_download__iframe, 'src'),
     Input(ids.navbar_analyze_summary__metadata_download__button, 'n_clicks'),
     Input(ids.navbar_navbar__session_id__store, 'data'),
     prevent_initial_call=True
 )
 def download_metadata_summary(n_clicks, session_id):
     if n_clicks:
-        data = cache.get_metadata_download_cache(session_id)
-        return dcc.send_string(df_to_csv(data), 'summary.csv')
+        return _get_download_url(session_id, 'metadata_summary', n_clicks)
 
 
 @app.callback(
-    Output(ids.navbar_analyze_summary__raw_download__download, 'data'),
+    Output(ids.navbar_analyze_summary__raw_download__iframe, 'src'),
     Input(ids.navbar_analyze_summary__raw_download__button, 'n_clicks'),
     Input(ids.navbar_navbar__session_id__store, 'data'),
+    State(ids.display_analyze__raw_summary_view__store, 'data'),
+    State(ids.display_analyze__raw_summary__table, 'sort_by'),
+    State(ids.display_analyze__raw_summary__table, 'filter_query'),
     prevent_initial_call=True
 )
-def download_raw_summary(n_clicks, session_id):
-    if n_clicks:
-        data = cache.get_raw_download_cache(session_id)
-        return dcc.send_string(df_to_csv(data), 'summary.csv')
+def download_raw_summary(n_clicks, session_id, raw_view, sort_by, filter_query):
+    if n_clicks and raw_view is not None:
+        return _get_download_url(
+            session_id,
+            'raw_summary',
+            n_clicks,
+            raw_view=json.dumps(raw_view),
+            sort_by=json.dumps(sort_by or []),
+            filter_query=filter_query or '',
+        )
+
+
+def _get_download_url(session_id: str, name: str, n_clicks: int, **params) -> str:
+    # The click count changes the URL, so the frame loads it again for every click, see downloads.py
+    return app.get_relative_path(f'/download/{session_id}/{name}') + '?' + urlencode({'n': n_clicks, **params})
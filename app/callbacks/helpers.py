@@ -36,3 +36,7 @@ def large_centered_text(text):
 
 
 placeholder = large_centered_text('Your analysis results will appear here.')
+
+
+def job_progress(step: int, no_of_steps: int, label: str) -> (int, str):
+    return 100 * step // no_of_steps, label
@@ -2,9 +2,10 @@ from dash import dcc
 from dash.dependencies import Input, Output, State
 
 from dash_app import app
-from callbacks.helpers import get_first_element, get_second_element, normalize_dropdown_value, placeholder
+from callbacks.helpers import get_first_element, get_second_element, job_progress, large_centered_text, normalize_dropdown_value
 from data.retrieval import get_uploaded_data
 from figures.prerec import precision_recall_plot
+from figures.tables import df_to_table
 from layout import ids
 
 
@@ -13,13 +14,14 @@ from layout import ids
 
     Input(ids.navbar_analyze_prerec__submit__button, 'n_clicks'),
 
-    Input(ids.navbar_navbar__session_id__store, 'data'),
+    State(ids.navbar_navbar__session_id__store, 'data'),
 
     State(ids.navbar_analyze_prerec__grouping_columns__dropdown, 'value'),
     State(ids.navbar_analyze_prerec__grouping_method__dropdown, 'value'),
     State(ids.navbar_analyze_prerec__labeling_columns__dropdown, 'value'),
     State(ids.navbar_analyze_prerec__coloring_columns__dropdown, 'value'),
     State(ids.navbar_analyze_prerec__shaping_columns__dropdown, 'value'),
+    State(ids.navbar_analyze_prerec__stratify_by__checklist, 'value'),
     State(ids.navbar_analyze_prerec__font_size__input, 'value'),
 
     State(ids.navbar_analyze_analyze__filter_pass__checklist, 'value'),
@@ -32,11 +34,25 @@ from layout import ids
     State(ids.navbar_upload__golden_set_valid__store, 'data'),
     State(ids.navbar_upload__metadata_valid__store, 'data'),
     State(ids.navbar_upload__regions_valid__store, 'data'),
+
+    background=True,
+    running=[
+        (Output(ids.navbar_analyze_prerec__submit__button, 'disabled'), True, False),
+        (Output(ids.navbar_analyze_prerec__progress__div, 'hidden'), False, True),
+    ],
+    cancel=[Input(ids.navbar_analyze_prerec__cancel__button, 'n_clicks')],
+    progress=[
+        Output(ids.navbar_analyze_prerec__progress__bar, 'value'),
+        Output(ids.navbar_analyze_prerec__progress__bar, 'label'),
+    ],
+    progress_default=[0, ''],
+    cache_args_to_ignore=[0],
+    prevent_initial_call=True,
 )
 def on_request_prerec(
-        n_clicks, session_id,
+        set_progress, n_clicks, session_id,
         grouping_columns, grouping_method,
-        labeling_columns, coloring_columns, shaping_columns, font_size,
+        labeling_columns, coloring_columns, shaping_columns, stratify_by, font_size,
         filter_options, genomic_regions, inside_outside_regions, on_chromosome, variant_type,
         compare_set_valid, golden_set_valid, metadata_valid, regions_valid,
 ):
@@ -44,15 +60,14 @@ def on_request_prerec(
     labeling_columns = normalize_dropdown_value(labeling_columns)
     coloring_columns = normalize_dropdown_value(coloring_columns)
     shaping_columns = normalize_dropdown_value(shaping_columns)
+    stratify_by = normalize_dropdown_value(stratify_by)
 
     if not grouping_columns or 'FILENAME' in grouping_columns:
         grouping_columns = ['FILENAME']
 
     results = []
 
-    if n_clicks is None:
-        return placeholder
-
+    set_progress(job_progress(0, 2, 'Loading variants...'))
     (
         (compare_set, golden_set, metadata),
         notices,
@@ -73,17 +88,29 @@ def on_request_prerec(
     results += notices
 
     if not any_invalidity:
-        results += [dcc.Graph(figure=precision_recall_plot(
-            compare_set,
-            golden_set,
-            metadata,
-            grouping_columns,
-            grouping_method,
-            labeling_columns,
-            coloring_columns,
-            shaping_columns,
-            font_size=font_size
-        ))]
+        set_progress(job_progress(1, 2, 'Benchmarking groups...'))
+        try:
+            figure, benchmark_df = precision_recall_plot(
+                compare_set,
+                golden_set,
+                metadata,
+                grouping_columns,
+                grouping_method,
+                labeling_columns,
+                coloring_columns,
+                shaping_columns,
+                font_size=font_size,
+                stratify_by=stratify_by,
+                return_table=True,
+            )
+
+            results += [dcc.Graph(figure=figure)]
+
+            if stratify_by:
+                results += [df_to_table(benchmark_df)]
+
+        except ValueError as e:
+            results += [large_centered_text(f'{e}')]
 
     return results
 
@@ -1,6 +1,7 @@
 import uuid
 
 from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 
 from dash_app import app
 from layout import ids
@@ -9,6 +10,10 @@ from layout import ids
 @app.callback(
     Output(ids.navbar_navbar__session_id__store, 'data'),
     Input(ids.navbar_navbar__session_id__store, 'storage_type'),
+    State(ids.navbar_navbar__session_id__store, 'data'),
 )
-def set_session_id(_):
+def set_session_id(_, session_id):
+    # The id is kept in the tab's session storage, so a reload rejoins the session's running jobs
+    if session_id is not None:
+        raise PreventUpdate
     return str(uuid.uuid4())
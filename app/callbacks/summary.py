@@ -4,11 +4,11 @@ from dash.dependencies import Input, Output, State
 
 from dash_app import app
 from callbacks.helpers import normalize_dropdown_value, placeholder
-from data.retrieval import get_uploaded_data
-from data.file_readers import read_local_bed_files
-from data.cache import set_filename_download_cache, set_metadata_download_cache, set_raw_download_cache
+from data.retrieval import get_uploaded_data, get_raw_data, get_raw_view_key, get_raw_view_page, set_raw_view
+from data.table_view import table_view_columns
+from data.store import write_entry
 from figures.histogram import histogram
-from figures.tables import df_to_table, df_to_csv, grouped_variant_counts
+from figures.tables import df_to_table, grouped_variant_counts
 from layout import ids
 
 
@@ -68,7 +68,7 @@ def on_request_filename_summary(
         compare_set_valid, golden_set_valid, regions_valid
 ):
     results = []
-    set_filename_download_cache(session_id, pd.DataFrame())
+    write_entry(session_id, 'filename_download', pd.DataFrame())
     download_hidden = True
 
     if n_clicks is None:
@@ -88,6 +88,7 @@ def on_request_filename_summary(
             inside_outside_regions=inside_outside_regions,
             on_chromosome=on_chromosome,
             variant_type=variant_type,
+            columns=['FILENAME'],
         )
 
     if set_selection == 'golden_set':
@@ -95,19 +96,18 @@ def on_request_filename_summary(
             (data,),
             notices,
             any_invalidity
-        ) = get_uploaded_data(session_id, golden_set_valid=golden_set_valid)
+        ) = get_uploaded_data(session_id, golden_set_valid=golden_set_valid, columns=['FILENAME'])
 
     results += notices
 
     if not any_invalidity:
-        data = data[['FILENAME', 'KEY']]
         total_count = len(data)
 
         grouped_data = (
             data.groupby('FILENAME')
-                .count()
-                .reset_index()
-                .rename(columns={'FILENAME': 'Filename', 'KEY': '# of Variants'})
+                .size()
+                .reset_index(name='# of Variants')
+                .rename(columns={'FILENAME': 'Filename'})
         )
 
         if set_selection == 'compare_set':
@@ -134,7 +134,7 @@ def on_request_filename_summary(
         if visualisation_selection == 'table':
             results.append(table)
 
-        set_filename_download_cache(session_id, df)
+        write_entry(session_id, 'filename_download', df)
 
         download_hidden = False
 
@@ -181,7 +181,7 @@ def on_request_metadata_summary(
         grouping_columns = ['FILENAME']
 
     results = []
-    set_metadata_download_cache(session_id, pd.DataFrame())
+    write_entry(session_id, 'metadata_download', pd.DataFrame())
     download_hidden = True
 
     if n_clicks is None:
@@ -222,7 +222,7 @@ def on_request_metadata_summary(
                 return_updated_df=True
             )
 
-            set_metadata_download_cache(session_id, df)
+            write_entry(session_id, 'metadata_download', df)
             download_hidden = False
 
             results.append(table)
@@ -231,7 +231,13 @@ def on_request_metadata_summary(
 
 
 @app.callback(
-    Output(ids.display_analyze__raw_summary_display__div, 'children'),
+    Output(ids.display_analyze__raw_summary_notices__div, 'children'),
+    Output(ids.display_analyze__raw_summary_table__div, 'hidden'),
+    Output(ids.display_analyze__raw_summary__table, 'columns'),
+    Output(ids.display_analyze__raw_summary__table, 'page_current'),
+    Output(ids.display_analyze__raw_summary__table, 'sort_by'),
+    Output(ids.display_analyze__raw_summary__table, 'filter_query'),
+    Output(ids.display_analyze__raw_summary_view__store, 'data'),
     Output(ids.navbar_analyze_summary__raw_download__button, 'hidden'),
 
     Input(ids.navbar_analyze_summary__raw_submit__button, 'n_clicks'),
@@ -257,72 +263,61 @@ def on_request_raw_summary(
         compare_set_valid, golden_set_valid, metadata_valid, regions_valid,
 ):
     results = []
-    set_raw_download_cache(session_id, pd.DataFrame())
+    table_hidden = True
     download_hidden = True
 
     if n_clicks is None:
-        return placeholder, download_hidden
-
-    merge_reminder = None
+        return placeholder, table_hidden, [], 0, [], '', None, download_hidden
+
+    raw_view = {
+        'set_selection': set_selection,
+        'compare_set_valid': compare_set_valid,
+        'golden_set_valid': golden_set_valid,
+        'metadata_valid': metadata_valid,
+        'regions_valid': regions_valid,
+        'filter_options': filter_options,
+        'genomic_regions': genomic_regions,
+        'inside_outside_regions': inside_outside_regions,
+        'on_chromosome': on_chromosome,
+        'variant_type': variant_type,
+    }
+
+    view_key = get_raw_view_key(session_id, raw_view)
+    data, notices, any_invalidity = get_raw_data(session_id, **raw_view)
 
-    if set_selection == 'compare_set':
-        (
-            (data,),
-            notices,
-            any_invalidity
-        ) = get_uploaded_data(
-            session_id,
-            compare_set_valid=compare_set_valid,
-            regions_valid=regions_valid,
-            filter_options=filter_options,
-            genomic_regions=genomic_regions,
-            inside_outside_regions=inside_outside_regions,
-            on_chromosome=on_chromosome,
-            variant_type=variant_type,
-        )
-        if data is not None and data.groupby('FILENAME').ngroups > 1:
-            merge_reminder = html.P('All uploaded VCFs have been merged into a single table.')
+    results += notices
 
-    if set_selection == 'golden_set':
-        (
-            (data,),
-            notices,
-            any_invalidity
-        ) = get_uploaded_data(session_id, golden_set_valid=golden_set_valid)
-        if data is not None and data.groupby('FILENAME').ngroups > 1:
-            merge_reminder = html.P('All uploaded VCFs have been merged into a single table.')
+    if any_invalidity:
+        return results, table_hidden, [], 0, [], '', None, download_hidden
 
-    if set_selection == 'metadata':
-        (
-            (data,),
-            notices,
-            any_invalidity
-        ) = get_uploaded_data(session_id, metadata_valid=metadata_valid)
+    if set_selection in ['compare_set', 'golden_set'] and data['FILENAME'].nunique() > 1:
+        results += [html.P('All uploaded VCFs have been merged into a single table.')]
 
-    if set_selection == 'regions':
-        if genomic_regions in ['none', 'custom']:
-            (
-                (data,),
-                notices,
-                any_invalidity
-            ) = get_uploaded_data(session_id, regions_valid=regions_valid)
+    set_raw_view(session_id, view_key, data)
 
-            results += notices
-        else:
-            data = read_local_bed_files(['../BED Files/' + genomic_regions])
-            any_invalidity = False
+    table_hidden = False
+    download_hidden = False
 
-    results += notices
+    return results, table_hidden, table_view_columns(data), 0, [], '', raw_view, download_hidden
 
-    if not any_invalidity:
-        row_truncate_limit = 100_000
-        if len(data) > row_truncate_limit:
-            results += [html.P(f'Only the first {row_truncate_limit} rows are shown.')]
-        table, updated_data = df_to_table(data[:row_truncate_limit], return_updated_df=True)
 
-        set_raw_download_cache(session_id, updated_data)
-        download_hidden = False
+@app.callback(
+    Output(ids.display_analyze__raw_summary__table, 'data'),
+    Output(ids.display_analyze__raw_summary__table, 'page_count'),
 
-        results += [merge_reminder, table]
+    Input(ids.display_analyze__raw_summary_view__store, 'data'),
+    Input(ids.display_analyze__raw_summary__table, 'page_current'),
+    Input(ids.display_analyze__raw_summary__table, 'page_size'),
+    Input(ids.display_analyze__raw_summary__table, 'sort_by'),
+    Input(ids.display_analyze__raw_summary__table, 'filter_query'),
 
-    return results, download_hidden
+    State(ids.navbar_navbar__session_id__store, 'data'),
+)
+def on_request_raw_summary_page(raw_view, page_current, page_size, sort_by, filter_query, session_id):
+    if raw_view is None:
+        return [], 0
+
+    try:
+        return get_raw_view_page(session_id, raw_view, page_current, page_size, sort_by, filter_query)
+    except (LookupError, ValueError):
+        return [], 0
@@ -2,49 +2,132 @@ import os
 
 import pandas as pd
 
-from dash import html
-from dash.dependencies import Input, Output
+from dash import ctx, html
+from dash.dependencies import ClientsideFunction, Input, Output, State
 
 from dash_app import app
 from data.cache import (
+    append_compare_set_cache_as_df,
+    remove_compare_set_files,
     set_compare_set_cache_as_df,
     set_golden_set_cache_as_df,
     set_metadata_cache_as_df,
     set_regions_cache_as_df,
 )
-from callbacks.helpers import normalize_upload_filename
+from callbacks.helpers import normalize_dropdown_value, normalize_upload_filename
 from data.retrieval import get_uploaded_data
+from data.staging import get_staged_file_paths, remove_staged_upload
 from layout import ids, styles
 
 
+app.clientside_callback(
+    ClientsideFunction(namespace='uploads', function_name='staged_upload'),
+    Output(ids.navbar_upload__compare_set_staged__store, 'data'),
+    Input(ids.navbar_upload__compare_set_staged__button, 'n_clicks'),
+    State(ids.navbar_upload__compare_set__upload, 'id'),
+    prevent_initial_call=True,
+)
+
+
 @app.callback(
-    Output(ids.navbar_upload__compare_set_upload_result__div, 'children'),
-    Output(ids.display_upload__compare_set_summary_card__div, 'children'),
-    Output(ids.navbar_upload__compare_set_valid__store, 'data'),
+    Output(ids.navbar_upload__compare_set_parsed__store, 'data'),
 
-    Input(ids.navbar_upload__compare_set__upload, 'filename'),
-    Input(ids.navbar_upload__compare_set__upload, 'contents'),
+    Input(ids.navbar_upload__compare_set_staged__store, 'data'),
+    Input(ids.navbar_upload__compare_set_remove__button, 'n_clicks'),
 
-    Input(ids.navbar_navbar__session_id__store, 'data'),
+    State(ids.navbar_navbar__session_id__store, 'data'),
+    State(ids.navbar_upload__compare_set_append__checklist, 'value'),
+    State(ids.navbar_upload__compare_set_remove__dropdown, 'value'),
+
+    background=True,
+    running=[(Output(ids.navbar_upload__compare_set__upload, 'className'), 'chunked-upload disabled', 'chunked-upload')],
+    progress=[Output(ids.navbar_upload__compare_set_progress__div, 'children')],
+    progress_default=[''],
+    prevent_initial_call=True,
 )
-def on_compare_set_upload(filenames, contents, session_id):
-    filenames = normalize_upload_filename(filenames)
+def on_compare_set_upload(set_progress, staged_upload, _, session_id, append, removed_filenames):
+    if ctx.triggered_id == ids.navbar_upload__compare_set_remove__button:
+        return on_compare_set_remove(set_progress, session_id, normalize_dropdown_value(removed_filenames))
 
-    compare_set = None
-    compare_set_valid = 'compare_set_is_invalid'
-    exception = None
-    if filenames:
+    filenames, file_paths, exception = staged_upload_files(staged_upload, session_id)
+
+    file_counts = None
+    if filenames and exception is None:
+        set_progress(f'Processing {len(filenames)} files...')
         try:
-            compare_set = set_compare_set_cache_as_df(session_id, filenames, contents)
-            compare_set_valid = 'compare_set_is_valid'
+            if append == ['append']:
+                compare_set_files = append_compare_set_cache_as_df(session_id, filenames, file_paths=file_paths)
+            else:
+                compare_set_files = set_compare_set_cache_as_df(session_id, filenames, file_paths=file_paths)
 
+            file_counts = count_variants_per_file(compare_set_files)
+            filenames = [filename for filename, _ in file_counts]
         except Exception as e:
-            exception = e
+            exception = f'{e}' or type(e).__name__
+
+    release_staged_upload(staged_upload, session_id)
+    return {'filenames': filenames, 'file_counts': file_counts, 'exception': exception}
+
+
+@app.callback(
+    Output(ids.navbar_upload__compare_set_upload_result__div, 'children'),
+    Output(ids.display_upload__compare_set_summary_card__div, 'children'),
+    Output(ids.navbar_upload__compare_set_valid__store, 'data'),
+    Output(ids.navbar_upload__compare_set_remove__dropdown, 'options'),
+    Output(ids.navbar_upload__compare_set_remove__dropdown, 'value'),
+
+    Input(ids.navbar_upload__compare_set_parsed__store, 'data'),
+)
+def on_compare_set_parsed(parsed):
+    filenames, file_counts, exception = parsed_upload(parsed, 'file_counts')
+
+    compare_set_valid = 'compare_set_is_invalid'
+    uploaded_filenames = []
+    if file_counts is not None:
+        compare_set_valid = 'compare_set_is_valid'
+        uploaded_filenames = sorted(filenames)
 
     result = vcf_upload_result(filenames, exception)
-    summary_card = generate_compare_set_summary_card(compare_set, exception)
+    summary_card = generate_compare_set_summary_card(file_counts, exception)
+
+    return result, summary_card, compare_set_valid, uploaded_filenames, []
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='uploads', function_name='staged_upload'),
+    Output(ids.navbar_upload__golden_set_staged__store, 'data'),
+    Input(ids.navbar_upload__golden_set_staged__button, 'n_clicks'),
+    State(ids.navbar_upload__golden_set__upload, 'id'),
+    prevent_initial_call=True,
+)
+
+
+@app.callback(
+    Output(ids.navbar_upload__golden_set_parsed__store, 'data'),
+
+    Input(ids.navbar_upload__golden_set_staged__store, 'data'),
+    State(ids.navbar_navbar__session_id__store, 'data'),
+
+    background=True,
+    running=[(Output(ids.navbar_upload__golden_set__upload, 'className'), 'chunked-upload disabled', 'chunked-upload')],
+    progress=[Output(ids.navbar_upload__golden_set_progress__div, 'children')],
+    progress_default=[''],
+    prevent_initial_call=True,
+)
+def on_golden_set_upload(set_progress, staged_upload, session_id):
+    filenames, file_paths, exception = staged_upload_files(staged_upload, session_id)
+
+    file_counts = None
+    if filenames and exception is None:
+        set_progress(f'Processing {len(filenames)} files...')
+        try:
+            golden_set_files = set_golden_set_cache_as_df(session_id, filenames, file_paths=file_paths)
+            file_counts = count_variants_per_file(golden_set_files)
+        except Exception as e:
+            exception = f'{e}' or type(e).__name__
 
-    return result, summary_card, compare_set_valid
+    release_staged_upload(staged_upload, session_id)
+    return {'filenames': filenames, 'file_counts': file_counts, 'exception': exception}
 
 
 @app.callback(
@@ -52,25 +135,17 @@ def on_compare_set_upload(filenames, contents, session_id):
     Output(ids.display_upload__golden_set_summary_card__div, 'children'),
     Output(ids.navbar_upload__golden_set_valid__store, 'data'),
 
-    Input(ids.navbar_upload__golden_set__upload, 'filename'),
-    Input(ids.navbar_upload__golden_set__upload, 'contents'),
-    Input(ids.navbar_navbar__session_id__store, 'data'),
+    Input(ids.navbar_upload__golden_set_parsed__store, 'data'),
 )
-def on_golden_set_upload(filenames, contents, session_id):
-    filenames = normalize_upload_filename(filenames)
+def on_golden_set_parsed(parsed):
+    filenames, file_counts, exception = parsed_upload(parsed, 'file_counts')
 
-    golden_set = None
     golden_set_valid = 'golden_set_is_invalid'
-    exception = None
-    if filenames:
-        try:
-            golden_set = set_golden_set_cache_as_df(session_id, filenames, contents)
-            golden_set_valid = 'golden_set_is_valid'
-        except Exception as e:
-            exception = e
+    if file_counts is not None:
+        golden_set_valid = 'golden_set_is_valid'
 
     result = vcf_upload_result(filenames, exception)
-    summary_card = generate_golden_set_summary_card(golden_set, exception)
+    summary_card = generate_golden_set_summary_card(file_counts, exception)
 
     return result, summary_card, golden_set_valid
 
@@ -94,7 +169,7 @@ def on_metadata_upload(metadata_filenames, metadata_contents, compare_set_valid,
         (compare_set,),
         _,
         _
-    ) = get_uploaded_data(session_id, compare_set_valid=compare_set_valid)
+    ) = get_uploaded_data(session_id, compare_set_valid=compare_set_valid, columns=['FILENAME'])
 
     if compare_set is None:
         compare_set_filenames = []
@@ -144,7 +219,12 @@ def on_complete_metadata_upload(compare_set_valid, metadata_valid, session_id):
         (_, metadata),
         _,
         _
-    ) = get_uploaded_data(session_id, compare_set_valid=compare_set_valid, metadata_valid=metadata_valid)
+    ) = get_uploaded_data(
+        session_id,
+        compare_set_valid=compare_set_valid,
+        metadata_valid=metadata_valid,
+        columns=['FILENAME'],
+    )
 
     if metadata is not None:
         group_selection = metadata.columns.values
@@ -155,33 +235,99 @@ def on_complete_metadata_upload(compare_set_valid, metadata_valid, session_id):
 
 
 @app.callback(
-    Output(ids.navbar_upload__regions_upload_result__div, 'children'),
-    Output(ids.display_upload__regions_summary_card__div, 'children'),
-    Output(ids.navbar_upload__regions_valid__store, 'data'),
+    Output(ids.navbar_upload__regions_parsed__store, 'data'),
 
     Input(ids.navbar_upload__regions__upload, 'filename'),
     Input(ids.navbar_upload__regions__upload, 'contents'),
-    Input(ids.navbar_navbar__session_id__store, 'data'),
+    State(ids.navbar_navbar__session_id__store, 'data'),
+
+    background=True,
+    running=[(Output(ids.navbar_upload__regions__upload, 'disabled'), True, False)],
+    progress=[Output(ids.navbar_upload__regions_progress__div, 'children')],
+    progress_default=[''],
+    prevent_initial_call=True,
 )
-def on_regions_upload(filenames, contents, session_id):
+def on_regions_upload(set_progress, filenames, contents, session_id):
     filenames = normalize_upload_filename(filenames)
 
-    regions = None
-    regions_valid = 'regions_is_invalid'
+    no_of_regions = None
     exception = None
     if filenames:
+        set_progress(f'Processing {len(filenames)} files...')
         try:
-            regions = set_regions_cache_as_df(session_id, filenames, contents)
-            regions_valid = 'regions_is_valid'
+            no_of_regions = len(set_regions_cache_as_df(session_id, filenames, contents))
         except Exception as e:
-            exception = e
+            exception = f'{e}' or type(e).__name__
+
+    return {'filenames': filenames, 'no_of_regions': no_of_regions, 'exception': exception}
+
+
+@app.callback(
+    Output(ids.navbar_upload__regions_upload_result__div, 'children'),
+    Output(ids.display_upload__regions_summary_card__div, 'children'),
+    Output(ids.navbar_upload__regions_valid__store, 'data'),
+
+    Input(ids.navbar_upload__regions_parsed__store, 'data'),
+)
+def on_regions_parsed(parsed):
+    filenames, no_of_regions, exception = parsed_upload(parsed, 'no_of_regions')
+
+    regions_valid = 'regions_is_invalid'
+    if no_of_regions is not None:
+        regions_valid = 'regions_is_valid'
 
     result = bed_upload_result(filenames, exception)
-    summary_card = generate_regions_summary_card(regions, filenames, exception)
+    summary_card = generate_regions_summary_card(no_of_regions, filenames, exception)
 
     return result, summary_card, regions_valid
 
 
+def on_compare_set_remove(set_progress, session_id, removed_filenames):
+    set_progress(f'Removing {len(removed_filenames)} files...')
+
+    try:
+        file_counts = count_variants_per_file(remove_compare_set_files(session_id, removed_filenames))
+    except Exception as e:
+        return {'filenames': removed_filenames, 'file_counts': None, 'exception': f'{e}' or type(e).__name__}
+
+    # Removing every file leaves the compare set as if nothing had been uploaded
+    filenames = [filename for filename, _ in file_counts]
+    return {'filenames': filenames, 'file_counts': file_counts or None, 'exception': None}
+
+
+def staged_upload_files(staged_upload: dict, session_id: str) -> (list, list, str):
+    if staged_upload is None:
+        return [], None, None
+
+    filenames = staged_upload['filenames']
+    if staged_upload.get('error'):
+        return filenames, None, staged_upload['error']
+
+    try:
+        return filenames, get_staged_file_paths(session_id, staged_upload['upload_id'], range(len(filenames))), None
+    except (LookupError, ValueError, PermissionError) as e:
+        return filenames, None, f'{e}'
+
+
+def release_staged_upload(staged_upload: dict, session_id: str):
+    # Parsed files are kept by content, so the staged ones are not needed once ingested or refused
+    if staged_upload is not None:
+        remove_staged_upload(session_id, staged_upload['upload_id'])
+    return
+
+
+def parsed_upload(parsed: dict, summary_key: str) -> (list, object, str):
+    if parsed is None:
+        return [], None, None
+
+    return parsed['filenames'], parsed[summary_key], parsed['exception']
+
+
+def count_variants_per_file(files: pd.DataFrame) -> list:
+    files = files.sort_values(by=['VARIANTS', 'FILENAME'], ascending=[False, True])
+    return [[filename, count] for filename, count in zip(files['FILENAME'].tolist(), files['VARIANTS'].tolist())]
+
+
 def upload_summary_card(title, status, body_items, counts_list=None, aggregate_after=5):
     body_items = filename_lister(body_items, aggregate_after=aggregate_after)
 
@@ -211,7 +357,7 @@ def upload_summary_card(title, status, body_items, counts_list=None, aggregate_a
     )
 
 
-def vcf_upload_result(filenames: list, e: Exception = None):
+def vcf_upload_result(filenames: list, e: str = None):
 
     if e:
         message = 'Errors encountered when processing files.'
@@ -242,7 +388,7 @@ def csv_upload_result(filenames: list, e: Exception = None):
     return message
 
 
-def bed_upload_result(filenames: list, e: Exception = None):
+def bed_upload_result(filenames: list, e: str = None):
     if e:
         message = 'Errors encountered when processing files.'
     else:
@@ -257,30 +403,28 @@ def bed_upload_result(filenames: list, e: Exception = None):
     return message
 
 
-def generate_compare_set_summary_card(compare_set: pd.DataFrame, e: Exception = None):
+def generate_compare_set_summary_card(file_counts: list, e: str = None):
     if e:
         return upload_summary_card('Compare Set', 'An exception occurred:', [f'{e}'])
 
-    if compare_set is None:
+    if file_counts is None:
         status = 'Not uploaded.'
         filenames = ['> Required for analysis.']
         counts = []
     else:
-        files = compare_set.groupby('FILENAME').size().sort_values(ascending=False)
-
-        filenames = files.index.tolist()
-        counts = files.tolist()
+        filenames = [filename for filename, _ in file_counts]
+        counts = [count for _, count in file_counts]
 
         status = [html.Pre(sum(counts), style={'display': 'inline'}), ' variants loaded.']
 
     return upload_summary_card('Compare Set', status, filenames, counts, aggregate_after=11)
 
 
-def generate_golden_set_summary_card(golden_set: pd.DataFrame, e: Exception = None):
+def generate_golden_set_summary_card(file_counts: list, e: str = None):
     if e:
         return upload_summary_card('Golden Set', 'An exception occurred:', [f'{e}'])
 
-    if golden_set is None:
+    if file_counts is None:
         status = 'Not uploaded.'
         filenames = [
             '> Required for benchmarking.',
@@ -288,10 +432,8 @@ def generate_golden_set_summary_card(golden_set: pd.DataFrame, e: Exception = No
         ]
         counts = []
     else:
-        files = golden_set.groupby('FILENAME').size().sort_values(ascending=False)
-
-        filenames = files.index.tolist()
-        counts = files.tolist()
+        filenames = [filename for filename, _ in file_counts]
+        counts = [count for _, count in file_counts]
 
         status = [html.Pre(sum(counts), style={'display': 'inline'}), ' variants loaded.']
 
@@ -320,7 +462,7 @@ def generate_metadata_summary_card(metadata: pd.DataFrame, csv_filenames: list,
     return upload_summary_card('Metadata', status, filenames, aggregate_after=4)
 
 
-def generate_regions_summary_card(regions: pd.DataFrame, bed_filenames: list, e: Exception = None):
+def generate_regions_summary_card(no_of_regions: int, bed_filenames: list, e: str = None):
     if e:
         return upload_summary_card('Genomic Regions', 'An exception occurred:', [f'{e}'])
 
@@ -328,7 +470,7 @@ def generate_regions_summary_card(regions: pd.DataFrame, bed_filenames: list, e:
         status = 'Not uploaded.'
         filenames = ['> Custom regions for filtering.']
     else:
-        status = [html.Pre(len(regions), style={'display': 'inline'}), ' regions loaded.']
+        status = [html.Pre(no_of_regions, style={'display': 'inline'}), ' regions loaded.']
         filenames = bed_filenames
 
     return upload_summary_card('Genomic Regions', status, filenames, aggregate_after=3)
@@ -5,9 +5,9 @@ from dash.dependencies import Input, Output, State
 
 from dash_app import app
 from figures.venn_figure import venn_diagram
-from callbacks.helpers import normalize_dropdown_value, large_centered_text, placeholder
-from data.retrieval import get_uploaded_data
-from data.cache import set_venn_figure_download_cache, set_venn_sites_download_cache
+from callbacks.helpers import job_progress, normalize_dropdown_value, large_centered_text
+from data.retrieval import get_dataset_versions, get_uploaded_data
+from data.store import write_entry
 from layout import ids
 
 
@@ -15,10 +15,11 @@ from layout import ids
     Output(ids.display_analyze__venn_display__div, 'children'),
     Output(ids.navbar_analyze_venn__figure_download__button, 'hidden'),
     Output(ids.navbar_analyze_venn__sites_download__button, 'hidden'),
+    Output(ids.navbar_analyze_venn__regions_download__button, 'hidden'),
 
     Input(ids.navbar_analyze_venn__submit__button, 'n_clicks'),
 
-    Input(ids.navbar_navbar__session_id__store, 'data'),
+    State(ids.navbar_navbar__session_id__store, 'data'),
 
     State(ids.navbar_analyze_venn__grouping_columns__dropdown, 'value'),
     State(ids.navbar_analyze_venn__grouping_method__dropdown, 'value'),
@@ -34,9 +35,23 @@ from layout import ids
     State(ids.navbar_upload__compare_set_valid__store, 'data'),
     State(ids.navbar_upload__metadata_valid__store, 'data'),
     State(ids.navbar_upload__regions_valid__store, 'data'),
+
+    background=True,
+    running=[
+        (Output(ids.navbar_analyze_venn__submit__button, 'disabled'), True, False),
+        (Output(ids.navbar_analyze_venn__progress__div, 'hidden'), False, True),
+    ],
+    cancel=[Input(ids.navbar_analyze_venn__cancel__button, 'n_clicks')],
+    progress=[
+        Output(ids.navbar_analyze_venn__progress__bar, 'value'),
+        Output(ids.navbar_analyze_venn__progress__bar, 'label'),
+    ],
+    progress_default=[0, ''],
+    cache_args_to_ignore=[0],
+    prevent_initial_call=True,
 )
 def on_request_venn(
-        n_clicks, session_id,
+        set_progress, n_clicks, session_id,
         grouping_columns, grouping_method, prefer_pseudovenn, font_size,
         filter_options, genomic_regions, inside_outside_regions, on_chromosome, variant_type,
         compare_set_valid, metadata_valid, regions_valid,
@@ -48,19 +63,11 @@ def on_request_venn(
     results = []
     image_data = ''
     download_hidden = True
-    set_venn_figure_download_cache(session_id, '')
-
-    if n_clicks is None:
-        return placeholder, download_hidden, download_hidden
+    write_entry(session_id, 'venn_figure_download', '')
 
-    (
-        (compare_set, metadata),
-        notices,
-        any_invalidity
-    ) = get_uploaded_data(
-        session_id,
+    set_progress(job_progress(0, 3, 'Loading variants...'))
+    compare_set_options = dict(
         compare_set_valid=compare_set_valid,
-        metadata_valid=metadata_valid,
         regions_valid=regions_valid,
         filter_options=filter_options,
         genomic_regions=genomic_regions,
@@ -68,17 +75,27 @@ def on_request_venn(
         on_chromosome=on_chromosome,
         variant_type=variant_type,
     )
+    compare_set_versions = get_dataset_versions(
+        session_id,
+        ('compare_set', 'regions') if genomic_regions in ['custom'] else ('compare_set',)
+    )
+    (
+        (compare_set, metadata),
+        notices,
+        any_invalidity
+    ) = get_uploaded_data(session_id, metadata_valid=metadata_valid, partitioned=True, **compare_set_options)
 
     results += notices
 
     if not any_invalidity:
+        set_progress(job_progress(1, 3, 'Drawing Venn diagram...'))
         try:
             if prefer_pseudovenn == ['prefer_pseudovenn']:
                 pseudovenn_preference = 'pseudovenn'
             else:
                 pseudovenn_preference = 'venn'
 
-            figure_image_bytes, intersection_sites = venn_diagram(
+            figure_image_bytes, intersection_sites, (group_labels, membership_codes) = venn_diagram(
                 compare_set,
                 metadata,
                 grouping_columns,
@@ -86,17 +103,25 @@ def on_request_venn(
                 pseudovenn_preference,
                 font_size=font_size,
                 return_intersection=True,
+                return_regions=True,
             )
 
+            set_progress(job_progress(2, 3, 'Preparing downloads...'))
             image_data = b64encode(figure_image_bytes.getvalue()).decode('utf-8')
 
             results += [html.Img(src=f'data:image/png;base64,{image_data}')]
 
             download_hidden = False
-            set_venn_figure_download_cache(session_id, image_data)
-            set_venn_sites_download_cache(session_id, intersection_sites)
+            write_entry(session_id, 'venn_figure_download', image_data)
+            write_entry(session_id, 'venn_sites_download', intersection_sites)
+            write_entry(session_id, 'venn_regions_download', (
+                group_labels,
+                membership_codes,
+                compare_set_options,
+                compare_set_versions,
+            ))
 
         except ValueError as e:
             results += [large_centered_text(f'{e}')]
 
-    return results, download_hidden, download_hidden
+    return results, download_hidden, download_hidden, download_hidden
@@ -1,3 +1,4 @@
+import os
 import sys
 
 
@@ -9,6 +10,32 @@ auto_submit = True and dev_mode
 
 bundled_mode = False or getattr(sys, 'frozen', False)
 
+vcf_chunk_length = 100_000
+ingest_workers = os.cpu_count()
+serial_ingest_max_bytes = 16 * 2**20
+filtered_cache_max_bytes = 512 * 2**20
+session_store_max_bytes = 8 * 2**30
+session_store_session_max_bytes = 1 * 2**30
+parsed_files_max_bytes = 32 * 2**30
+csv_gzip_min_rows = 50_000
+raw_table_page_size = 250
+upload_chunk_bytes = 8 * 2**20
+upload_max_file_bytes = 8 * 2**30
+staged_uploads_max_bytes = 64 * 2**30
+staged_uploads_session_max_bytes = 16 * 2**30
+staged_uploads_sweep_seconds = 15 * 60
+staged_parse_workers = 1
+
+# Session entries, parsed files and uploads are kept where every worker can read them, and a Redis
+# server shares the session store's records and queues background jobs across hosts when its url is set
+shared_directory = os.environ.get('VCF_OBSERVER_SHARED_DIR', './__pycache__')
+redis_url = os.environ.get('VCF_OBSERVER_REDIS_URL')
+session_store_redis_max_value_bytes = 1 * 2**20
+session_store_file_grace_seconds = 10 * 60
+server_workers = int(os.environ.get('VCF_OBSERVER_WORKERS', 4))
+server_bind = os.environ.get('VCF_OBSERVER_BIND', '0.0.0.0:8050')
+job_workers = int(os.environ.get('VCF_OBSERVER_JOB_WORKERS', 2))
+
 test_files_directory = ''
 compare_set_test_files = [
 ]
@@ -4,6 +4,10 @@ from dash import Dash
 import dash_bootstrap_components as dbc
 
 import config
+from downloads import download_blueprint
+from jobs import job_manager
+from stats import stats_blueprint
+from uploads import upload_blueprint
 
 
 if config.bundled_mode:
@@ -21,5 +25,9 @@ app = Dash(
     title='VCF Observer',
     update_title='VCF Observing...',
     external_stylesheets=[dbc.themes.LITERA],
-    assets_folder=assets_directory
+    assets_folder=assets_directory,
+    background_callback_manager=job_manager,
 )
+app.server.register_blueprint(upload_blueprint)
+app.server.register_blueprint(download_blueprint)
+app.server.register_blueprint(stats_blueprint)
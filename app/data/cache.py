@@ -1,209 +1,191 @@
-from data.file_readers import read_b64_vcf_files, read_b64_csv_files, read_b64_bed_files
+from collections import OrderedDict
+from threading import Lock
+
+from data.file_readers import ingest_b64_vcf_files, ingest_staged_vcf_files, iter_parsed_vcfs, read_parsed_vcfs, read_b64_csv_files, read_b64_bed_files
 
 import pandas as pd
-from flask_caching import Cache
 
-from dash_app import app
+import config
+from data.parsed_files import evict_parsed_files, touch_parsed_files
+from data.regions import index_regions, region_index_from_df, region_index_to_df
+from data.store import read_entry, write_entry, get_entry_version, get_session_ids
 
-CACHE_CONFIG = {
-    'CACHE_TYPE': 'FileSystemCache',
-    'CACHE_DIR': './__pycache__',
-    'CACHE_DEFAULT_TIMEOUT': 24*60*60,
-}
-cache = Cache()
-cache.init_app(app.server, config=CACHE_CONFIG)
+# Filtered variant sets, most recently used last, bounded by config.filtered_cache_max_bytes
+filtered_cache = OrderedDict()
+filtered_cache_lock = Lock()
 
 
-def set_compare_set_cache_as_df(session_id: str, filenames: list, file_contents: list) -> pd.DataFrame:
-    cache_key = _get_compare_set_cache_key(session_id)
+def set_compare_set_cache_as_df(session_id: str, filenames: list, file_contents: list = None, file_paths: list = None) -> pd.DataFrame:
+    files = _ingest_vcf_upload(filenames, file_contents, file_paths)
+    return _write_vcf_file_references(session_id, 'compare_set', files)
 
-    data = read_b64_vcf_files(filenames, file_contents)
-    cache.set(cache_key, data)
 
-    return data
+def append_compare_set_cache_as_df(session_id: str, filenames: list, file_contents: list = None, file_paths: list = None) -> pd.DataFrame:
+    new_files = _ingest_vcf_upload(filenames, file_contents, file_paths)
 
+    try:
+        files = read_entry(session_id, 'compare_set_files')
+        files = pd.concat([files[~files['FILENAME'].isin(new_files['FILENAME'])], new_files], ignore_index=True)
+    except LookupError:
+        files = new_files
 
-def get_compare_set_cache(session_id) -> pd.DataFrame:
-    cache_key = _get_compare_set_cache_key(session_id)
+    return _write_vcf_file_references(session_id, 'compare_set', files)
 
-    data = cache.get(cache_key)
-    if data is None:
-        raise LookupError('The cached data has timed out.')
 
-    return data
+def remove_compare_set_files(session_id: str, filenames: list) -> pd.DataFrame:
+    files = read_entry(session_id, 'compare_set_files')
+    return _write_vcf_file_references(session_id, 'compare_set', files[~files['FILENAME'].isin(filenames)])
 
 
-def set_golden_set_cache_as_df(session_id: str, filenames: list, file_contents: list) -> pd.DataFrame:
-    cache_key = _get_golden_set_cache_key(session_id)
+def get_compare_set_cache(session_id, columns: list = None, chromosomes: list = None) -> pd.DataFrame:
+    return read_parsed_vcfs(read_entry(session_id, 'compare_set_files'), columns, chromosomes)
 
-    data = read_b64_vcf_files(filenames, file_contents)
-    cache.set(cache_key, data)
 
-    return data
+def iter_compare_set_partitions(session_id, columns: list = None, chromosomes: list = None):
+    return iter_parsed_vcfs(read_entry(session_id, 'compare_set_files'), columns, chromosomes)
 
 
-def get_golden_set_cache(session_id) -> pd.DataFrame:
-    cache_key = _get_golden_set_cache_key(session_id)
+def get_compare_set_version(session_id) -> tuple:
+    return get_entry_version(session_id, 'compare_set_files')
 
-    data = cache.get(cache_key)
-    if data is None:
-        raise LookupError('The cached data has timed out.')
 
-    return data
+def set_golden_set_cache_as_df(session_id: str, filenames: list, file_contents: list = None, file_paths: list = None) -> pd.DataFrame:
+    files = _ingest_vcf_upload(filenames, file_contents, file_paths)
+    return _write_vcf_file_references(session_id, 'golden_set', files)
 
 
-def set_metadata_cache_as_df(session_id: str, filenames: list, file_contents: list, files_needed_in_metadata: list) -> pd.DataFrame:
-    cache_key = _get_metadata_cache_key(session_id)
+def get_golden_set_cache(session_id, columns: list = None, chromosomes: list = None) -> pd.DataFrame:
+    return read_parsed_vcfs(read_entry(session_id, 'golden_set_files'), columns, chromosomes)
+
+
+def iter_golden_set_partitions(session_id, columns: list = None, chromosomes: list = None):
+    return iter_parsed_vcfs(read_entry(session_id, 'golden_set_files'), columns, chromosomes)
+
+
+def get_golden_set_version(session_id) -> tuple:
+    return get_entry_version(session_id, 'golden_set_files')
+
 
+def set_metadata_cache_as_df(session_id: str, filenames: list, file_contents: list, files_needed_in_metadata: list) -> pd.DataFrame:
     data = read_b64_csv_files(filenames, file_contents)
     relevant_data = data[data['FILENAME'].isin(files_needed_in_metadata)]
-    cache.set(cache_key, relevant_data)
+    write_entry(session_id, 'metadata', relevant_data)
+    _remove_filtered_cache_entries(session_id, 'metadata')
 
     return relevant_data
 
 
 def get_metadata_cache(session_id) -> pd.DataFrame:
-    cache_key = _get_metadata_cache_key(session_id)
+    return read_entry(session_id, 'metadata')
 
-    relevant_data = cache.get(cache_key)
-    if relevant_data is None:
-        raise LookupError('The cached data has timed out.')
 
-    return relevant_data
+def get_metadata_version(session_id) -> tuple:
+    return get_entry_version(session_id, 'metadata')
 
 
 def set_regions_cache_as_df(session_id: str, filenames: list, file_contents: list) -> pd.DataFrame:
-    cache_key = _get_regions_cache_key(session_id)
-
     data = (read_b64_bed_files(filenames, file_contents)
             .sort_values(by=['START', 'END'])
             .reset_index(drop=True))
-    cache.set(cache_key, data)
+    write_entry(session_id, 'regions', data)
+    write_entry(session_id, 'regions_index', region_index_to_df(index_regions(data)))
+    _remove_filtered_cache_entries(session_id, 'regions')
 
     return data
 
 
 def get_regions_cache(session_id) -> pd.DataFrame:
-    cache_key = _get_regions_cache_key(session_id)
-
-    data = cache.get(cache_key)
-    if data is None:
-        raise LookupError('The cached data has timed out.')
-
-    return data
-
-
-def set_filename_download_cache(session_id: str, data: pd.DataFrame):
-    cache_key = _get_filename_download_cache_key(session_id)
-    cache.set(cache_key, data)
-    return
-
-
-def get_filename_download_cache(session_id) -> pd.DataFrame:
-    cache_key = _get_filename_download_cache_key(session_id)
+    return read_entry(session_id, 'regions')
 
-    data = cache.get(cache_key)
-    if data is None:
-        raise LookupError('The cached data has timed out.')
 
-    return data
-
-
-def set_metadata_download_cache(session_id: str, data: pd.DataFrame):
-    cache_key = _get_metadata_download_cache_key(session_id)
-    cache.set(cache_key, data)
-    return
+def get_regions_index_cache(session_id) -> dict:
+    return region_index_from_df(read_entry(session_id, 'regions_index'))
 
 
-def get_metadata_download_cache(session_id) -> pd.DataFrame:
-    cache_key = _get_metadata_download_cache_key(session_id)
+def get_regions_version(session_id) -> tuple:
+    return get_entry_version(session_id, 'regions')
 
-    data = cache.get(cache_key)
-    if data is None:
-        raise LookupError('The cached data has timed out.')
 
-    return data
+def set_raw_view_cache(session_id: str, view_key: str, data: pd.DataFrame):
+    write_entry(session_id, 'raw_view', data, view_key)
 
 
-def set_raw_download_cache(session_id: str, data: pd.DataFrame):
-    cache_key = _get_raw_download_cache_key(session_id)
-    cache.set(cache_key, data)
-    return
-
-
-def get_raw_download_cache(session_id) -> pd.DataFrame:
-    cache_key = _get_raw_download_cache_key(session_id)
-
-    data = cache.get(cache_key)
-    if data is None:
-        raise LookupError('The cached data has timed out.')
-
-    return data
+def get_raw_view_cache(session_id: str, view_key: str, columns: list = None, rows=None) -> pd.DataFrame:
+    return read_entry(session_id, 'raw_view', columns, key=view_key, rows=rows)
 
 
-def set_venn_figure_download_cache(session_id: str, figure_data: str):
-    cache_key = _get_venn_figure_download_cache_key(session_id)
-    cache.set(cache_key, figure_data)
-    return
+def set_raw_view_positions_cache(session_id: str, positions_key: str, positions):
+    write_entry(session_id, 'raw_view_positions', pd.DataFrame({'POSITION': positions}), positions_key)
 
 
-def get_venn_figure_download_cache(session_id) -> str:
-    cache_key = _get_venn_figure_download_cache_key(session_id)
+def get_raw_view_positions_cache(session_id: str, positions_key: str):
+    return read_entry(session_id, 'raw_view_positions', key=positions_key)['POSITION'].to_numpy()
 
-    data = cache.get(cache_key)
-    if data is None:
-        raise LookupError('The cached data has timed out.')
 
-    return data
+def set_filtered_cache(cache_key: tuple, data: pd.DataFrame):
+    size = data.memory_usage(index=True, deep=True).sum()
+    if size > config.filtered_cache_max_bytes:
+        return
 
+    with filtered_cache_lock:
+        filtered_cache.pop(cache_key, None)
+        filtered_cache[cache_key] = (data, size)
 
-def set_venn_sites_download_cache(session_id: str, data: pd.DataFrame):
-    cache_key = _get_venn_sites_download_cache_key(session_id)
-    cache.set(cache_key, data)
+        while sum(size for _, size in filtered_cache.values()) > config.filtered_cache_max_bytes:
+            filtered_cache.popitem(last=False)
     return
 
 
-def get_venn_sites_download_cache(session_id) -> pd.DataFrame:
-    cache_key = _get_venn_sites_download_cache_key(session_id)
-
-    data = cache.get(cache_key)
-    if data is None:
-        raise LookupError('The cached data has timed out.')
-
-    return data
-
+def get_filtered_cache(cache_key: tuple) -> pd.DataFrame:
+    with filtered_cache_lock:
+        if cache_key not in filtered_cache:
+            raise LookupError('The cached data has timed out.')
 
-def _get_compare_set_cache_key(session_id: str):
-    return session_id + '_compare_set'
+        filtered_cache.move_to_end(cache_key)
+        data, _ = filtered_cache[cache_key]
 
+    # Callbacks add columns to what they are given, which must not leak into the cached frame
+    return data.copy(deep=False)
 
-def _get_golden_set_cache_key(session_id: str):
-    return session_id + '_golden_set'
 
+def _ingest_vcf_upload(filenames: list, file_contents: list, file_paths: list) -> pd.DataFrame:
+    # Staged uploads arrive through the chunked upload endpoint, everything else as base64 contents
+    if file_paths is not None:
+        return ingest_staged_vcf_files(filenames, file_paths)
+    return ingest_b64_vcf_files(filenames, file_contents)
 
-def _get_metadata_cache_key(session_id: str):
-    return session_id + '_metadata'
 
+def _write_vcf_file_references(session_id: str, dataset_name: str, files: pd.DataFrame) -> pd.DataFrame:
+    # Sessions store which parsed files make up their variant set, not the variants themselves
+    files = (
+        files
+        .drop_duplicates('FILENAME', keep='last')
+        .sort_values(by='FILENAME')
+        .reset_index(drop=True)
+    )
 
-def _get_regions_cache_key(session_id: str):
-    return session_id + '_regions'
+    write_entry(session_id, dataset_name + '_files', files)
+    touch_parsed_files(files['DIGEST'])
+    evict_parsed_files(files['DIGEST'], _get_referenced_digests)
+    _remove_filtered_cache_entries(session_id, dataset_name)
 
+    return files
 
-def _get_filename_download_cache_key(session_id: str):
-    return session_id + '_filename_download'
 
+def _get_referenced_digests() -> set:
+    digests = set()
+    for session_id in get_session_ids():
+        for dataset_name in ('compare_set', 'golden_set'):
+            try:
+                digests.update(read_entry(session_id, dataset_name + '_files', ['DIGEST'], touch=False)['DIGEST'])
+            except LookupError:
+                pass
 
-def _get_metadata_download_cache_key(session_id: str):
-    return session_id + '_metadata_download'
+    return digests
 
 
-def _get_raw_download_cache_key(session_id: str):
-    return session_id + '_raw_download'
-
-
-def _get_venn_figure_download_cache_key(session_id: str):
-    return session_id + '_venn_figure_download'
-
-
-def _get_venn_sites_download_cache_key(session_id: str):
-    return session_id + '_venn_sites_download'
+def _remove_filtered_cache_entries(session_id: str, dataset_name: str):
+    with filtered_cache_lock:
+        for cache_key in [key for key in filtered_cache if key[0] == session_id and dataset_name in key[1]]:
+            del filtered_cache[cache_key]
+    return
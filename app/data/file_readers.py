@@ -1,3 +1,5 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from io import BytesIO
 import os
 from base64 import b64encode, b64decode
@@ -5,62 +7,109 @@ from gzip import GzipFile
 from zipfile import ZipFile
 import warnings
 
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 
 import allel
 
+import config
+from data.parsed_files import get_file_digest, get_parsed_file_length, get_parsed_file_partitions, parse_file_once, read_parsed_file
+from data.variants import standard_chroms, prepend_chr, normalise_chroms, pack_variant_ids, drop_duplicate_variants
 
-def read_vcf(file: BytesIO) -> pd.DataFrame:
-    fields = ['variants/CHROM', 'variants/POS', 'variants/REF', 'variants/ALT', 'variants/FILTER_PASS']
+
+vcf_fields = ['variants/CHROM', 'variants/POS', 'variants/REF', 'variants/ALT', 'variants/FILTER_PASS']
+
+
+def read_vcf(file: BytesIO, chunk_length: int = None) -> pd.DataFrame:
+    variants = []
+    any_pass = False
 
     with warnings.catch_warnings():
         warnings.simplefilter('ignore')
-        df = allel.vcf_to_dataframe(file, fields)
 
-    if df is None:
+        if chunk_length is None:
+            df = allel.vcf_to_dataframe(file, vcf_fields)
+            chunks = [] if df is None else [df]
+        else:
+            chunks = _iter_vcf_chunks(file, chunk_length)
+
+        for chunk in chunks:
+            chunk_variants = _format_variants(chunk)
+            any_pass = any_pass or chunk_variants['FILTER_PASS'].any()
+            variants.append(chunk_variants)
+
+    if not variants:
         return pd.DataFrame()
-    else:
-        all_read_columns = df.columns.values
-        unwanted_columns = [column for column in ['ALT_2', 'ALT_3'] if column in all_read_columns]
 
-        for column in unwanted_columns:
-            df[column] = df[column].fillna('')
-        df['ALT'] = df['ALT_1'].str.cat([df[column] for column in unwanted_columns])
+    chroms = union_categoricals([chunk_variants['CHROM'] for chunk_variants in variants])
+    df = pd.concat([chunk_variants.drop(columns=['CHROM']) for chunk_variants in variants], ignore_index=True)
+    df.insert(0, 'CHROM', chroms)
+
+    if not any_pass:
+        df['FILTER_PASS'] = True
+
+    return drop_duplicate_variants(df).reset_index(drop=True)
+
+
+def _iter_vcf_chunks(file: BytesIO, chunk_length: int):
+    _, _, _, chunks = allel.iter_vcf_chunks(file, vcf_fields, samples=[], chunk_length=chunk_length)
+
+    for chunk, _, _, _ in chunks:
+        alts = chunk['variants/ALT']
+
+        yield pd.DataFrame({
+            'CHROM': chunk['variants/CHROM'],
+            'POS': chunk['variants/POS'],
+            'REF': chunk['variants/REF'],
+            **{f'ALT_{i + 1}': alts[:, i] for i in range(alts.shape[1])},
+            'FILTER_PASS': chunk['variants/FILTER_PASS'],
+        }).replace('', np.nan)
+
+
+def _format_variants(df: pd.DataFrame) -> pd.DataFrame:
+    all_read_columns = df.columns.values
+    unwanted_columns = [column for column in ['ALT_2', 'ALT_3'] if column in all_read_columns]
 
-        if (~df['FILTER_PASS']).all():
-            df['FILTER_PASS'] = True
+    for column in unwanted_columns:
+        df[column] = df[column].fillna('')
+    df['ALT'] = df['ALT_1'].str.cat([df[column] for column in unwanted_columns])
 
-        return df.drop(columns=unwanted_columns + ['ALT_1']).drop_duplicates(['CHROM', 'POS', 'REF', 'ALT'])
+    df = df.drop(columns=unwanted_columns + ['ALT_1'])
+    df['CHROM'] = normalise_chroms(df['CHROM'])
+    df['VID'] = pack_variant_ids(df)
+
+    return drop_duplicate_variants(df)
 
 
 def read_vcfs(files: list) -> pd.DataFrame:
-    dataframes = []
-    for filename, data in files:
-        if filename[-3:] == '.gz':
-            new_vcf = read_vcf(GzipFile(fileobj=data))
-        elif filename[-4:] == '.zip':
-            zipped_vcf = ZipFile(data)
-            new_vcf = read_vcf(BytesIO(zipped_vcf.read(zipped_vcf.namelist()[0])))
-        else:
-            new_vcf = read_vcf(data)
-        new_vcf['FILENAME'] = filename
-        dataframes.append(new_vcf)
+    file_sizes = [data.getbuffer().nbytes for _, data in files]
+    return _merge_vcfs(_map_files(_read_vcf_file, files, file_sizes))
 
+
+def _read_vcf_file(filename: str, data: BytesIO) -> pd.DataFrame:
+    if filename[-3:] == '.gz':
+        new_vcf = read_vcf(GzipFile(fileobj=data), chunk_length=config.vcf_chunk_length)
+    elif filename[-4:] == '.zip':
+        zipped_vcf = ZipFile(data)
+        new_vcf = read_vcf(BytesIO(zipped_vcf.read(zipped_vcf.namelist()[0])), chunk_length=config.vcf_chunk_length)
+    else:
+        new_vcf = read_vcf(data, chunk_length=config.vcf_chunk_length)
+    new_vcf['FILENAME'] = filename
+    return new_vcf
+
+
+def _merge_vcfs(dataframes: list) -> pd.DataFrame:
     concat_vcfs = (
         pd.concat(dataframes)
           .reset_index(drop=True)
     )
 
     # Normalise chromosome names
-    chroms = concat_vcfs['CHROM'].values
-    normalised_chroms = [prepend_chr(chrom) for chrom in chroms]
-    nonstandard_chroms = list(set(normalised_chroms).difference(standard_chroms))
-    concat_vcfs['CHROM'] = pd.Categorical(values=normalised_chroms, categories=standard_chroms + nonstandard_chroms + ['null_chr'])
-
-    # Generate key
-    vals = concat_vcfs[['CHROM', 'POS', 'REF', 'ALT']].values
-    keys = ['-'.join([row[0], str(row[1]), row[2], row[3]]) for row in vals]
-    concat_vcfs['KEY'] = keys
+    chroms = pd.Categorical(concat_vcfs['CHROM'])
+    nonstandard_chroms = [chrom for chrom in map(prepend_chr, chroms.categories) if chrom not in standard_chroms]
+    concat_vcfs['CHROM'] = normalise_chroms(chroms, categories=standard_chroms + list(dict.fromkeys(nonstandard_chroms)) + ['null_chr'])
+    concat_vcfs['VID'] = concat_vcfs.pop('VID')
 
     return (
         concat_vcfs
@@ -70,46 +119,142 @@ def read_vcfs(files: list) -> pd.DataFrame:
     )
 
 
-standard_chroms = [f'chr{i}' for i in range(1, 22 + 1)]
-standard_chroms += ['chrX',
-                 'chrY',
-                 'chrW',
-                 'chrZ',
-                 'chrM']
+def _chrom_categories(chroms) -> list:
+    nonstandard_chroms = sorted(chrom for chrom in chroms if chrom not in standard_chroms and chrom != 'null_chr')
+    return standard_chroms + nonstandard_chroms + ['null_chr']
 
 
-def extract_chrom(chrom_string: str) -> str:
-    if chrom_string in standard_chroms:
-        return chrom_string
+def _map_files(read_file, files: list, file_sizes: list) -> list:
+    if config.ingest_workers == 1 or (len(files) == 1 and file_sizes[0] < config.serial_ingest_max_bytes):
+        return [read_file(*file) for file in files]
 
-    for valid_chrom in standard_chroms:
-        if valid_chrom in chrom_string:
-            return valid_chrom
+    with ProcessPoolExecutor(max_workers=min(config.ingest_workers, len(files))) as executor:
+        return list(executor.map(read_file, *zip(*files)))
 
-    return 'null_chr'
 
+def read_b64_vcf_files(filenames: list, b64_file_contents: list) -> pd.DataFrame:
+    files = list(zip(filenames, b64_file_contents))
+    file_sizes = [len(file_content) * 3 // 4 for file_content in b64_file_contents]
+    return _merge_vcfs(_map_files(_read_b64_vcf_file, files, file_sizes))
 
-def prepend_chr(chrom: str) -> str:
-    if chrom.isdigit():
-        return 'chr' + chrom
-    return chrom
 
+def _read_b64_vcf_file(filename: str, b64_file_content: str) -> pd.DataFrame:
+    # For VCF files the type is misidentified as vCard (Virtual Contact File)
+    return _read_vcf_file(filename, BytesIO(_decode_b64_file(b64_file_content)))
 
-def read_b64_vcf_files(filenames: list, b64_file_contents: list) -> pd.DataFrame:
-    files = []
-    for (filename, file_content) in zip(filenames, b64_file_contents):
-        # For VCF files the type is misidentified as vCard (Virtual Contact File)
-        file_type, encoded_file_data = file_content.split(',')
-        file_data = b64decode(encoded_file_data + '=' * (-len(encoded_file_data) % 4))
-        files += [(filename, BytesIO(file_data))]
-    return read_vcfs(files)
+
+def _decode_b64_file(b64_file_content: str) -> bytes:
+    file_type, encoded_file_data = b64_file_content.split(',')
+    return b64decode(encoded_file_data + '=' * (-len(encoded_file_data) % 4))
+
+
+def ingest_b64_vcf_files(filenames: list, b64_file_contents: list) -> pd.DataFrame:
+    files = list(zip(filenames, b64_file_contents))
+    file_sizes = [len(file_content) * 3 // 4 for file_content in b64_file_contents]
+    return _vcf_file_references(filenames, _map_files(_ingest_b64_vcf_file, files, file_sizes))
+
+
+def _ingest_b64_vcf_file(filename: str, b64_file_content: str) -> str:
+    file = BytesIO(_decode_b64_file(b64_file_content))
+    digest = get_file_digest(file)
+    file.seek(0)
+
+    parse_file_once(digest, partial(_read_parsed_vcf_file, filename, file), 'CHROM')
+    return digest
+
+
+def ingest_staged_vcf_files(filenames: list, file_paths: list) -> pd.DataFrame:
+    files = list(zip(filenames, file_paths))
+    file_sizes = [os.path.getsize(file_path) for file_path in file_paths]
+    return _vcf_file_references(filenames, _map_files(ingest_staged_vcf_file, files, file_sizes))
+
+
+def ingest_staged_vcf_file(filename: str, file_path: str) -> str:
+    with open(file_path, 'rb') as file:
+        digest = get_file_digest(file)
+        file.seek(0)
+
+        parse_file_once(digest, partial(_read_parsed_vcf_file, filename, file), 'CHROM')
+    return digest
+
+
+def _read_parsed_vcf_file(filename: str, data: BytesIO) -> pd.DataFrame:
+    # Parsed files are shared between uploads under any name, so they are stored without FILENAME,
+    # with every chromosome category they could be merged with, and sorted as a merged set would be
+    df = _read_vcf_file(filename, data).drop(columns=['FILENAME'])
+    df['CHROM'] = df['CHROM'].cat.set_categories(_chrom_categories(df['CHROM'].cat.categories))
+    df['VID'] = df.pop('VID')
+
+    return (
+        df
+        .drop_duplicates()
+        .sort_values(by=['CHROM', 'POS'])
+        .reset_index(drop=True)
+    )
+
+
+def _vcf_file_references(filenames: list, digests: list) -> pd.DataFrame:
+    return pd.DataFrame({
+        'FILENAME': filenames,
+        'DIGEST': digests,
+        'VARIANTS': [get_parsed_file_length(digest) for digest in digests],
+    })
+
+
+def read_parsed_vcfs(references: pd.DataFrame, columns: list = None, chromosomes: list = None) -> pd.DataFrame:
+    # References are kept in FILENAME order, so concatenating the parsed files gives a set sorted
+    # by FILENAME, CHROM and POS without sorting any rows
+    file_columns = None if columns is None else [column for column in columns if column != 'FILENAME']
+    frames = [read_parsed_file(digest, file_columns, chromosomes) for digest in references['DIGEST']]
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+
+    data = pd.concat(frames, ignore_index=True)
+    if 'CHROM' in data:
+        chroms = union_categoricals([frame['CHROM'] for frame in frames])
+        data['CHROM'] = chroms.set_categories(_chrom_categories(chroms.categories))
+
+    filenames = np.repeat(references['FILENAME'].to_numpy(dtype=object), [len(frame) for frame in frames])
+    data.insert(data.columns.get_loc('VID') if 'VID' in data else len(data.columns), 'FILENAME', filenames)
+
+    return data if columns is None else data[columns]
+
+
+def iter_parsed_vcfs(references: pd.DataFrame, columns: list = None, chromosomes: list = None):
+    # Yields one file at a time, with only the given chromosomes read. Rows are labelled with their
+    # position in read_parsed_vcfs, so the concatenated partitions keep its FILENAME, CHROM and POS order
+    file_partitions = [get_parsed_file_partitions(digest) for digest in references['DIGEST']]
+    file_offsets = np.r_[0, np.cumsum(references['VARIANTS'].to_numpy())]
+    categories = _chrom_categories(set().union(*file_partitions))
+
+    for i, filename in enumerate(references['FILENAME']):
+        row_ranges = [
+            (file_offsets[i] + start, file_offsets[i] + start + length)
+            for chrom, (start, length) in file_partitions[i].items()
+            if chromosomes is None or chrom in chromosomes
+        ]
+        if not row_ranges:
+            continue
+
+        partition = read_parsed_vcfs(references.iloc[[i]], columns, chromosomes)
+        partition.index = np.concatenate([np.arange(start, end) for start, end in row_ranges])
+        if 'CHROM' in partition:
+            partition['CHROM'] = partition['CHROM'].cat.set_categories(categories)
+
+        yield filename, partition
+
+
+def concat_vcf_partitions(partitions: list) -> pd.DataFrame:
+    # Partitions from iter_parsed_vcfs share their chromosome categories, so they concatenate as categoricals
+    data = pd.concat(partitions)
+    return data if data.index.is_monotonic_increasing else data.sort_index(kind='stable')
 
 
 def read_b64_csv_files(filenames: list, b64_file_contents: list) -> pd.DataFrame:
     data = []
     for (filename, file_content) in zip(filenames, b64_file_contents):
-        file_type, encoded_file_data = file_content.split(',')
-        file_data = b64decode(encoded_file_data + '=' * (-len(encoded_file_data) % 4))
+        file_data = _decode_b64_file(file_content)
         data += [pd.read_csv(BytesIO(file_data), dtype=str)]
     return pd.concat(data).drop_duplicates('FILENAME').dropna(subset=['FILENAME']).reset_index(drop=True)
 
@@ -117,8 +262,7 @@ def read_b64_csv_files(filenames: list, b64_file_contents: list) -> pd.DataFrame
 def read_b64_bed_files(filenames: list, b64_file_contents: list) -> pd.DataFrame:
     data = []
     for (filename, file_content) in zip(filenames, b64_file_contents):
-        file_type, encoded_file_data = file_content.split(',')
-        file_data = b64decode(encoded_file_data + '=' * (-len(encoded_file_data) % 4))
+        file_data = _decode_b64_file(file_content)
         data += [pd.read_csv(
             BytesIO(file_data),
             sep='\t',
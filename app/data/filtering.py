@@ -1,10 +1,7 @@
-from concurrent.futures import ProcessPoolExecutor
-from itertools import repeat
-
 import numpy as np
 import pandas as pd
 
-from data.file_readers import read_local_bed_files
+from data.regions import index_regions, get_bundled_region_index
 
 
 def _sort_df_by_column(df: pd.DataFrame, column: str) -> pd.DataFrame:
@@ -14,39 +11,27 @@ def _sort_df_by_column(df: pd.DataFrame, column: str) -> pd.DataFrame:
         return df.sort_values(by=column)
 
 
-def _filter_vcf_with_bed_single_chrom(vcf_df: pd.DataFrame, bed_df: pd.DataFrame, outside_regions: bool) -> pd.DataFrame:
+def within_regions_mask(vcf_df: pd.DataFrame, region_index: dict) -> np.ndarray:
     mask = np.zeros(len(vcf_df), dtype=bool)
 
-    positions = vcf_df['POS'].to_numpy() - 1  # VCF indexes are 1-based, BED indexes are 0-based
-    region_starts = bed_df['START'].to_numpy()
-    region_ends = bed_df['END'].to_numpy()
-
-    current_variant_index = 0
-    current_region_index = 0
-    no_of_variants = len(vcf_df)
-    no_of_regions = len(bed_df)
-    while (current_variant_index < no_of_variants and
-           current_region_index < no_of_regions):
-        current_pos = positions[current_variant_index]
-        current_start = region_starts[current_region_index]
-        current_end = region_ends[current_region_index]
-
-        if current_pos < current_start:
-            current_variant_index += 1
-            continue
+    chroms = pd.Categorical(vcf_df['CHROM'])
+    positions = vcf_df['POS'].to_numpy(dtype=np.int64) - 1  # VCF indexes are 1-based, BED indexes are 0-based
 
-        if current_start <= current_pos < current_end:
-            mask[current_variant_index] = True
-            current_variant_index += 1
-            continue
+    variant_order = np.argsort(chroms.codes, kind='stable')
+    chrom_bounds = np.searchsorted(chroms.codes[variant_order], np.arange(len(chroms.categories) + 1))
 
-        if current_end <= current_pos:
-            current_region_index += 1
+    for code, chrom in enumerate(chroms.categories):
+        if chrom not in region_index:
             continue
 
-    final_mask = ~mask if outside_regions else mask
+        region_starts, region_ends = region_index[chrom]
+        chrom_variants = variant_order[chrom_bounds[code]:chrom_bounds[code + 1]]
+        chrom_positions = positions[chrom_variants]
 
-    return vcf_df[final_mask]
+        region_indices = np.searchsorted(region_starts, chrom_positions, side='right') - 1
+        mask[chrom_variants] = (region_indices >= 0) & (chrom_positions < region_ends[np.maximum(region_indices, 0)])
+
+    return mask
 
 
 def filter_pass(df: pd.DataFrame, filter_options: list) -> pd.DataFrame:
@@ -57,41 +42,21 @@ def filter_pass(df: pd.DataFrame, filter_options: list) -> pd.DataFrame:
 
 
 def filter_vcf_with_bed(vcf_df: pd.DataFrame, bed_df: pd.DataFrame, outside_regions: bool) -> pd.DataFrame:
-    filtered_data = []
-    to_be_calculated_vcf_dfs = []
-    to_be_calculated_bed_dfs = []
-    region_groupings = bed_df.groupby('CHROM')
-
-    for chrom, variants in vcf_df.groupby('CHROM'):
-        if chrom in region_groupings.groups:
-            current_regions = region_groupings.get_group(chrom)
-
-            for _, variants_of_file in variants.groupby('FILENAME'):
-                to_be_calculated_vcf_dfs.append(variants_of_file)
-                to_be_calculated_bed_dfs.append(current_regions)
-        else:
-            if outside_regions:
-                filtered_data.append(variants)
-
-    with ProcessPoolExecutor() as executor:
-        filtered_data += list(executor.map(
-            _filter_vcf_with_bed_single_chrom,
-            to_be_calculated_vcf_dfs,
-            to_be_calculated_bed_dfs,
-            repeat(outside_regions, len(to_be_calculated_vcf_dfs))
-        ))
-
-    if filtered_data:
-        return pd.concat(filtered_data)
-    else:
-        return pd.DataFrame()
+    return filter_vcf_with_region_index(vcf_df, index_regions(bed_df), outside_regions)
+
+
+def filter_vcf_with_region_index(vcf_df: pd.DataFrame, region_index: dict, outside_regions: bool) -> pd.DataFrame:
+    mask = within_regions_mask(vcf_df, region_index)
+    final_mask = ~mask if outside_regions else mask
+
+    return vcf_df[final_mask]
 
 
 def filter_regions(
         vcf_df: pd.DataFrame,
         genomic_regions: str,
         inside_outside_regions: list,
-        regions_data: pd.DataFrame,
+        custom_region_index: dict,
 ) -> pd.DataFrame:
     if genomic_regions == 'none':
         return vcf_df
@@ -99,18 +64,11 @@ def filter_regions(
     outside_regions = inside_outside_regions == 'outside_regions'
 
     if genomic_regions in ['custom']:
-        bed_df = regions_data
+        region_index = custom_region_index
     else:
-        bed_df = read_local_bed_files(['../BED Files/' + genomic_regions])
-
-    return filter_vcf_with_bed(vcf_df, bed_df, outside_regions)
-
-
-def filter_chromosome(vcf_df: pd.DataFrame, chromosome: str):
-    if chromosome == 'any':
-        return vcf_df
+        region_index = get_bundled_region_index(genomic_regions)
 
-    return vcf_df[vcf_df['CHROM'] == chromosome]
+    return filter_vcf_with_region_index(vcf_df, region_index, outside_regions)
 
 
 def filter_variant_type(vcf_df: pd.DataFrame, variant_type: str):
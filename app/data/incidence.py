@@ -0,0 +1,162 @@
+import weakref
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from data.variants import HASHED_VARIANT_ID, apply_variant_id_collisions, drop_duplicate_variants, find_variant_id_collisions, key_columns
+
+# File-by-variant incidence matrices, keyed by the memory behind the columns they were built from.
+# Filtered variant sets are cached and handed out as shallow copies, so every analysis of the
+# same filtered set shares one matrix, which is dropped once the set itself is garbage collected.
+incidences = {}
+incidences_lock = Lock()
+
+
+def get_variant_incidence(data: pd.DataFrame, comparing_column: str = 'VID') -> (sparse.csr_matrix, pd.Index, np.ndarray):
+    # Partitioned variant sets build their matrix on their first pass, and are compared by VID
+    if not isinstance(data, pd.DataFrame):
+        return data.get_incidence()
+
+    arrays = [_column_array(data[comparing_column]), _column_array(data['FILENAME'])]
+    cache_key = tuple(_array_identity(array) for array in arrays)
+
+    with incidences_lock:
+        if cache_key in incidences:
+            return incidences[cache_key]
+
+    incidence = build_variant_incidence(data, comparing_column)
+
+    with incidences_lock:
+        incidences[cache_key] = incidence
+    for array in arrays:
+        weakref.finalize(_base_array(array), _forget_incidence, cache_key)
+
+    return incidence
+
+
+def build_variant_incidence(data: pd.DataFrame, comparing_column: str = 'VID') -> (sparse.csr_matrix, pd.Index, np.ndarray):
+    file_codes, filenames = pd.factorize(data['FILENAME'], sort=True)
+    variant_codes, variant_ids = pd.factorize(data[comparing_column])
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(data), dtype=bool), (file_codes, variant_codes)),
+        shape=(len(filenames), len(variant_ids)),
+    )
+
+    return matrix, pd.Index(filenames), np.asarray(variant_ids)
+
+
+def accumulate_variant_incidence(partitions) -> ((sparse.csr_matrix, pd.Index, np.ndarray), pd.DataFrame):
+    # Builds what build_variant_incidence would over the concatenated partitions, from one file's
+    # partition at a time. Only each file's distinct variant IDs are kept, and hashed IDs that turn
+    # out to collide are resolved once every file has been seen, so the columns come out in the same order
+    filenames = []
+    file_variant_ids = []
+    file_hashed_variants = []
+    for filename, partition in partitions:
+        if len(partition) == 0:
+            continue
+
+        variants = drop_duplicate_variants(partition[['VID'] + key_columns])
+        variant_ids = variants['VID'].to_numpy(copy=True)
+        hashed = (variant_ids & HASHED_VARIANT_ID) != 0
+
+        filenames.append(filename)
+        file_variant_ids.append(variant_ids)
+        file_hashed_variants.append((np.flatnonzero(hashed), variants.loc[hashed]))
+
+    collisions = find_variant_id_collisions(*[hashed_variants for _, hashed_variants in file_hashed_variants])
+    if not collisions.empty:
+        for variant_ids, (hashed_positions, hashed_variants) in zip(file_variant_ids, file_hashed_variants):
+            variant_ids[hashed_positions] = apply_variant_id_collisions([hashed_variants], collisions)[0]['VID'].to_numpy()
+
+    file_codes, filenames = pd.factorize(
+        np.repeat(np.array(filenames, dtype=object), [len(variant_ids) for variant_ids in file_variant_ids]),
+        sort=True
+    )
+    variant_codes, variant_ids = pd.factorize(
+        np.concatenate(file_variant_ids) if file_variant_ids else np.array([], dtype=np.uint64)
+    )
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(variant_codes), dtype=bool), (file_codes, variant_codes)),
+        shape=(len(filenames), len(variant_ids)),
+    )
+
+    return (matrix, pd.Index(filenames), np.asarray(variant_ids)), collisions
+
+
+def iter_unique_variants(data: pd.DataFrame, comparing_column: str = 'VID'):
+    # Yields variants where they first appear, with their columns in the incidence matrix
+    if not isinstance(data, pd.DataFrame):
+        yield from data.iter_unique_variants()
+        return
+
+    variants = data.drop_duplicates(comparing_column)
+    yield variants, np.arange(len(variants))
+
+
+def group_variant_incidence(
+        incidence: (sparse.csr_matrix, pd.Index, np.ndarray),
+        sets_files: list,
+        grouping_method: str,
+) -> sparse.csr_matrix:
+    matrix, filenames, _ = incidence
+
+    # Group-by-file membership, so one product counts how many files of each group carry each variant
+    group_rows = []
+    file_columns = []
+    for i, set_files in enumerate(sets_files):
+        file_indices = filenames.get_indexer(pd.unique(np.asarray(set_files)))
+        file_indices = file_indices[file_indices >= 0]
+        group_rows.append(np.full(len(file_indices), i))
+        file_columns.append(file_indices)
+
+    group_rows = np.concatenate(group_rows) if group_rows else np.array([], dtype=int)
+    file_columns = np.concatenate(file_columns) if file_columns else np.array([], dtype=int)
+    membership = sparse.csr_matrix(
+        (np.ones(len(group_rows), dtype=np.int32), (group_rows, file_columns)),
+        shape=(len(sets_files), len(filenames)),
+    )
+
+    file_counts = (membership @ matrix.astype(np.int32)).tocsr()
+    set_sizes = np.array([len(set_files) for set_files in sets_files])
+
+    if grouping_method == 'union':
+        thresholds = np.zeros(len(sets_files), dtype=np.int64)
+    elif grouping_method == 'inter':
+        thresholds = set_sizes - 1
+    elif grouping_method == 'major':
+        thresholds = set_sizes // 2
+    else:
+        raise ValueError(f'Unexpected grouping method ` {grouping_method} `.')
+
+    row_thresholds = np.repeat(thresholds, np.diff(file_counts.indptr))
+    file_counts.data = file_counts.data > row_thresholds
+    file_counts.eliminate_zeros()
+
+    return file_counts.astype(bool)
+
+
+def _column_array(column: pd.Series) -> np.ndarray:
+    values = column.array
+    if isinstance(values, pd.Categorical):
+        return values.codes
+    return column.to_numpy(copy=False)
+
+
+def _base_array(array: np.ndarray) -> np.ndarray:
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def _array_identity(array: np.ndarray) -> tuple:
+    return id(_base_array(array)), array.__array_interface__['data'][0], array.shape, array.strides
+
+
+def _forget_incidence(cache_key: tuple):
+    with incidences_lock:
+        incidences.pop(cache_key, None)
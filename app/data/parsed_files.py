@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import time
+
+import diskcache
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import config
+
+PARSED_FILES_CONFIG = {
+    'PARSED_FILES_DIR': os.path.join(config.shared_directory, 'parsed_files'),
+    'PARSED_FILES_STATS_DIR': os.path.join(config.shared_directory, 'parsed_files_stats'),
+    'PARSED_FILES_DEFAULT_TIMEOUT': 24*60*60,
+    'PARSED_FILES_PARSE_TIMEOUT': 60*60,
+    'PARSED_FILES_CODEC': 'lz4',
+}
+eviction_reasons = ('expired', 'unreferenced', 'budget')
+
+# Eviction counters are shared by the web process and the job processes
+parsed_files_stats = diskcache.Cache(PARSED_FILES_CONFIG['PARSED_FILES_STATS_DIR'])
+
+
+def get_file_digest(file) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    for block in iter(lambda: file.read(2**20), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_file_once(digest: str, parse_file, partition_column: str):
+    # Files are keyed by their bytes, so a file is parsed once and then shared read-only by every
+    # session that uploads it. Concurrent uploads of the same bytes wait for the parse in flight
+    path = _get_parsed_file_path(digest)
+    marker_path = path + '.parsing'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    while not _touch(path):
+        try:
+            with open(marker_path, 'x'):
+                pass
+        except FileExistsError:
+            _remove_stale_marker(marker_path)
+            time.sleep(0.1)
+            continue
+
+        try:
+            if os.path.exists(path):
+                continue
+
+            _remove_expired_parsed_files()
+            _write_partitioned_file(parse_file(), path + '.tmp', partition_column)
+            os.replace(path + '.tmp', path)
+        finally:
+            os.remove(marker_path)
+    return
+
+
+def read_parsed_file(digest: str, columns: list = None, partitions: list = None) -> pd.DataFrame:
+    path = _get_parsed_file_path(digest)
+
+    try:
+        source = pa.memory_map(path)
+        _touch_access(path)
+    except FileNotFoundError:
+        raise LookupError('The cached data has timed out.')
+
+    with source:
+        schema = pa.ipc.open_file(source).schema
+        file_partitions = _get_partitions(schema)
+        field_indices = None if columns is None else [schema.get_field_index(column) for column in columns]
+
+        # Only the selected columns of the selected partitions are read and decompressed
+        reader = pa.ipc.open_file(source, options=pa.ipc.IpcReadOptions(included_fields=field_indices))
+        batches = [
+            reader.get_batch(batch_index)
+            for batch_index, partition in enumerate(file_partitions)
+            if partitions is None or partition in partitions
+        ]
+        return pa.Table.from_batches(batches, schema=reader.schema).to_pandas()
+
+
+def get_parsed_file_partitions(digest: str) -> dict:
+    path = _get_parsed_file_path(digest)
+
+    try:
+        _touch_access(path)
+        with pa.memory_map(path) as source:
+            return _get_partitions(pa.ipc.open_file(source).schema)
+    except FileNotFoundError:
+        raise LookupError('The cached data has timed out.')
+
+
+def get_parsed_file_length(digest: str) -> int:
+    return sum(length for _, length in get_parsed_file_partitions(digest).values())
+
+
+def evict_parsed_files(kept_digests, get_referenced_digests):
+    # Parsed files are shared by sessions, so they are held to their own budget rather than any session's.
+    # Files no session references go first, least recently read first, and the files a session has just
+    # referenced never go
+    parsed_files = _list_parsed_files()
+    total_bytes = sum(size for _, _, size in parsed_files)
+    if total_bytes <= config.parsed_files_max_bytes:
+        return
+
+    referenced_digests = set(get_referenced_digests())
+    kept_digests = set(kept_digests)
+
+    for _, digest, size in sorted(parsed_files, key=lambda parsed_file: (parsed_file[1] in referenced_digests, parsed_file[0])):
+        if total_bytes <= config.parsed_files_max_bytes:
+            break
+        if digest in kept_digests:
+            continue
+
+        try:
+            os.remove(_get_parsed_file_path(digest))
+        except FileNotFoundError:
+            continue
+
+        _record_eviction('budget' if digest in referenced_digests else 'unreferenced', size)
+        total_bytes -= size
+    return
+
+
+def get_parsed_files_stats() -> dict:
+    parsed_files = _list_parsed_files()
+
+    return {
+        'bytes': sum(size for _, _, size in parsed_files),
+        'max_bytes': config.parsed_files_max_bytes,
+        'files': len(parsed_files),
+        'evictions': {
+            reason: {
+                'entries': parsed_files_stats.get(reason + '_entries', 0),
+                'bytes': parsed_files_stats.get(reason + '_bytes', 0),
+            }
+            for reason in eviction_reasons
+        },
+    }
+
+
+def touch_parsed_files(digests: list):
+    # Sessions referencing a parsed file keep it from expiring before they do
+    for digest in digests:
+        if not _touch(_get_parsed_file_path(digest)):
+            raise LookupError('The cached data has timed out.')
+    return
+
+
+def _get_parsed_file_path(digest: str) -> str:
+    return os.path.join(PARSED_FILES_CONFIG['PARSED_FILES_DIR'], digest + '.parts.arrow')
+
+
+def _write_partitioned_file(data: pd.DataFrame, path: str, partition_column: str):
+    # Rows are sorted by the partition column and each partition is written as its own record batch,
+    # with the partitions' names, first rows and lengths kept in the schema metadata
+    values = data[partition_column].to_numpy()
+    starts = np.flatnonzero(np.r_[len(values) > 0, values[1:] != values[:-1]])
+    lengths = np.diff(np.r_[starts, len(values)])
+    partitions = [(str(values[start]), int(start), int(length)) for start, length in zip(starts, lengths)]
+
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'partitions'] = json.dumps(partitions).encode('utf-8')
+    schema = table.schema.with_metadata(metadata)
+
+    options = pa.ipc.IpcWriteOptions(compression=PARSED_FILES_CONFIG['PARSED_FILES_CODEC'])
+    with pa.ipc.new_file(path, schema, options=options) as writer:
+        for _, start, length in partitions:
+            writer.write_batch(table.slice(start, length).combine_chunks().to_batches()[0])
+
+
+def _get_partitions(schema: pa.Schema) -> dict:
+    return {partition: (start, length) for partition, start, length in json.loads(schema.metadata[b'partitions'])}
+
+
+def _touch(path: str) -> bool:
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _touch_access(path: str):
+    # Reads move the access time that eviction orders by, the mtime is when a session last referenced the file
+    stat = os.stat(path)
+    os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+
+
+def _list_parsed_files() -> list:
+    parsed_files = []
+    if not os.path.isdir(PARSED_FILES_CONFIG['PARSED_FILES_DIR']):
+        return parsed_files
+
+    for entry in os.scandir(PARSED_FILES_CONFIG['PARSED_FILES_DIR']):
+        if not entry.name.endswith('.parts.arrow'):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        parsed_files.append((stat.st_atime_ns, entry.name[:-len('.parts.arrow')], stat.st_size))
+
+    return parsed_files
+
+
+def _record_eviction(reason: str, size: int):
+    parsed_files_stats.incr(reason + '_entries')
+    parsed_files_stats.incr(reason + '_bytes', size)
+
+
+def _remove_stale_marker(marker_path: str):
+    # Markers left behind by a crashed parse would otherwise block every later upload of the file
+    try:
+        if time.time() - os.path.getmtime(marker_path) > PARSED_FILES_CONFIG['PARSED_FILES_PARSE_TIMEOUT']:
+            os.remove(marker_path)
+    except FileNotFoundError:
+        pass
+
+
+def _remove_expired_parsed_files():
+    for filename in os.listdir(PARSED_FILES_CONFIG['PARSED_FILES_DIR']):
+        path = os.path.join(PARSED_FILES_CONFIG['PARSED_FILES_DIR'], filename)
+        try:
+            stat = os.stat(path)
+            if filename.endswith('.arrow') and time.time() - stat.st_mtime > PARSED_FILES_CONFIG['PARSED_FILES_DEFAULT_TIMEOUT']:
+                os.remove(path)
+                _record_eviction('expired', stat.st_size)
+        except FileNotFoundError:
+            pass
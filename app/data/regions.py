@@ -0,0 +1,153 @@
+import os
+from hashlib import blake2b
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+from data.file_readers import read_local_bed_files
+
+BUNDLED_REGIONS_DIR = '../BED Files'
+REGION_INDEX_DIR = './__pycache__/regions'
+
+# Merged bundled region sets by filename, alongside the (mtime, size) of the BED they were built from
+region_indices = {}
+region_indices_lock = Lock()
+
+
+def bundled_region_sets() -> list:
+    if not os.path.isdir(BUNDLED_REGIONS_DIR):
+        return []
+
+    return sorted(filename for filename in os.listdir(BUNDLED_REGIONS_DIR) if filename[0] != '.')
+
+
+def bundled_regions_path(name: str) -> str:
+    return os.path.join(BUNDLED_REGIONS_DIR, name)
+
+
+def index_regions(bed_df: pd.DataFrame) -> dict:
+    region_index = {}
+    bed_df = bed_df[bed_df['START'] < bed_df['END']]
+
+    for chrom, regions in bed_df.groupby('CHROM', sort=False):
+        starts = regions['START'].to_numpy(dtype=np.int64)
+        ends = regions['END'].to_numpy(dtype=np.int64)
+
+        order = np.lexsort((ends, starts))
+        starts, ends = starts[order], ends[order]
+
+        # An interval opens a new merged region when it starts after everything before it has ended
+        opens_region = np.ones(len(starts), dtype=bool)
+        opens_region[1:] = starts[1:] > np.maximum.accumulate(ends)[:-1]
+        region_indices = np.flatnonzero(opens_region)
+
+        region_index[chrom] = (starts[region_indices], np.maximum.reduceat(ends, region_indices))
+
+    return region_index
+
+
+def region_index_to_df(region_index: dict) -> pd.DataFrame:
+    return pd.DataFrame({
+        'CHROM': np.repeat(list(region_index), [len(starts) for starts, _ in region_index.values()]),
+        'START': np.concatenate([starts for starts, _ in region_index.values()] or [np.array([], dtype=np.int64)]),
+        'END': np.concatenate([ends for _, ends in region_index.values()] or [np.array([], dtype=np.int64)]),
+    })
+
+
+def region_index_from_df(df: pd.DataFrame) -> dict:
+    return {
+        chrom: (regions['START'].to_numpy(dtype=np.int64), regions['END'].to_numpy(dtype=np.int64))
+        for chrom, regions in df.groupby('CHROM', sort=False)
+    }
+
+
+def get_bundled_region_index(name: str) -> dict:
+    path = bundled_regions_path(name)
+    stat = os.stat(path)
+    source_version = (stat.st_mtime_ns, stat.st_size)
+
+    with region_indices_lock:
+        if name in region_indices and region_indices[name][0] == source_version:
+            return region_indices[name][1]
+
+    region_index = _read_region_index_sidecar(name, path, source_version)
+    if region_index is None:
+        region_index = index_regions(read_local_bed_files([path]))
+        _write_region_index_sidecar(name, region_index, source_version, _file_digest(path))
+
+    with region_indices_lock:
+        region_indices[name] = (source_version, region_index)
+
+    return region_index
+
+
+def _get_sidecar_path(name: str) -> str:
+    return os.path.join(REGION_INDEX_DIR, name + '.npz')
+
+
+def _file_digest(path: str) -> str:
+    digest = blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(2**20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_region_index_sidecar(name: str, path: str, source_version: tuple) -> dict:
+    sidecar_path = _get_sidecar_path(name)
+    if not os.path.exists(sidecar_path):
+        return None
+
+    with np.load(sidecar_path) as sidecar:
+        sidecar_version = tuple(sidecar['source_version'].tolist())
+        digest = str(sidecar['digest'])
+        chroms = sidecar['chroms'].tolist()
+        bounds = sidecar['bounds']
+        starts = sidecar['starts']
+        ends = sidecar['ends']
+
+    # A touched but unchanged BED keeps its sidecar, which is restamped with the new mtime
+    if sidecar_version != source_version:
+        if digest != _file_digest(path):
+            return None
+        _restamp_region_index_sidecar(sidecar_path, source_version)
+
+    return {
+        chrom: (starts[bounds[i]:bounds[i + 1]], ends[bounds[i]:bounds[i + 1]])
+        for i, chrom in enumerate(chroms)
+    }
+
+
+def _write_region_index_sidecar(name: str, region_index: dict, source_version: tuple, digest: str):
+    os.makedirs(REGION_INDEX_DIR, exist_ok=True)
+
+    region_index_df = region_index_to_df(region_index)
+    bounds = np.cumsum([0] + [len(starts) for starts, _ in region_index.values()])
+
+    _save_sidecar(
+        _get_sidecar_path(name),
+        source_version=np.array(source_version, dtype=np.int64),
+        digest=np.array(digest),
+        chroms=np.array(list(region_index), dtype=str),
+        bounds=bounds,
+        starts=region_index_df['START'].to_numpy(),
+        ends=region_index_df['END'].to_numpy(),
+    )
+    return
+
+
+def _restamp_region_index_sidecar(sidecar_path: str, source_version: tuple):
+    with np.load(sidecar_path) as sidecar:
+        arrays = {key: sidecar[key] for key in sidecar.files}
+
+    arrays['source_version'] = np.array(source_version, dtype=np.int64)
+    _save_sidecar(sidecar_path, **arrays)
+    return
+
+
+def _save_sidecar(sidecar_path: str, **arrays):
+    with open(sidecar_path + '.tmp', 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(sidecar_path + '.tmp', sidecar_path)
+    return
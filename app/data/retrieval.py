@@ -1,15 +1,52 @@
+import json
+
+import numpy as np
 import pandas as pd
 from dash import html
+from scipy import sparse
 
 import data.filtering
 from callbacks.helpers import large_centered_text
 from data.cache import (
     get_compare_set_cache,
+    iter_compare_set_partitions,
+    get_compare_set_version,
     get_golden_set_cache,
+    iter_golden_set_partitions,
+    get_golden_set_version,
     get_metadata_cache,
+    get_metadata_version,
     get_regions_cache,
+    get_regions_index_cache,
+    get_regions_version,
+    get_filtered_cache,
+    set_filtered_cache,
+    get_raw_view_cache,
+    set_raw_view_cache,
+    get_raw_view_positions_cache,
+    set_raw_view_positions_cache,
 )
-from data.filtering import filter_pass, filter_regions, filter_chromosome, filter_variant_type
+from data.file_readers import concat_vcf_partitions, read_local_bed_files
+from data.filtering import filter_pass, filter_regions, filter_variant_type
+from data.regions import bundled_regions_path
+from data.incidence import accumulate_variant_incidence
+from data.table_view import table_view_frame, table_view_positions
+from data.variants import apply_variant_id_collisions, find_variant_id_collisions, key_columns
+
+# Datasets each raw view is read from. Uploads run in job processes, whose evictions never reach this
+# process's cache, so their versions are part of every persisted view's and row order's key
+raw_view_datasets = {
+    'compare_set': ('compare_set', 'regions'),
+    'golden_set': ('golden_set',),
+    'metadata': ('metadata',),
+    'regions': ('regions',),
+}
+dataset_version_getters = {
+    'compare_set': get_compare_set_version,
+    'golden_set': get_golden_set_version,
+    'metadata': get_metadata_version,
+    'regions': get_regions_version,
+}
 
 
 def get_uploaded_data(
@@ -23,13 +60,16 @@ def get_uploaded_data(
         inside_outside_regions: list = (),
         on_chromosome: str = 'any',
         variant_type: str = 'all',
+        columns: list = None,
+        partitioned: bool = False,
 ) -> (list, list, bool):
     data = []
     notices = []
     any_invalidity = False
 
+    # Custom regions are only applied once they have been uploaded, bundled ones always are
     regions = pd.DataFrame()
-    regions_invalidity = True
+    regions_invalidity = genomic_regions in ['custom']
     if regions_valid and (genomic_regions in ['custom'] or
        (compare_set_valid, golden_set_valid, metadata_valid).count(None) == 3):
         (
@@ -43,6 +83,14 @@ def get_uploaded_data(
         notices.append(regions_notice)
         any_invalidity = any_invalidity or regions_invalidity
 
+    # Variant IDs are only settled with the columns their KEYs are built from, which are dropped again after
+    variant_set_columns = columns
+    if columns is not None and 'VID' in columns:
+        variant_set_columns = list(dict.fromkeys(list(columns) + key_columns))
+
+    variant_set_indices = []
+    variant_set_names = []
+
     compare_set_filenames = None
     if compare_set_valid:
         (
@@ -55,17 +103,22 @@ def get_uploaded_data(
             filter_options,
             genomic_regions,
             inside_outside_regions,
-            regions,
             regions_invalidity,
             on_chromosome,
             variant_type,
+            variant_set_columns,
+            partitioned,
         )
 
+        variant_set_indices.append(len(data))
+        variant_set_names.append('compare_set')
         data.append(compare_set)
         notices.append(compare_set_notice)
         any_invalidity = any_invalidity or compare_set_invalidity
 
-        if compare_set is not None:
+        if isinstance(compare_set, FilteredVariantSet):
+            compare_set_filenames = compare_set.get_incidence()[1].tolist()
+        elif compare_set is not None:
             compare_set_filenames = compare_set['FILENAME'].unique().tolist()
 
     if golden_set_valid:
@@ -79,16 +132,40 @@ def get_uploaded_data(
             filter_options,
             genomic_regions,
             inside_outside_regions,
-            regions,
             regions_invalidity,
             on_chromosome,
             variant_type,
+            variant_set_columns,
         )
 
+        variant_set_indices.append(len(data))
+        variant_set_names.append('golden_set')
         data.append(golden_set)
         notices.append(golden_set_notice)
         any_invalidity = any_invalidity or golden_set_invalidity
 
+    # Partitioned variant sets settle their colliding IDs themselves, as they are read
+    variant_set_names = [
+        name for index, name in zip(variant_set_indices, variant_set_names) if isinstance(data[index], pd.DataFrame)
+    ]
+    variant_set_indices = [index for index in variant_set_indices if isinstance(data[index], pd.DataFrame)]
+    if variant_set_columns is None or 'VID' in variant_set_columns:
+        collisions = _get_variant_id_collisions(
+            session_id,
+            variant_set_names,
+            [data[index] for index in variant_set_indices],
+            filter_options,
+            genomic_regions,
+            inside_outside_regions,
+            regions_invalidity,
+            on_chromosome,
+            variant_type,
+            variant_set_columns,
+        )
+        resolved_variant_sets = apply_variant_id_collisions([data[index] for index in variant_set_indices], collisions)
+        for index, variant_set in zip(variant_set_indices, resolved_variant_sets):
+            data[index] = variant_set if columns is None else variant_set[columns]
+
     if metadata_valid:
         (
             metadata,
@@ -103,16 +180,133 @@ def get_uploaded_data(
     return data, notices, any_invalidity
 
 
+def get_raw_data(
+        session_id: str,
+        set_selection: str,
+        compare_set_valid: str = None,
+        golden_set_valid: str = None,
+        metadata_valid: str = None,
+        regions_valid: str = None,
+        filter_options: list = ('filter_pass',),
+        genomic_regions: str = 'none',
+        inside_outside_regions: list = (),
+        on_chromosome: str = 'any',
+        variant_type: str = 'all',
+) -> (pd.DataFrame, list, bool):
+    if set_selection == 'compare_set':
+        (
+            (data,),
+            notices,
+            any_invalidity
+        ) = get_uploaded_data(
+            session_id,
+            compare_set_valid=compare_set_valid,
+            regions_valid=regions_valid,
+            filter_options=filter_options,
+            genomic_regions=genomic_regions,
+            inside_outside_regions=inside_outside_regions,
+            on_chromosome=on_chromosome,
+            variant_type=variant_type,
+        )
+
+    elif set_selection == 'golden_set':
+        (
+            (data,),
+            notices,
+            any_invalidity
+        ) = get_uploaded_data(session_id, golden_set_valid=golden_set_valid)
+
+    elif set_selection == 'metadata':
+        (
+            (data,),
+            notices,
+            any_invalidity
+        ) = get_uploaded_data(session_id, metadata_valid=metadata_valid)
+
+    elif genomic_regions in ['none', 'custom']:
+        (
+            (data,),
+            notices,
+            any_invalidity
+        ) = get_uploaded_data(session_id, regions_valid=regions_valid)
+
+    else:
+        data = read_local_bed_files([bundled_regions_path(genomic_regions)])
+        notices = []
+        any_invalidity = False
+
+    return data, notices, any_invalidity
+
+
+def set_raw_view(session_id: str, view_key: str, data: pd.DataFrame):
+    # The view is kept uncompressed in the session store, so pages, sorts and filters memory-map it
+    # instead of reading and filtering the datasets again
+    try:
+        get_raw_view_cache(session_id, view_key, columns=[])
+    except LookupError:
+        set_raw_view_cache(session_id, view_key, data)
+    return
+
+
+def get_raw_view_key(session_id: str, raw_view: dict) -> str:
+    # Taken before the data is read, so an upload in between leaves the view under a key never asked for again
+    return json.dumps([raw_view, _get_raw_view_versions(session_id, raw_view['set_selection'])], sort_keys=True)
+
+
+def get_raw_view_positions(session_id: str, raw_view: dict, sort_by: list, filter_query: str) -> np.ndarray:
+    view_key = get_raw_view_key(session_id, raw_view)
+    if not sort_by and not filter_query:
+        return np.arange(len(_get_raw_view_rows(session_id, raw_view, view_key, columns=[])))
+
+    positions_key = json.dumps([view_key, sort_by, filter_query], sort_keys=True)
+    try:
+        return get_raw_view_positions_cache(session_id, positions_key)
+    except LookupError:
+        pass
+
+    positions = table_view_positions(_get_raw_view_rows(session_id, raw_view, view_key), sort_by, filter_query)
+    set_raw_view_positions_cache(session_id, positions_key, positions)
+
+    return positions
+
+
+def get_raw_view_page(session_id: str, raw_view: dict, page_current: int, page_size: int, sort_by: list, filter_query: str) -> (list, int):
+    positions = get_raw_view_positions(session_id, raw_view, sort_by, filter_query)
+    page_positions = positions[page_current * page_size:(page_current + 1) * page_size]
+    rows = _get_raw_view_rows(session_id, raw_view, get_raw_view_key(session_id, raw_view), rows=page_positions)
+
+    return table_view_frame(rows, page_positions).to_dict('records'), max(-(-len(positions) // page_size), 1)
+
+
+def iter_raw_view_frames(session_id: str, raw_view: dict, positions: np.ndarray, chunk_size: int = 100_000):
+    view_key = get_raw_view_key(session_id, raw_view)
+    for start in range(0, max(len(positions), 1), chunk_size):
+        chunk_positions = positions[start:start + chunk_size]
+        yield table_view_frame(_get_raw_view_rows(session_id, raw_view, view_key, rows=chunk_positions), chunk_positions)
+
+
+def get_dataset_versions(session_id: str, dataset_names) -> dict:
+    versions = {}
+    for dataset_name in dataset_names:
+        try:
+            versions[dataset_name] = dataset_version_getters[dataset_name](session_id)
+        except LookupError:
+            versions[dataset_name] = None
+
+    return versions
+
+
 def get_uploaded_compare_set(
         session_id: str,
         compare_set_valid: str,
         pass_filter: list,
         genomic_regions: str,
         inside_outside_regions: list,
-        regions_data: pd.DataFrame,
         regions_invalidity: bool,
         on_chromosome: str,
         variant_type: str,
+        columns: list = None,
+        partitioned: bool = False,
 ) -> (pd.DataFrame, html.H3, bool):
     compare_set = None
     notice = None
@@ -120,7 +314,21 @@ def get_uploaded_compare_set(
 
     if compare_set_valid == 'compare_set_is_valid':
         try:
-            compare_set = get_compare_set_cache(session_id)
+            filtered_compare_set = _get_filtered_variant_set(
+                session_id,
+                'compare_set',
+                get_compare_set_cache,
+                iter_compare_set_partitions,
+                get_compare_set_version,
+                pass_filter,
+                genomic_regions,
+                inside_outside_regions,
+                regions_invalidity,
+                on_chromosome,
+                variant_type,
+                columns,
+                partitioned,
+            )
         except LookupError as e:
             invalidity = True
             notice = large_centered_text('Compare set has expired.')
@@ -130,21 +338,11 @@ def get_uploaded_compare_set(
 
     ordered_filtered_compare_set = None
     if not invalidity:
-        pass_filtered_compare_set = filter_pass(compare_set, pass_filter)
-        stringent_filtered_compare_set = filter_regions(
-            pass_filtered_compare_set,
-            genomic_regions,
-            inside_outside_regions,
-            regions_data
-        ) if not regions_invalidity else pass_filtered_compare_set
-        chrom_stringent_pass_filtered_compare_set = filter_chromosome(stringent_filtered_compare_set, on_chromosome)
-        type_chrom_stringent_pass_filtered_compare_set = filter_variant_type(chrom_stringent_pass_filtered_compare_set, variant_type)
-
-        if len(type_chrom_stringent_pass_filtered_compare_set) == 0:
+        if len(filtered_compare_set) == 0:
             invalidity = True
             notice = large_centered_text('Zero variants. Try different options.')
         else:
-            ordered_filtered_compare_set = type_chrom_stringent_pass_filtered_compare_set
+            ordered_filtered_compare_set = filtered_compare_set
 
     return ordered_filtered_compare_set, notice, invalidity
 
@@ -155,10 +353,10 @@ def get_uploaded_golden_set(
         pass_filter: list,
         genomic_regions: str,
         inside_outside_regions: list,
-        regions_data: pd.DataFrame,
         regions_invalidity: bool,
         on_chromosome: str,
         variant_type: str,
+        columns: list = None,
 ) -> (pd.DataFrame, html.H3, bool):
     golden_set = None
     notice = None
@@ -166,7 +364,20 @@ def get_uploaded_golden_set(
 
     if valid == 'golden_set_is_valid':
         try:
-            golden_set = get_golden_set_cache(session_id)
+            filtered_golden_set = _get_filtered_variant_set(
+                session_id,
+                'golden_set',
+                get_golden_set_cache,
+                iter_golden_set_partitions,
+                get_golden_set_version,
+                pass_filter,
+                genomic_regions,
+                inside_outside_regions,
+                regions_invalidity,
+                on_chromosome,
+                variant_type,
+                columns,
+            )
         except LookupError as e:
             invalidity = True
             notice = large_centered_text('Golden set has expired.')
@@ -176,21 +387,11 @@ def get_uploaded_golden_set(
 
     ordered_filtered_golden_set = None
     if not invalidity:
-        pass_filtered_golden_set = filter_pass(golden_set, pass_filter)
-        stringent_filtered_golden_set = filter_regions(
-            pass_filtered_golden_set,
-            genomic_regions,
-            inside_outside_regions,
-            regions_data
-        ) if not regions_invalidity else pass_filtered_golden_set
-        chrom_stringent_pass_filtered_golden_set = filter_chromosome(stringent_filtered_golden_set, on_chromosome)
-        type_chrom_stringent_pass_filtered_golden_set = filter_variant_type(chrom_stringent_pass_filtered_golden_set, variant_type)
-
-        if len(type_chrom_stringent_pass_filtered_golden_set) == 0:
+        if len(filtered_golden_set) == 0:
             invalidity = True
             notice = large_centered_text('Zero variants. Try different options.')
         else:
-            ordered_filtered_golden_set = type_chrom_stringent_pass_filtered_golden_set
+            ordered_filtered_golden_set = filtered_golden_set
 
     return ordered_filtered_golden_set, notice, invalidity
 
@@ -234,3 +435,241 @@ def get_uploaded_regions(session_id: str, valid: str) -> (pd.DataFrame, html.H3,
         notice = large_centered_text('Genomic regions are invalid.')
 
     return regions, notice, invalidity
+
+
+def _get_filtered_variant_set(
+        session_id: str,
+        variant_set_name: str,
+        get_variant_set_cache,
+        iter_variant_set_partitions,
+        get_variant_set_version,
+        pass_filter: list,
+        genomic_regions: str,
+        inside_outside_regions: list,
+        regions_invalidity: bool,
+        on_chromosome: str,
+        variant_type: str,
+        columns: list,
+        partitioned: bool = False,
+) -> pd.DataFrame:
+    cache_key = _get_filtered_cache_key(
+        session_id,
+        variant_set_name,
+        get_variant_set_version,
+        pass_filter,
+        genomic_regions,
+        inside_outside_regions,
+        regions_invalidity,
+        on_chromosome,
+        variant_type,
+        columns,
+    )
+
+    try:
+        return get_filtered_cache(cache_key)
+    except LookupError:
+        pass
+
+    loading_columns = _filtering_columns(columns, pass_filter, genomic_regions, regions_invalidity, variant_type)
+    custom_regions_applied = genomic_regions in ['custom'] and not regions_invalidity
+    custom_region_index = get_regions_index_cache(session_id) if custom_regions_applied else None
+
+    # Only the partitions of the selected chromosome are read, and files are filtered one at a time,
+    # so the unfiltered variant set is never in memory as a whole. File partitions come out in order
+    chromosomes = None if on_chromosome == 'any' else [on_chromosome]
+
+    def iter_filtered_partitions():
+        for filename, variant_set in iter_variant_set_partitions(session_id, loading_columns, chromosomes):
+            pass_filtered_variant_set = filter_pass(variant_set, pass_filter)
+            stringent_filtered_variant_set = filter_regions(
+                pass_filtered_variant_set,
+                genomic_regions,
+                inside_outside_regions,
+                custom_region_index
+            ) if not regions_invalidity else pass_filtered_variant_set
+            filtered_partition = filter_variant_type(stringent_filtered_variant_set, variant_type)
+
+            yield filename, filtered_partition if columns is None else filtered_partition[columns]
+
+    # Analyses that only accumulate over the variants read them a file at a time, and are not cached.
+    # Their first pass is made here, so files that have timed out show up like an expired set
+    if partitioned:
+        filtered_variant_set = FilteredVariantSet(iter_filtered_partitions, lambda: get_variant_set_version(session_id))
+        filtered_variant_set.get_incidence()
+        return filtered_variant_set
+
+    filtered_partitions = [filtered_partition for _, filtered_partition in iter_filtered_partitions()]
+    if filtered_partitions:
+        filtered_variant_set = concat_vcf_partitions(filtered_partitions)
+    else:
+        filtered_variant_set = get_variant_set_cache(session_id, loading_columns, chromosomes=[])
+
+    set_filtered_cache(cache_key, filtered_variant_set)
+    return filtered_variant_set.copy(deep=False)
+
+
+class FilteredVariantSet:
+    # A filtered variant set that is read and filtered a file at a time whenever it is iterated. Its first
+    # pass builds the file-by-variant incidence and settles colliding IDs, which later passes then apply
+    def __init__(self, iter_partitions, get_version):
+        self.iter_partitions = iter_partitions
+        self.get_version = get_version
+        self.version = get_version()
+        self.incidence = None
+        self.collisions = None
+        self.length = 0
+
+    def __len__(self) -> int:
+        self.get_incidence()
+        return self.length
+
+    def __iter__(self):
+        # Every pass must read the files the first one did, which an upload since would have changed
+        if self.get_version() != self.version:
+            raise LookupError('The cached data has timed out.')
+
+        for filename, partition in self.iter_partitions():
+            if self.collisions is not None:
+                partition = apply_variant_id_collisions([partition], self.collisions)[0]
+            yield filename, partition
+
+    def get_incidence(self) -> (sparse.csr_matrix, pd.Index, np.ndarray):
+        if self.incidence is None:
+            self.length = 0
+            self.incidence, self.collisions = accumulate_variant_incidence(self._count_rows(iter(self)))
+        return self.incidence
+
+    def iter_unique_variants(self):
+        _, _, variant_ids = self.get_incidence()
+        variant_index = pd.Index(variant_ids)
+        seen = np.zeros(len(variant_ids), dtype=bool)
+
+        for _, partition in self:
+            variant_columns = variant_index.get_indexer(partition['VID'])
+            first = ~seen[variant_columns] & ~pd.Series(variant_columns).duplicated().to_numpy()
+            seen[variant_columns] = True
+            yield partition[first], variant_columns[first]
+
+    def _count_rows(self, partitions):
+        for filename, partition in partitions:
+            self.length += len(partition)
+            yield filename, partition
+
+
+def _get_filtered_cache_key(
+        session_id: str,
+        variant_set_name: str,
+        get_variant_set_version,
+        pass_filter: list,
+        genomic_regions: str,
+        inside_outside_regions: list,
+        regions_invalidity: bool,
+        on_chromosome: str,
+        variant_type: str,
+        columns: list,
+) -> tuple:
+    regions_applied = genomic_regions != 'none' and not regions_invalidity
+    custom_regions_applied = regions_applied and genomic_regions in ['custom']
+
+    # Dataset versions change on every upload, so stale results are never looked up again
+    return (
+        session_id,
+        (variant_set_name, 'regions') if custom_regions_applied else (variant_set_name,),
+        (get_variant_set_version(session_id), get_regions_version(session_id) if custom_regions_applied else None),
+        tuple(pass_filter),
+        genomic_regions if regions_applied else 'none',
+        inside_outside_regions if regions_applied else None,
+        on_chromosome,
+        variant_type,
+        tuple(columns) if columns is not None else None,
+    )
+
+
+def _get_variant_id_collisions(
+        session_id: str,
+        variant_set_names: list,
+        variant_sets: list,
+        pass_filter: list,
+        genomic_regions: str,
+        inside_outside_regions: list,
+        regions_invalidity: bool,
+        on_chromosome: str,
+        variant_type: str,
+        columns: list,
+) -> pd.DataFrame:
+    # Collisions are settled across every variant set shown together, so they are cached for the
+    # combination of filtered sets rather than with each one
+    filtered_cache_keys = tuple(
+        _get_filtered_cache_key(
+            session_id,
+            variant_set_name,
+            dataset_version_getters[variant_set_name],
+            pass_filter,
+            genomic_regions,
+            inside_outside_regions,
+            regions_invalidity,
+            on_chromosome,
+            variant_type,
+            columns,
+        )
+        for variant_set_name in variant_set_names
+    )
+    cache_key = (
+        session_id,
+        tuple(dict.fromkeys(dataset for key in filtered_cache_keys for dataset in key[1])),
+        'variant_id_collisions',
+        filtered_cache_keys,
+    )
+
+    try:
+        return get_filtered_cache(cache_key)
+    except LookupError:
+        pass
+
+    collisions = find_variant_id_collisions(*variant_sets)
+    set_filtered_cache(cache_key, collisions)
+    return collisions
+
+
+def _filtering_columns(
+        columns: list,
+        pass_filter: list,
+        genomic_regions: str,
+        regions_invalidity: bool,
+        variant_type: str,
+) -> list:
+    if columns is None:
+        return None
+
+    required_columns = list(columns)
+
+    if 'filter_pass' in pass_filter:
+        required_columns += ['FILTER_PASS']
+
+    if genomic_regions != 'none' and not regions_invalidity:
+        required_columns += ['CHROM', 'POS', 'FILENAME']
+
+    if variant_type != 'all':
+        required_columns += ['REF', 'ALT']
+
+    return list(dict.fromkeys(required_columns))
+
+
+def _get_raw_view_rows(session_id: str, raw_view: dict, view_key: str, columns: list = None, rows=None) -> pd.DataFrame:
+    try:
+        return get_raw_view_cache(session_id, view_key, columns, rows)
+    except LookupError:
+        pass
+
+    # An evicted view is read again, and persisted for the requests after this one
+    data, _, any_invalidity = get_raw_data(session_id, **raw_view)
+    if any_invalidity:
+        raise LookupError('The cached data has timed out.')
+    set_raw_view_cache(session_id, view_key, data)
+
+    data = data if columns is None else data[columns]
+    return data if rows is None else data.iloc[rows]
+
+
+def _get_raw_view_versions(session_id: str, set_selection: str) -> tuple:
+    return tuple(get_dataset_versions(session_id, raw_view_datasets[set_selection]).values())
@@ -0,0 +1,200 @@
+import errno
+import hashlib
+import os
+import re
+import shutil
+import time
+
+import diskcache
+
+import config
+
+STAGING_CONFIG = {
+    'STAGING_DIR': os.path.join(config.shared_directory, 'uploads'),
+    'STAGING_RECORDS_DIR': os.path.join(config.shared_directory, 'upload_records'),
+    'STAGING_DEFAULT_TIMEOUT': 24*60*60,
+}
+
+upload_id_pattern = re.compile(r'[A-Za-z0-9_-]{1,64}')
+session_id_pattern = re.compile(r'[0-9a-f-]{36}')
+
+# Every upload's owning session and reserved bytes, next to running totals of the reserved bytes,
+# shared by the workers of every host
+staged_uploads = diskcache.Cache(STAGING_CONFIG['STAGING_RECORDS_DIR'])
+
+
+def get_staged_size(session_id: str, upload_id: str, file_index: int) -> int:
+    path = _get_staged_path(upload_id, file_index)
+    _check_upload_owner(session_id, upload_id)
+
+    if os.path.exists(path):
+        return os.path.getsize(path)
+    if os.path.exists(path + '.part'):
+        return os.path.getsize(path + '.part')
+    return 0
+
+
+def write_staged_chunk(session_id: str, upload_id: str, file_index: int, offset: int, file_size: int, chunk) -> (int, bool):
+    path = _get_staged_path(upload_id, file_index)
+    _check_upload_owner(session_id, upload_id)
+    _reserve_staged_file(session_id, upload_id, file_index, file_size)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # A chunk that does not continue the staged bytes is dropped, and the client resumes from the returned size
+    received = get_staged_size(session_id, upload_id, file_index)
+    if os.path.exists(path) or offset != received:
+        return received, False
+
+    # Bodies are copied up to the declared file size, and one that runs past it is dropped as a whole
+    with open(path + '.part', 'ab') as file:
+        _copy_limited(chunk, file, file_size - received)
+        if chunk.read(1):
+            file.truncate(received)
+            raise ValueError(f'Chunk runs past the declared size of ` {upload_id}/{file_index} `.')
+        received = file.tell()
+
+    if received < file_size:
+        return received, False
+
+    os.replace(path + '.part', path)
+    return received, True
+
+
+def get_staged_file_paths(session_id: str, upload_id: str, file_indices) -> list:
+    paths = [_get_staged_path(upload_id, file_index) for file_index in file_indices]
+    _check_upload_owner(session_id, upload_id)
+
+    if not all(os.path.exists(path) for path in paths) or _is_expired(os.path.dirname(paths[0])):
+        raise LookupError('The uploaded files have timed out.')
+
+    return paths
+
+
+def remove_staged_upload(session_id: str, upload_id: str):
+    # Uploads staged by the server itself have no owner, and are left for the sweep
+    record = staged_uploads.get(_get_record_key(upload_id))
+    if record is not None and record['session_id'] == session_id:
+        _remove_upload(upload_id)
+    return
+
+
+def remove_expired_uploads():
+    if os.path.isdir(STAGING_CONFIG['STAGING_DIR']):
+        for upload_id in os.listdir(STAGING_CONFIG['STAGING_DIR']):
+            if _is_expired(os.path.join(STAGING_CONFIG['STAGING_DIR'], upload_id)):
+                _remove_upload(upload_id)
+
+    # Uploads whose first chunk never arrived hold a reservation but no directory
+    for key in list(staged_uploads.iterkeys()):
+        if not key.startswith('upload:'):
+            continue
+
+        upload_id = key[len('upload:'):]
+        record = staged_uploads.get(key)
+        if (record is not None and not os.path.isdir(os.path.join(STAGING_CONFIG['STAGING_DIR'], upload_id)) and
+                time.time() - record['time'] > STAGING_CONFIG['STAGING_DEFAULT_TIMEOUT']):
+            _remove_upload(upload_id)
+    return
+
+
+def get_staging_stats() -> dict:
+    return {
+        'bytes': staged_uploads.get('staged_bytes', 0),
+        'max_bytes': config.staged_uploads_max_bytes,
+        'session_max_bytes': config.staged_uploads_session_max_bytes,
+        'uploads': sum(1 for key in staged_uploads.iterkeys() if key.startswith('upload:')),
+    }
+
+
+def stage_local_files(directory: str, filenames: list) -> dict:
+    upload_id = 'local-' + hashlib.sha1('\0'.join(filenames).encode('utf-8')).hexdigest()[:16]
+
+    for file_index, filename in enumerate(filenames):
+        path = _get_staged_path(upload_id, file_index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(os.path.join(directory, filename), path)
+
+    return {'upload_id': upload_id, 'filenames': filenames}
+
+
+def _reserve_staged_file(session_id: str, upload_id: str, file_index: int, file_size: int):
+    # A file's declared size is reserved by its first chunk, and the upload is refused if that would
+    # take the staged bytes past the budget or the session past its quota
+    with staged_uploads.transact():
+        record = staged_uploads.get(_get_record_key(upload_id)) or {'session_id': session_id, 'files': {}}
+        if record['session_id'] != session_id:
+            raise PermissionError(f'Upload ` {upload_id} ` belongs to another session.')
+
+        if file_index in record['files']:
+            if record['files'][file_index] != file_size:
+                raise ValueError(f'Unexpected size of ` {upload_id}/{file_index} `.')
+            return
+
+        if (staged_uploads.get('staged_bytes', 0) + file_size > config.staged_uploads_max_bytes or
+                staged_uploads.get(_get_session_key(session_id), 0) + file_size > config.staged_uploads_session_max_bytes):
+            raise OSError(errno.ENOSPC, 'There is no room left for staged uploads.')
+
+        record['files'][file_index] = file_size
+        record['time'] = time.time()
+        staged_uploads.set(_get_record_key(upload_id), record)
+        staged_uploads.incr('staged_bytes', file_size)
+        staged_uploads.incr(_get_session_key(session_id), file_size)
+    return
+
+
+def _remove_upload(upload_id: str):
+    # Popping the record makes sure only one of several concurrent sweeps gives its bytes back
+    with staged_uploads.transact():
+        record = staged_uploads.pop(_get_record_key(upload_id))
+        if record is not None:
+            reserved = sum(record['files'].values())
+            staged_uploads.decr('staged_bytes', reserved)
+            if staged_uploads.decr(_get_session_key(record['session_id']), reserved) <= 0:
+                staged_uploads.delete(_get_session_key(record['session_id']))
+
+    shutil.rmtree(os.path.join(STAGING_CONFIG['STAGING_DIR'], upload_id), ignore_errors=True)
+    return
+
+
+def _check_upload_owner(session_id: str, upload_id: str):
+    if not session_id_pattern.fullmatch(session_id or ''):
+        raise ValueError(f'Unexpected session id ` {session_id} `.')
+
+    record = staged_uploads.get(_get_record_key(upload_id))
+    if record is not None and record['session_id'] != session_id:
+        raise PermissionError(f'Upload ` {upload_id} ` belongs to another session.')
+    return
+
+
+def _copy_limited(source, destination, limit: int):
+    while limit > 0:
+        block = source.read(min(limit, 2**20))
+        if not block:
+            return
+        destination.write(block)
+        limit -= len(block)
+
+
+def _get_staged_path(upload_id: str, file_index: int) -> str:
+    if not upload_id_pattern.fullmatch(upload_id):
+        raise ValueError(f'Unexpected upload id ` {upload_id} `.')
+
+    return os.path.join(STAGING_CONFIG['STAGING_DIR'], upload_id, str(file_index))
+
+
+def _get_record_key(upload_id: str) -> str:
+    return 'upload:' + upload_id
+
+
+def _get_session_key(session_id: str) -> str:
+    return 'session_bytes:' + session_id
+
+
+def _is_expired(path: str) -> bool:
+    # Appending to a part file leaves the upload directory's mtime be, so its files count as activity too
+    try:
+        last_activity = max([os.path.getmtime(path)] + [entry.stat().st_mtime for entry in os.scandir(path)])
+    except FileNotFoundError:
+        return True
+
+    return time.time() - last_activity > STAGING_CONFIG['STAGING_DEFAULT_TIMEOUT']
@@ -0,0 +1,190 @@
+import os
+import pickle
+from functools import partial
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+import config
+from data.store_backends import FileSessionBackend, RedisSessionBackend
+
+STORE_CONFIG = {
+    'STORE_DIR': os.path.join(config.shared_directory, 'sessions'),
+    'STORE_STATS_DIR': os.path.join(config.shared_directory, 'session_stats'),
+    'STORE_DEFAULT_TIMEOUT': 24*60*60,
+}
+
+# Arrow entries are read column by column, any other entry is pickled. Entries read by every filtering
+# callback use a fast codec or none, downloads that are read once use a denser one
+session_entries = {
+    'compare_set_files': (pd.DataFrame, 'arrow', None),
+    'golden_set_files': (pd.DataFrame, 'arrow', None),
+    'metadata': (pd.DataFrame, 'arrow', 'lz4'),
+    'regions': (pd.DataFrame, 'arrow', 'lz4'),
+    'regions_index': (pd.DataFrame, 'arrow', 'lz4'),
+    'filename_download': (pd.DataFrame, 'pickle', 'zstd'),
+    'metadata_download': (pd.DataFrame, 'pickle', 'zstd'),
+    'venn_figure_download': (str, 'pickle', None),
+    'venn_sites_download': (pd.DataFrame, 'arrow', 'zstd'),
+    'venn_regions_download': (tuple, 'pickle', 'zstd'),
+    'raw_view': (pd.DataFrame, 'arrow', None),
+    'raw_view_positions': (pd.DataFrame, 'arrow', None),
+}
+dictionary_columns = ('FILENAME', 'CHROM')
+eviction_reasons = ('expired', 'session_quota', 'budget')
+
+
+def get_session_backend():
+    # Workers on other hosts only share entries through Redis, while entries themselves are read
+    # from the shared directory wherever they do not fit in a record
+    if config.redis_url is None:
+        return FileSessionBackend(STORE_CONFIG['STORE_DIR'], STORE_CONFIG['STORE_STATS_DIR'], STORE_CONFIG['STORE_DEFAULT_TIMEOUT'])
+
+    import redis
+    return RedisSessionBackend(
+        redis.Redis.from_url(config.redis_url),
+        STORE_CONFIG['STORE_DIR'],
+        STORE_CONFIG['STORE_DEFAULT_TIMEOUT'],
+        config.session_store_redis_max_value_bytes,
+        config.session_store_file_grace_seconds,
+    )
+
+
+session_backend = get_session_backend()
+
+
+def write_entry(session_id: str, name: str, data, key: str = None):
+    entry_type, entry_format, codec = session_entries[name]
+    if not isinstance(data, entry_type):
+        raise TypeError(f'Unexpected type ` {type(data).__name__} ` for session entry ` {name} `.')
+
+    if entry_format == 'arrow':
+        table = _set_entry_key(_dictionary_encode(pa.Table.from_pandas(data, preserve_index=False)), key)
+        write = partial(feather.write_feather, table, compression=codec or 'uncompressed')
+    else:
+        write = partial(_write_pickle, data, codec=codec)
+
+    key = session_backend.write_entry(session_id, _get_entry_name(name), write)
+    _evict_entries(session_id, key)
+    return
+
+
+def read_entry(session_id: str, name: str, columns: list = None, touch: bool = True, key: str = None, rows=None):
+    # Reads that are not on behalf of the session leave its entries' place in the eviction order
+    source = session_backend.open_entry(session_id, _get_entry_name(name), touch)
+
+    try:
+        _, entry_format, codec = session_entries[name]
+        if entry_format == 'arrow':
+            # Arrow entries written with a key only stand for what the key describes, and uncompressed
+            # ones are memory-mapped, so taking a few rows only reads those rows
+            table = feather.read_table(source, columns=columns, memory_map=True)
+            if key is not None and (table.schema.metadata or {}).get(b'entry_key') != key.encode('utf-8'):
+                raise LookupError('The cached data has timed out.')
+            if rows is not None:
+                table = table.take(rows)
+            return _dictionary_decode(table).to_pandas()
+
+        with pa.input_stream(source, compression=codec) as file:
+            return pickle.load(file)
+    except FileNotFoundError:
+        raise LookupError('The cached data has timed out.')
+
+
+def get_session_ids() -> set:
+    return {session_id for _, _, session_id, _, is_expired in session_backend.list_entries() if not is_expired}
+
+
+def get_entry_version(session_id: str, name: str) -> tuple:
+    return session_backend.get_entry_version(session_id, _get_entry_name(name))
+
+
+def get_store_stats() -> dict:
+    entries = session_backend.list_entries()
+
+    return {
+        'bytes': session_backend.get_total_bytes(),
+        'max_bytes': config.session_store_max_bytes,
+        'session_max_bytes': config.session_store_session_max_bytes,
+        'entries': len(entries),
+        'sessions': len({session_id for _, _, session_id, _, _ in entries}),
+        'evictions': {
+            reason: dict(zip(('entries', 'bytes'), session_backend.get_eviction_count(reason)))
+            for reason in eviction_reasons
+        },
+    }
+
+
+def _get_entry_name(name: str) -> str:
+    _, entry_format, codec = session_entries[name]
+
+    # Pickles carry no header naming their codec, so a codec change must not read an older entry
+    suffix = '.arrow' if entry_format == 'arrow' else '.pickle' + ('.' + codec if codec else '')
+    return name + suffix
+
+
+def _write_pickle(data, path: str, codec: str = None):
+    with pa.output_stream(path, compression=codec) as file:
+        pickle.dump(data, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _dictionary_encode(table: pa.Table) -> pa.Table:
+    # Filenames and chromosomes repeat on every row, so string columns are stored as dictionaries
+    # and decoded again on read, leaving categorical columns as they were written
+    encoded_columns = []
+    for column_name in dictionary_columns:
+        if column_name in table.column_names and pa.types.is_string(table.schema.field(column_name).type):
+            column_index = table.schema.get_field_index(column_name)
+            table = table.set_column(column_index, column_name, table.column(column_name).dictionary_encode())
+            encoded_columns.append(column_name)
+
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'dictionary_encoded'] = ','.join(encoded_columns).encode('utf-8')
+    return table.replace_schema_metadata(metadata)
+
+
+def _set_entry_key(table: pa.Table, key: str) -> pa.Table:
+    if key is None:
+        return table
+
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'entry_key'] = key.encode('utf-8')
+    return table.replace_schema_metadata(metadata)
+
+
+def _dictionary_decode(table: pa.Table) -> pa.Table:
+    encoded_columns = (table.schema.metadata or {}).get(b'dictionary_encoded', b'').decode('utf-8')
+    for column_name in filter(None, encoded_columns.split(',')):
+        if column_name in table.column_names:
+            column_index = table.schema.get_field_index(column_name)
+            table = table.set_column(column_index, column_name, table.column(column_name).cast(pa.string()))
+    return table
+
+
+def _evict_entries(session_id: str, written_key: str):
+    session_backend.remove_expired_entries(written_key)
+
+    # Least recently read entries go first, but never the one just written, so a write can always be read
+    # back. The backends keep running byte totals and the order entries were read in, so a write only walks
+    # the entries it evicts instead of listing the store
+    session_bytes = session_backend.get_session_bytes(session_id)
+    evictions = []
+    for key, size in session_backend.list_session_entries(session_id):
+        if session_bytes <= config.session_store_session_max_bytes:
+            break
+        elif key != written_key:
+            evictions.append((key, 'session_quota', size))
+            session_bytes -= size
+    session_backend.remove_entries(evictions)
+
+    total_bytes = session_backend.get_total_bytes()
+    evictions = []
+    for key, size in session_backend.iter_entries():
+        if total_bytes <= config.session_store_max_bytes:
+            break
+        elif key != written_key:
+            evictions.append((key, 'budget', size))
+            total_bytes -= size
+    session_backend.remove_entries(evictions)
+    return
@@ -0,0 +1,448 @@
+import os
+import time
+import uuid
+
+import diskcache
+import pyarrow as pa
+
+
+class FileSessionBackend:
+    # Entries are files in the store directory, and a file's mtime is the entry's age and version. An index
+    # beside them keeps the running byte totals and the entries in the order they were written and last
+    # read, so eviction only looks at the entries it removes
+    def __init__(self, directory: str, stats_directory: str, timeout: int):
+        self.directory = directory
+        self.timeout = timeout
+        self.index = diskcache.Cache(stats_directory, eviction_policy='none')
+
+        with self.index.transact():
+            if 'total_bytes' not in self.index:
+                self._index_entries()
+
+    def write_entry(self, session_id: str, entry_name: str, write) -> str:
+        path = os.path.join(self.directory, session_id, entry_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        write(path + '.tmp')
+        size = os.path.getsize(path + '.tmp')
+
+        with self.index.transact():
+            os.replace(path + '.tmp', path)
+            self._unindex_entry(path)
+            self._index_entry(path, session_id, size, time.time())
+        return path
+
+    def open_entry(self, session_id: str, entry_name: str, touch: bool = True) -> str:
+        path = os.path.join(self.directory, session_id, entry_name)
+        self._stat_entry(path)
+
+        if touch:
+            with self.index.transact():
+                self._touch_entry(path)
+        return path
+
+    def get_entry_version(self, session_id: str, entry_name: str) -> tuple:
+        # Entries are replaced rather than rewritten, so a re-upload always changes the inode or mtime
+        stat = self._stat_entry(os.path.join(self.directory, session_id, entry_name))
+        return stat.st_ino, stat.st_mtime_ns
+
+    def get_total_bytes(self) -> int:
+        return self.index.get('total_bytes', 0)
+
+    def get_session_bytes(self, session_id: str) -> int:
+        return self.index.get(_get_session_bytes_key(session_id), 0)
+
+    def iter_entries(self):
+        # The access order is a queue of integer keys, which sort before every other key of the index
+        for access in self.index.iterkeys():
+            if not isinstance(access, int):
+                return
+
+            path = self.index.get(access)
+            record = self.index.get(_get_record_key(path)) if path is not None else None
+            if record is not None:
+                yield path, record['size']
+
+    def list_session_entries(self, session_id: str) -> list:
+        try:
+            paths = [entry.path for entry in os.scandir(os.path.join(self.directory, session_id))]
+        except FileNotFoundError:
+            return []
+
+        entries = []
+        for path in paths:
+            record = self.index.get(_get_record_key(path))
+            if record is not None:
+                entries.append((record['access'], path, record['size']))
+
+        return [(path, size) for _, path, size in sorted(entries)]
+
+    def remove_expired_entries(self, keep_path: str):
+        # Entries expire in the order they were written, so the oldest write is the only one to look at
+        while True:
+            written, path = self.index.peek(prefix='written')
+            if path is None:
+                return
+
+            record = self.index.get(_get_record_key(path))
+            if record is not None and (time.time() - record['time'] <= self.timeout or path == keep_path):
+                return
+            elif record is None:
+                self.index.delete(written)
+            else:
+                self.remove_entries([(path, 'expired', record['size'])])
+
+    def list_entries(self) -> list:
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+
+        for session_directory in os.scandir(self.directory):
+            try:
+                directory_entries = list(os.scandir(session_directory.path))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+            for entry in directory_entries:
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime_ns, entry.path, session_directory.name, stat.st_size, self._is_expired(stat)))
+
+        return entries
+
+    def remove_entries(self, evictions: list):
+        for path, reason, _ in evictions:
+            # Only the process that takes the entry out of the index counts it, when several evict at once
+            with self.index.transact():
+                record = self._unindex_entry(path)
+                if record is None:
+                    continue
+                _remove_file(path)
+
+            self.index.incr(reason + '_entries')
+            self.index.incr(reason + '_bytes', record['size'])
+
+        session_ids = {os.path.basename(os.path.dirname(path)) for path, _, _ in evictions}
+        _remove_empty_sessions(self.directory, self.timeout, session_ids)
+        return
+
+    def get_eviction_count(self, reason: str) -> (int, int):
+        return self.index.get(reason + '_entries', 0), self.index.get(reason + '_bytes', 0)
+
+    def _index_entry(self, path: str, session_id: str, size: int, written_time: float):
+        self.index.set(_get_record_key(path), {
+            'session_id': session_id,
+            'size': size,
+            'time': written_time,
+            'access': self.index.push(path),
+            'written': self.index.push(path, prefix='written'),
+        })
+        self.index.incr('total_bytes', size)
+        self.index.incr(_get_session_bytes_key(session_id), size)
+
+    def _unindex_entry(self, path: str) -> dict:
+        record = self.index.pop(_get_record_key(path))
+        if record is None:
+            return None
+
+        self.index.delete(record['access'])
+        self.index.delete(record['written'])
+        self.index.decr('total_bytes', record['size'])
+        if self.index.decr(_get_session_bytes_key(record['session_id']), record['size']) <= 0:
+            self.index.delete(_get_session_bytes_key(record['session_id']))
+        return record
+
+    def _index_entries(self):
+        # A store written before the index existed is indexed once, by its files' mtimes and access times
+        self.index.set('total_bytes', 0)
+
+        entries = []
+        for _, path, session_id, _, _ in self.list_entries():
+            try:
+                entries.append((os.stat(path), path, session_id))
+            except FileNotFoundError:
+                continue
+
+        for stat, path, session_id in sorted(entries, key=lambda entry: entry[0].st_mtime_ns):
+            self._index_entry(path, session_id, stat.st_size, stat.st_mtime)
+
+        for _, path, _ in sorted(entries, key=lambda entry: entry[0].st_atime_ns):
+            self._touch_entry(path)
+
+    def _touch_entry(self, path: str):
+        record = self.index.get(_get_record_key(path))
+        if record is not None:
+            self.index.delete(record['access'])
+            record['access'] = self.index.push(path)
+            self.index.set(_get_record_key(path), record)
+
+    def _stat_entry(self, path: str) -> os.stat_result:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise LookupError('The cached data has timed out.')
+
+        if self._is_expired(stat):
+            raise LookupError('The cached data has timed out.')
+
+        return stat
+
+    def _is_expired(self, stat: os.stat_result) -> bool:
+        return time.time() - stat.st_mtime > self.timeout
+
+
+class RedisSessionBackend:
+    # Entry records, access and write times, byte totals and eviction counters live in Redis, so workers
+    # on every host share one store. Small pickled entries are kept in their record, anything else is
+    # written to the shared store directory under a new name and the record points at the file. A file
+    # that a record stops pointing at is only removed after a grace period, so a worker that opened the
+    # previous version on any host can still read it
+    def __init__(self, client, directory: str, timeout: int, max_value_bytes: int, grace_period: int, prefix: str = 'vcf_observer'):
+        self.client = client
+        self.directory = directory
+        self.timeout = timeout
+        self.max_value_bytes = max_value_bytes
+        self.grace_period = grace_period
+        self.prefix = prefix
+        self.access_key = prefix + ':access'
+        self.written_key = prefix + ':written'
+        self.sizes_key = prefix + ':sizes'
+        self.paths_key = prefix + ':paths'
+        self.retired_key = prefix + ':retired'
+        self.total_key = prefix + ':total_bytes'
+        self.session_sizes_key = prefix + ':session_bytes'
+        self.stats_key = prefix + ':stats'
+        self.indexed = False
+
+    def write_entry(self, session_id: str, entry_name: str, write) -> str:
+        self._check_index()
+
+        key = self._get_entry_key(session_id, entry_name)
+        version = uuid.uuid4().hex
+
+        path = os.path.join(self.directory, session_id, version + '.' + entry_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write(path)
+
+        size = os.path.getsize(path)
+        record = {'version': version, 'size': size}
+        if not entry_name.endswith('.arrow') and size <= self.max_value_bytes:
+            with open(path, 'rb') as file:
+                record['data'] = file.read()
+            os.remove(path)
+        else:
+            record['path'] = path
+
+        # Records expire on their own, while the access and write times, sizes and paths kept beside them
+        # let eviction find the files of expired records. The previous size is swapped out in the same
+        # transaction, so concurrent writes and evictions each add their own difference to the totals
+        now = time.time()
+        with self.client.pipeline() as pipeline:
+            pipeline.hget(self.sizes_key, key)
+            pipeline.hget(self.paths_key, key)
+            pipeline.delete(key)
+            pipeline.hset(key, mapping=record)
+            pipeline.expire(key, self.timeout)
+            pipeline.zadd(self.access_key, {key: now})
+            pipeline.zadd(self.written_key, {key: now})
+            pipeline.hset(self.sizes_key, key, size)
+            pipeline.sadd(self._get_session_key(session_id), key)
+            if 'path' in record:
+                pipeline.hset(self.paths_key, key, path)
+            else:
+                pipeline.hdel(self.paths_key, key)
+            previous_size, previous_path, *_ = pipeline.execute()
+
+        self._add_bytes(session_id, size - int(previous_size or 0))
+        if previous_path is not None:
+            self._retire_file(previous_path)
+        self._remove_retired_files()
+
+        return key
+
+    def open_entry(self, session_id: str, entry_name: str, touch: bool = True):
+        key = self._get_entry_key(session_id, entry_name)
+
+        record = self.client.hgetall(key)
+        if not record:
+            raise LookupError('The cached data has timed out.')
+
+        if touch:
+            self.client.zadd(self.access_key, {key: time.time()}, xx=True)
+
+        if b'data' in record:
+            return pa.py_buffer(record[b'data'])
+        return record[b'path'].decode('utf-8')
+
+    def get_entry_version(self, session_id: str, entry_name: str) -> tuple:
+        version = self.client.hget(self._get_entry_key(session_id, entry_name), 'version')
+        if version is None:
+            raise LookupError('The cached data has timed out.')
+
+        return (version.decode('utf-8'),)
+
+    def get_total_bytes(self) -> int:
+        return int(self.client.get(self.total_key) or 0)
+
+    def get_session_bytes(self, session_id: str) -> int:
+        return int(self.client.hget(self.session_sizes_key, session_id) or 0)
+
+    def iter_entries(self, batch_size: int = 100):
+        start = 0
+        while True:
+            keys = self.client.zrange(self.access_key, start, start + batch_size - 1)
+            if not keys:
+                return
+
+            for key, size in zip(keys, self.client.hmget(self.sizes_key, keys)):
+                yield key.decode('utf-8'), int(size or 0)
+            start += len(keys)
+
+    def list_session_entries(self, session_id: str) -> list:
+        keys = list(self.client.smembers(self._get_session_key(session_id)))
+
+        with self.client.pipeline(transaction=False) as pipeline:
+            for key in keys:
+                pipeline.zscore(self.access_key, key)
+                pipeline.hget(self.sizes_key, key)
+            results = pipeline.execute()
+
+        entries = [
+            (access_time, key.decode('utf-8'), int(size or 0))
+            for key, access_time, size in zip(keys, results[::2], results[1::2]) if access_time is not None
+        ]
+        return [(key, size) for _, key, size in sorted(entries)]
+
+    def remove_expired_entries(self, keep_key: str):
+        expired_keys = self.client.zrangebyscore(self.written_key, '-inf', time.time() - self.timeout)
+        self.remove_entries([(key.decode('utf-8'), 'expired', 0) for key in expired_keys if key.decode('utf-8') != keep_key])
+        return
+
+    def list_entries(self) -> list:
+        access_times = self.client.zrange(self.access_key, 0, -1, withscores=True)
+
+        with self.client.pipeline(transaction=False) as pipeline:
+            for key, _ in access_times:
+                pipeline.exists(key)
+                pipeline.hget(self.sizes_key, key)
+            results = pipeline.execute()
+
+        entries = []
+        for (key, access_time), exists, size in zip(access_times, results[::2], results[1::2]):
+            key = key.decode('utf-8')
+            entries.append((access_time, key, self._get_session_id(key), int(size or 0), not exists))
+
+        return entries
+
+    def remove_entries(self, evictions: list):
+        for key, reason, _ in evictions:
+            session_id = self._get_session_id(key)
+
+            # Only the worker whose transaction still finds the entry's size counts it, when several evict at once
+            with self.client.pipeline() as pipeline:
+                pipeline.hget(self.sizes_key, key)
+                pipeline.hget(self.paths_key, key)
+                pipeline.delete(key)
+                pipeline.zrem(self.access_key, key)
+                pipeline.zrem(self.written_key, key)
+                pipeline.hdel(self.sizes_key, key)
+                pipeline.hdel(self.paths_key, key)
+                pipeline.srem(self._get_session_key(session_id), key)
+                size, path, *_ = pipeline.execute()
+
+            if path is not None:
+                self._retire_file(path)
+
+            if size is not None:
+                self._add_bytes(session_id, -int(size))
+                self.client.hincrby(self.stats_key, reason + '_entries', 1)
+                self.client.hincrby(self.stats_key, reason + '_bytes', int(size))
+
+        _remove_empty_sessions(self.directory, self.timeout, {self._get_session_id(key) for key, _, _ in evictions})
+        return
+
+    def get_eviction_count(self, reason: str) -> (int, int):
+        entries, size = self.client.hmget(self.stats_key, reason + '_entries', reason + '_bytes')
+        return int(entries or 0), int(size or 0)
+
+    def _retire_file(self, path: bytes):
+        self.client.zadd(self.retired_key, {path: time.time()})
+        return
+
+    def _remove_retired_files(self):
+        for path in self.client.zrangebyscore(self.retired_key, '-inf', time.time() - self.grace_period):
+            _remove_file(path.decode('utf-8'))
+            self.client.zrem(self.retired_key, path)
+        return
+
+    def _add_bytes(self, session_id: str, size: int):
+        with self.client.pipeline() as pipeline:
+            pipeline.incrby(self.total_key, size)
+            pipeline.hincrby(self.session_sizes_key, session_id, size)
+            _, session_bytes = pipeline.execute()
+
+        if session_bytes <= 0:
+            self.client.hdel(self.session_sizes_key, session_id)
+        return
+
+    def _check_index(self):
+        # Entries written before the totals were kept are counted once, by the first worker to write
+        if self.indexed:
+            return
+
+        with self.client.lock(self.prefix + ':index_lock', timeout=60):
+            if not self.client.exists(self.total_key):
+                sizes = {key.decode('utf-8'): int(size) for key, size in self.client.hgetall(self.sizes_key).items()}
+                access_times = dict(self.client.zrange(self.access_key, 0, -1, withscores=True))
+
+                with self.client.pipeline() as pipeline:
+                    pipeline.set(self.total_key, sum(sizes.values()))
+                    pipeline.delete(self.session_sizes_key)
+                    for key, size in sizes.items():
+                        pipeline.hincrby(self.session_sizes_key, self._get_session_id(key), size)
+                        pipeline.sadd(self._get_session_key(self._get_session_id(key)), key)
+                        pipeline.zadd(self.written_key, {key: access_times.get(key.encode('utf-8'), time.time())})
+                    pipeline.execute()
+
+        self.indexed = True
+        return
+
+    def _get_entry_key(self, session_id: str, entry_name: str) -> str:
+        return f'{self.prefix}:entry:{session_id}:{entry_name}'
+
+    def _get_session_key(self, session_id: str) -> str:
+        return f'{self.prefix}:session:{session_id}'
+
+    def _get_session_id(self, key: str) -> str:
+        return key[len(self.prefix + ':entry:'):].rsplit(':', 1)[0]
+
+
+def _get_record_key(path: str) -> str:
+    return 'entry:' + path
+
+
+def _get_session_bytes_key(session_id: str) -> str:
+    return 'session_bytes:' + session_id
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _remove_empty_sessions(directory: str, timeout: int, session_ids: set):
+    # A session directory is only left empty once all of its entries have expired or been evicted,
+    # and is kept for a timeout after its last write so a concurrent writer never loses it
+    for session_id in session_ids:
+        try:
+            session_directory = os.path.join(directory, session_id)
+            if time.time() - os.stat(session_directory).st_mtime > timeout:
+                os.rmdir(session_directory)
+        except OSError:
+            pass
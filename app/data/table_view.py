@@ -0,0 +1,134 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from data.variants import materialise_keys
+
+ROW_NUMBER_COLUMN = ''
+
+filter_part_pattern = re.compile(
+    r'\{(?P<column>.*?)\}\s*(?P<case>[is]?)(?P<operator>>=|<=|!=|=|<|>|contains|datestartswith|eq|ne|lt|le|gt|ge)\s+(?P<value>.*)'
+)
+operator_aliases = {'eq': '=', 'ne': '!=', 'lt': '<', 'le': '<=', 'gt': '>', 'ge': '>='}
+
+
+def table_view_columns(df: pd.DataFrame) -> list:
+    view_df = materialise_keys(df.iloc[:0])
+
+    columns = [{'name': ROW_NUMBER_COLUMN, 'id': ROW_NUMBER_COLUMN, 'type': 'numeric'}]
+    for column in view_df.columns:
+        column_type = 'numeric' if _is_numeric_column(view_df[column]) else 'text'
+        columns.append({'name': str(column), 'id': str(column), 'type': column_type})
+
+    return columns
+
+
+def table_view_positions(df: pd.DataFrame, sort_by: list, filter_query: str) -> np.ndarray:
+    filter_parts = _parse_filter_query(filter_query)
+
+    referenced_columns = [sorting['column_id'] for sorting in sort_by] + [filter_part['column'] for filter_part in filter_parts]
+    if 'KEY' in referenced_columns:
+        df = materialise_keys(df)
+
+    positions = np.arange(len(df))
+
+    for filter_part in filter_parts:
+        values = _view_column(df, filter_part['column']).iloc[positions]
+        positions = positions[_filter_part_mask(values, filter_part)]
+
+    if sort_by:
+        sort_df = pd.DataFrame({
+            i: _sortable(_view_column(df, sorting['column_id']).iloc[positions]) for i, sorting in enumerate(sort_by)
+        })
+        order = sort_df.sort_values(
+            by=list(sort_df.columns),
+            ascending=[sorting['direction'] == 'asc' for sorting in sort_by],
+            kind='stable',
+        ).index.to_numpy()
+        positions = positions[order]
+
+    return positions
+
+
+def table_view_frame(rows: pd.DataFrame, positions: np.ndarray) -> pd.DataFrame:
+    view_df = materialise_keys(rows)
+    view_df.insert(0, ROW_NUMBER_COLUMN, positions + 1)
+    return view_df.reset_index(drop=True)
+
+
+def _parse_filter_query(filter_query: str) -> list:
+    filter_parts = []
+    for filter_part in (filter_query or '').split(' && '):
+        match = filter_part_pattern.fullmatch(filter_part.strip())
+        if match is None:
+            continue
+
+        value = match['value'].strip()
+        if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'`':
+            value = value[1:-1].replace('\\' + value[0], value[0])
+
+        filter_parts.append({
+            'column': match['column'],
+            'operator': operator_aliases.get(match['operator'], match['operator']),
+            'case_insensitive': match['case'] == 'i',
+            'value': value,
+        })
+
+    return filter_parts
+
+
+def _view_column(df: pd.DataFrame, column: str) -> pd.Series:
+    if column == ROW_NUMBER_COLUMN:
+        return pd.Series(np.arange(1, len(df) + 1))
+    if column not in df:
+        raise ValueError(f'Unexpected column ` {column} `.')
+    return df[column]
+
+
+def _sortable(values: pd.Series) -> np.ndarray:
+    # Categories keep their own order, such as chromosomes in karyotype order
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy()
+    if values.dtype == object:
+        return values.astype(str).to_numpy()
+    return values.to_numpy()
+
+
+def _is_numeric_column(column: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column)
+
+
+def _filter_part_mask(values: pd.Series, filter_part: dict) -> np.ndarray:
+    operator = filter_part['operator']
+    value = filter_part['value']
+
+    if operator in ['contains', 'datestartswith'] or not _is_numeric_column(values):
+        strings = values.astype(str)
+        if filter_part['case_insensitive']:
+            strings = strings.str.lower()
+            value = value.lower()
+
+        if operator == 'contains':
+            return strings.str.contains(value, regex=False).to_numpy()
+        if operator == 'datestartswith':
+            return strings.str.startswith(value).to_numpy()
+        values = strings.to_numpy()
+    else:
+        try:
+            value = float(value)
+        except ValueError:
+            return np.zeros(len(values), dtype=bool)
+        values = values.to_numpy()
+
+    if operator == '=':
+        return values == value
+    if operator == '!=':
+        return values != value
+    if operator == '<':
+        return values < value
+    if operator == '<=':
+        return values <= value
+    if operator == '>':
+        return values > value
+    return values >= value
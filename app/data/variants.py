@@ -0,0 +1,194 @@
+from hashlib import blake2b
+
+import numpy as np
+import pandas as pd
+
+
+standard_chroms = [f'chr{i}' for i in range(1, 22 + 1)]
+standard_chroms += ['chrX',
+                 'chrY',
+                 'chrW',
+                 'chrZ',
+                 'chrM']
+
+# Variant IDs are packed into 64 bits:
+#   bits 56-63  chromosome code (1-27 standard, 28 null_chr, 29-255 hashed names)
+#   bits 24-55  position
+#   bit  23     set when the chromosome or the alleles had to be hashed
+#   bits 0-22   REF/ALT, spelled out exactly when short and ACGT-only, hashed otherwise
+# Hashed IDs may collide, which resolve_variant_id_collisions settles through a side-table of KEYs.
+HASHED_VARIANT_ID = np.uint64(1 << 23)
+key_columns = ['CHROM', 'POS', 'REF', 'ALT']
+
+_null_chrom_code = len(standard_chroms) + 1
+_exact_bases = 'ACGT'
+_max_exact_bases = 8
+
+
+def extract_chrom(chrom_string: str) -> str:
+    if chrom_string in standard_chroms:
+        return chrom_string
+
+    for valid_chrom in standard_chroms:
+        if valid_chrom in chrom_string:
+            return valid_chrom
+
+    return 'null_chr'
+
+
+def prepend_chr(chrom: str) -> str:
+    if chrom.isdigit():
+        return 'chr' + chrom
+    return chrom
+
+
+def normalise_chroms(chroms, categories: list = None) -> pd.Categorical:
+    # Normalise each distinct chromosome name once, then remap the codes
+    chroms = pd.Categorical(chroms)
+    normalised_categories = [prepend_chr(chrom) for chrom in chroms.categories]
+
+    if categories is None:
+        categories = list(dict.fromkeys(normalised_categories))
+
+    category_codes = np.append(pd.Index(categories).get_indexer(normalised_categories), -1)
+    return pd.Categorical.from_codes(category_codes[chroms.codes], categories=categories)
+
+
+def generate_keys(df: pd.DataFrame) -> pd.Series:
+    chroms = pd.Categorical(df['CHROM'])
+    chrom_prefixes = (chroms.categories.astype(str) + '-').to_numpy()[chroms.codes]
+    positions = np.array(list(map(str, df['POS'].tolist())), dtype=object)
+
+    # Build the '-REF-ALT' suffix once per distinct allele pair
+    allele_codes, refs, alts = _factorize_alleles(df)
+    suffixes = np.array([f'-{ref}-{alt}' for ref, alt in zip(refs, alts)], dtype=object)
+
+    return pd.Series(chrom_prefixes + positions + suffixes[allele_codes], index=df.index)
+
+
+def pack_variant_ids(df: pd.DataFrame) -> np.ndarray:
+    chroms = pd.Categorical(df['CHROM'])
+    chrom_bits = np.array([_chrom_bits(chrom) for chrom in chroms.categories] + [0], dtype=np.uint64)
+
+    allele_codes, refs, alts = _factorize_alleles(df)
+    allele_bits = np.array([_allele_bits(ref, alt) for ref, alt in zip(refs, alts)], dtype=np.uint64)
+
+    positions = df['POS'].to_numpy().astype(np.uint64)
+
+    return chrom_bits[chroms.codes] | (positions << np.uint64(24)) | allele_bits[allele_codes]
+
+
+def drop_duplicate_variants(df: pd.DataFrame) -> pd.DataFrame:
+    duplicated = df['VID'].duplicated().to_numpy()
+
+    hashed = _is_hashed(df)
+    if hashed.any():
+        duplicated[hashed] = df.loc[hashed].duplicated(['CHROM', 'POS', 'REF', 'ALT']).to_numpy()
+
+    return df[~duplicated]
+
+
+def resolve_variant_id_collisions(*dfs: pd.DataFrame) -> list:
+    return apply_variant_id_collisions(dfs, find_variant_id_collisions(*dfs))
+
+
+def find_variant_id_collisions(*dfs: pd.DataFrame) -> pd.DataFrame:
+    # Frames read without the columns their KEYs are built from cannot be checked, and are left as they are
+    hashed_variants = [df.loc[_is_hashed(df), ['VID'] + key_columns] for df in dfs if _has_key_columns(df)]
+    if sum(map(len, hashed_variants)) == 0:
+        return pd.DataFrame({
+            'VID': pd.Series(dtype=np.uint64),
+            'KEY': pd.Series(dtype=object),
+            'RESOLVED_VID': pd.Series(dtype=np.uint64),
+        })
+
+    side_table = pd.concat(hashed_variants, ignore_index=True)
+    side_table['KEY'] = generate_keys(side_table)
+    side_table = side_table[['VID', 'KEY']].drop_duplicates()
+
+    collisions = side_table[side_table['VID'].duplicated(keep=False)].sort_values(by='KEY')
+
+    # Chromosome code 0 is never packed, so IDs below 2**56 are free for colliding variants
+    return pd.DataFrame({
+        'VID': collisions['VID'].to_numpy(),
+        'KEY': collisions['KEY'].to_numpy(),
+        'RESOLVED_VID': np.arange(1, len(collisions) + 1, dtype=np.uint64),
+    })
+
+
+def apply_variant_id_collisions(dfs, collisions: pd.DataFrame) -> list:
+    if collisions.empty:
+        return list(dfs)
+
+    resolved_ids = pd.Series(collisions['RESOLVED_VID'].to_numpy(), index=collisions['KEY'].to_numpy())
+
+    resolved_dfs = []
+    for df in dfs:
+        if not _has_key_columns(df):
+            resolved_dfs.append(df)
+            continue
+
+        colliding = df['VID'].isin(collisions['VID']).to_numpy()
+        if colliding.any():
+            df = df.copy()
+            df.loc[colliding, 'VID'] = resolved_ids[generate_keys(df[colliding])].to_numpy()
+        resolved_dfs.append(df)
+
+    return resolved_dfs
+
+
+def materialise_keys(df: pd.DataFrame) -> pd.DataFrame:
+    if 'VID' not in df:
+        return df
+
+    df = df.drop(columns=['VID'])
+    df['KEY'] = generate_keys(df)
+    return df
+
+
+def _factorize_alleles(df: pd.DataFrame) -> (np.ndarray, list, list):
+    ref_codes, refs = pd.factorize(df['REF'], use_na_sentinel=False)
+    alt_codes, alts = pd.factorize(df['ALT'], use_na_sentinel=False)
+    allele_codes, allele_pairs = pd.factorize(ref_codes.astype(np.int64) * len(alts) + alt_codes)
+
+    return (
+        allele_codes,
+        [refs[pair // len(alts)] for pair in allele_pairs],
+        [alts[pair % len(alts)] for pair in allele_pairs],
+    )
+
+
+def _has_key_columns(df: pd.DataFrame) -> bool:
+    return 'VID' in df and all(column in df for column in key_columns)
+
+
+def _is_hashed(df: pd.DataFrame) -> np.ndarray:
+    return (df['VID'].to_numpy() & HASHED_VARIANT_ID) != 0
+
+
+def _chrom_bits(chrom: str) -> int:
+    if chrom in standard_chroms:
+        return (standard_chroms.index(chrom) + 1) << 56
+
+    if chrom == 'null_chr':
+        return _null_chrom_code << 56
+
+    hashed_code = _null_chrom_code + 1 + _hash(chrom, 255 - _null_chrom_code)
+    return hashed_code << 56 | int(HASHED_VARIANT_ID)
+
+
+def _allele_bits(ref: str, alt: str) -> int:
+    if (isinstance(ref, str) and isinstance(alt, str) and
+            0 < len(ref) and 0 < len(alt) and
+            len(ref) + len(alt) <= _max_exact_bases and
+            all(base in _exact_bases for base in ref + alt)):
+        bits = (len(ref) - 1) << 19 | (len(alt) - 1) << 16
+        for i, base in enumerate(ref + alt):
+            bits |= _exact_bases.index(base) << (2 * i)
+        return bits
+
+    return int(HASHED_VARIANT_ID) | _hash(f'{ref}-{alt}', int(HASHED_VARIANT_ID))
+
+
+def _hash(value: str, modulus: int) -> int:
+    return int.from_bytes(blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little') % modulus
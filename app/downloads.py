@@ -0,0 +1,97 @@
+import json
+
+from flask import Blueprint, Response, abort, request
+
+import config
+from data.retrieval import get_dataset_versions, get_raw_view_positions, get_uploaded_data, iter_raw_view_frames
+from data.staging import session_id_pattern
+from data.store import read_entry
+from figures.tables import (
+    bgzf_chunks, csv_chunks, csv_column_types, df_chunks, variant_df_to_vcf_chunks, venn_regions_zip_chunks
+)
+from figures.venn_figure import venn_region_sites
+
+# Files are streamed as they are written, so neither the worker nor the browser holds a whole file in
+# memory or base64 text, and the callbacks behind the download buttons only hand the browser these URLs
+download_blueprint = Blueprint('downloads', __name__, url_prefix='/download')
+
+
+@download_blueprint.before_request
+def check_session_id():
+    if not session_id_pattern.fullmatch((request.view_args or {}).get('session_id') or ''):
+        abort(400)
+
+
+@download_blueprint.errorhandler(LookupError)
+def on_timed_out(_):
+    return 'The cached data has timed out.', 404
+
+
+@download_blueprint.route('/<session_id>/venn_sites', methods=['GET'])
+def download_venn_sites(session_id: str):
+    intersection_sites = read_entry(session_id, 'venn_sites_download')
+
+    return _send_chunks(
+        bgzf_chunks(variant_df_to_vcf_chunks(intersection_sites)), 'intersection.vcf.gz', 'application/gzip'
+    )
+
+
+@download_blueprint.route('/<session_id>/venn_regions', methods=['GET'])
+def download_venn_regions(session_id: str):
+    group_labels, membership_codes, compare_set_options, compare_set_versions = read_entry(
+        session_id, 'venn_regions_download'
+    )
+
+    # The compare set is read again as the diagram saw it, which an upload since would have changed
+    if get_dataset_versions(session_id, compare_set_versions.keys()) != compare_set_versions:
+        raise LookupError('The cached data has timed out.')
+
+    (
+        (compare_set,),
+        _,
+        any_invalidity
+    ) = get_uploaded_data(session_id, partitioned=True, **compare_set_options)
+    if any_invalidity:
+        raise LookupError('The cached data has timed out.')
+
+    region_sites = venn_region_sites(compare_set, membership_codes, len(group_labels))
+
+    return _send_chunks(venn_regions_zip_chunks(group_labels, region_sites), 'venn_regions.zip', 'application/zip')
+
+
+@download_blueprint.route('/<session_id>/filename_summary', methods=['GET'])
+def download_filename_summary(session_id: str):
+    data = read_entry(session_id, 'filename_download')
+    return _send_csv(df_chunks(data), csv_column_types(data), len(data), 'summary.csv')
+
+
+@download_blueprint.route('/<session_id>/metadata_summary', methods=['GET'])
+def download_metadata_summary(session_id: str):
+    data = read_entry(session_id, 'metadata_download')
+    return _send_csv(df_chunks(data), csv_column_types(data), len(data), 'summary.csv')
+
+
+@download_blueprint.route('/<session_id>/raw_summary', methods=['GET'])
+def download_raw_summary(session_id: str):
+    try:
+        raw_view = json.loads(request.args['raw_view'])
+        sort_by = json.loads(request.args.get('sort_by', '[]'))
+        filter_query = request.args.get('filter_query', '')
+    except (KeyError, ValueError):
+        abort(400)
+
+    positions = get_raw_view_positions(session_id, raw_view, sort_by, filter_query)
+
+    # Rows are taken from the persisted view a chunk at a time, in the order and with the filter the table shows
+    return _send_csv(iter_raw_view_frames(session_id, raw_view, positions), None, len(positions), 'summary.csv')
+
+
+def _send_csv(frames, column_types, row_count: int, filename: str) -> Response:
+    if row_count >= config.csv_gzip_min_rows:
+        return _send_chunks(csv_chunks(frames, True, column_types), filename + '.gz', 'application/gzip')
+
+    return _send_chunks(csv_chunks(frames, False, column_types), filename, 'text/csv')
+
+
+def _send_chunks(chunks, filename: str, mimetype: str) -> Response:
+    return Response(chunks, mimetype=mimetype, headers={'Content-Disposition': f'attachment; filename="{filename}"'})
@@ -1,13 +1,14 @@
+import numpy as np
 import pandas as pd
 from plotly import graph_objs as go
 from plotly.colors import sequential, qualitative
 from dash_bio import Clustergram
+from scipy import sparse
 
 from figures.helpers import (
     _extract_single_element_list, _str_to_tuple,
     _corresponding_labels, _clean_tuple,
-    _sets_from_files,
-    _intersection_size, _union_size
+    _group_incidence,
 )
 
 
@@ -21,7 +22,7 @@ def clustergram(
         heatmap_colors: list = sequential.YlOrRd_r,
         font_size: float = 12.0
 ) -> Clustergram:
-    comparing_column = 'KEY'
+    comparing_column = 'VID'
 
     groups = metadata.groupby(_extract_single_element_list(grouping_columns))
 
@@ -44,23 +45,22 @@ def clustergram(
     else:
         label_colors = None
 
-    sets = _sets_from_files(data, sets_files, grouping_method, comparing_column)
+    group_matrix, _ = _group_incidence(data, sets_files, grouping_method, comparing_column)
 
-    if len(sets) == 1:
-        sets.append(sets[0])
+    if group_matrix.shape[0] == 1:
+        group_matrix = sparse.vstack([group_matrix, group_matrix], format='csr')
         sets_labels.append((' ',))
         clean_labels.append('Only 1 group found')
 
-    heatmap_data = []
-    for i in range(len(sets)):
-        for j in range(len(sets)):
-            heatmap_data.append({
-                'Set 1': sets_labels[i],
-                'Set 2': sets_labels[j],
-                'Jaccard': _jaccard_distance(sets[i], sets[j])
-            })
+    no_of_sets = len(sets_labels)
+    labels = np.empty(no_of_sets, dtype=object)
+    labels[:] = sets_labels
 
-    heatmap_df = pd.DataFrame(heatmap_data)
+    heatmap_df = pd.DataFrame({
+        'Set 1': np.repeat(labels, no_of_sets),
+        'Set 2': np.tile(labels, no_of_sets),
+        'Jaccard': _jaccard_distances(group_matrix).ravel(),
+    })
     pivoted_heatmap = heatmap_df.pivot(index='Set 1', columns='Set 2', values='Jaccard')
 
     figure = Clustergram(
@@ -90,13 +90,25 @@ def clustergram(
     return figure
 
 
-def _jaccard_distance(a: set, b: set) -> float:
-    union_size = _union_size(a, b)
+def _jaccard_distances(group_matrix: sparse.csr_matrix, block_size: int = 64) -> np.ndarray:
+    group_matrix = group_matrix.astype(np.int64)
+    no_of_groups = group_matrix.shape[0]
 
-    if union_size == 0:
-        return 0.0
+    # Intersections are symmetric, so each block of groups is only multiplied with itself and the groups
+    # after it, and the products are mirrored into the rest of the matrix; unions follow from the set sizes
+    intersection_sizes = np.zeros((no_of_groups, no_of_groups), dtype=np.int64)
+    for start in range(0, no_of_groups, block_size):
+        stop = min(start + block_size, no_of_groups)
+        block = (group_matrix[start:] @ group_matrix[start:stop].T).toarray()
+        intersection_sizes[start:, start:stop] = block
+        intersection_sizes[start:stop, start:] = block.T
 
-    return _intersection_size(a, b) / union_size
+    set_sizes = np.diff(group_matrix.indptr)
+    union_sizes = set_sizes[:, None] + set_sizes[None, :] - intersection_sizes
+
+    jaccard_distances = np.zeros(intersection_sizes.shape)
+    np.divide(intersection_sizes, union_sizes, out=jaccard_distances, where=union_sizes != 0)
+    return jaccard_distances
 
 
 def _add_legend_to_clustergram(clustergram: Clustergram, label_color_dict: dict, title=None, font_size=12.0):
@@ -1,14 +1,8 @@
-from functools import reduce
-
+import numpy as np
 import pandas as pd
+from scipy import sparse
 
-
-def _intersection_size(a: set, *b: set) -> int:
-    return len(a.intersection(*b))
-
-
-def _union_size(a: set, *b: set) -> int:
-    return len(a.union(*b))
+from data.incidence import get_variant_incidence, group_variant_incidence
 
 
 def _extract_single_element_list(in_value) -> str:
@@ -62,9 +56,16 @@ def _corresponding_labels(
     return return_labels
 
 
-def _intersect_dfs(dfs: list, on=None) -> set:
-    sets = list(map(lambda df: set(df[on]), dfs))
-    return sets[0].intersection(*sets[1:])
+def _group_incidence(
+        data: pd.DataFrame,
+        sets_files: list,
+        grouping_method: str,
+        comparing_column: str
+) -> (sparse.csr_matrix, np.ndarray):
+    incidence = get_variant_incidence(data, comparing_column)
+    _, _, variant_ids = incidence
+
+    return group_variant_incidence(incidence, sets_files, grouping_method), variant_ids
 
 
 def _sets_from_files(
@@ -73,32 +74,9 @@ def _sets_from_files(
         grouping_method: str,
         comparing_column: str
 ) -> list:
-    sets = []
-    for set_files in sets_files:
-        set_variants = []
-        for set_file in set_files:
-            set_variants.append(data.loc[data['FILENAME'] == set_file, data.columns != 'FILENAME'])
-        sets.append(set_variants)
-
-    if grouping_method == 'union':
-        for i in range(len(sets)):
-            sets[i] = set(pd.concat(sets[i], ignore_index=True)[comparing_column])
-
-    if grouping_method == 'inter':
-        for i in range(len(sets)):
-            sets[i] = _intersect_dfs(sets[i], on=comparing_column)
-
-    if grouping_method == 'major':
-        for i in range(len(sets)):
-            all_rows = pd.concat(sets[i], ignore_index=True)
-            row_counts = all_rows.value_counts(comparing_column)
-
-            half_of_file_count = len(sets_files[i]) // 2
-            majority_rows = row_counts[row_counts > half_of_file_count]
-            majority_keys = majority_rows.index.to_list()
-
-            sets[i] = set(
-                all_rows[all_rows[comparing_column].isin(majority_keys)][comparing_column]
-            )
-
-    return sets
+    group_matrix, variant_ids = _group_incidence(data, sets_files, grouping_method, comparing_column)
+
+    return [
+        set(variant_ids[group_matrix.indices[start:end]].tolist())
+        for start, end in zip(group_matrix.indptr[:-1], group_matrix.indptr[1:])
+    ]
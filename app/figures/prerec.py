@@ -1,11 +1,15 @@
+import numpy as np
 import pandas as pd
 from plotly import express as px
+from scipy import sparse
 
+from data.filtering import within_regions_mask
+from data.regions import bundled_region_sets, get_bundled_region_index
+from data.variants import standard_chroms
 from figures.helpers import (
     _extract_single_element_list, _str_to_tuple,
     _corresponding_labels, _clean_tuple,
-    _sets_from_files,
-    _intersection_size
+    _group_incidence,
 )
 
 
@@ -18,12 +22,18 @@ def precision_recall_plot(
         labeling_columns: list,
         coloring_columns: list,
         shaping_columns: list,
-        font_size: float = 12.0
-) -> px.scatter:
-    comparing_column = 'KEY'
+        font_size: float = 12.0,
+        stratify_by: list = (),
+        return_table: bool = False,
+) -> (px.scatter, pd.DataFrame):
+    comparing_column = 'VID'
 
     groups = metadata.groupby(_extract_single_element_list(grouping_columns))
 
+    # Rows without a value in every grouping column are dropped by the groupby, which can leave no groups
+    if groups.ngroups == 0:
+        raise ValueError('None of the VCF data has values for the selected grouping columns.')
+
     sets_labels = list(groups.groups.keys())
     sets_files = [groups.get_group(set_label)['FILENAME'] for set_label in sets_labels]
     sets_labels = [_str_to_tuple(set_labels) for set_labels in sets_labels]
@@ -40,21 +50,27 @@ def precision_recall_plot(
     shaping_labels = _corresponding_labels(sets_labels, grouping_columns, shaping_columns, metadata)
     shaping_labels = [_clean_tuple(shaping_label) for shaping_label in shaping_labels]
 
-    sets = _sets_from_files(data, sets_files, grouping_method, comparing_column)
-    validation_set = set(validation_data[comparing_column])
-
-    precision_recall_data = []
-    for i in range(len(sets)):
-        for j in range(len(sets)):
-            precision_recall_data.append({
-                'Labels': clean_labels[i],
-                'Colors': coloring_labels[i],
-                'Shapes': shaping_labels[i],
-                'Precision': _precision(sets[i], validation_set),
-                'Recall': _recall(sets[i], validation_set)
-            })
-
-    precision_recall_df = pd.DataFrame(precision_recall_data)
+    benchmark_df = precision_recall_table(data, validation_data, metadata, grouping_columns, grouping_method, stratify_by)
+    no_of_strata = len(benchmark_df) // len(sets_labels)
+
+    precision_recall_df = pd.DataFrame({
+        'Labels': clean_labels * no_of_strata,
+        'Colors': coloring_labels * no_of_strata,
+        'Shapes': shaping_labels * no_of_strata,
+        'Precision': benchmark_df['Precision'],
+        'Recall': benchmark_df['Recall'],
+    })
+
+    facet_selector = None
+    facet_wrap = 0
+    height = 800
+    if stratify_by:
+        precision_recall_df['Stratum'] = [
+            _clean_tuple(stratum) for stratum in benchmark_df[_strata_columns(stratify_by)].astype(str).values
+        ]
+        facet_selector = 'Stratum'
+        facet_wrap = min(no_of_strata, 4)
+        height = max(800, 500 * -(-no_of_strata // facet_wrap))
 
     color_selector = 'Colors'
     if len(coloring_columns) == 0:
@@ -72,7 +88,9 @@ def precision_recall_plot(
         color=color_selector,
         symbol=shape_selector,
         hover_data=['Labels'],
-        height=800
+        facet_col=facet_selector,
+        facet_col_wrap=facet_wrap,
+        height=height
     )
 
     figure.layout['title'] = {
@@ -92,22 +110,137 @@ def precision_recall_plot(
         textposition='bottom right'
     )
 
+    if return_table:
+        return figure, benchmark_df
+
     return figure
 
 
-def _precision(retrieved_set: set, relevant_set: set) -> float:
-    if len(retrieved_set) == 0:
-        return 0.0
+def precision_recall_table(
+        data: pd.DataFrame,
+        validation_data: pd.DataFrame,
+        metadata: pd.DataFrame,
+        grouping_columns: list,
+        grouping_method: str,
+        stratify_by: list = (),
+) -> pd.DataFrame:
+    comparing_column = 'VID'
+
+    groups = metadata.groupby(_extract_single_element_list(grouping_columns))
+
+    # Rows without a value in every grouping column are dropped by the groupby, which can leave no groups
+    if groups.ngroups == 0:
+        raise ValueError('None of the VCF data has values for the selected grouping columns.')
+
+    sets_labels = list(groups.groups.keys())
+    sets_files = [groups.get_group(set_label)['FILENAME'] for set_label in sets_labels]
+    sets_labels = [_str_to_tuple(set_labels) for set_labels in sets_labels]
+
+    group_matrix, variant_ids = _group_incidence(data, sets_files, grouping_method, comparing_column)
+
+    validation_variants = validation_data.drop_duplicates(comparing_column)
+    is_relevant = pd.Series(variant_ids).isin(validation_variants[comparing_column]).to_numpy()
+    group_matrix = group_matrix.astype(np.int64)
+
+    # Without strata every variant is in the one stratum, which needs no indicator matrix
+    if not stratify_by:
+        strata = pd.DataFrame(index=[0])
+        retrieved_counts = np.asarray(group_matrix.sum(axis=1))
+        true_positives = group_matrix @ is_relevant[:, None].astype(np.int64)
+        relevant_counts = np.array([len(validation_variants)])
+    else:
+        # Incidence columns follow the order in which variants first appear, as does drop_duplicates
+        variants = data.drop_duplicates(comparing_column)
+        strata, (variant_strata, validation_strata) = _strata_indicators([variants, validation_variants], stratify_by)
+
+        retrieved_counts = (group_matrix @ variant_strata).toarray()
+        true_positives = (group_matrix @ variant_strata.multiply(is_relevant[:, None]).tocsr()).toarray()
+        relevant_counts = np.asarray(validation_strata.sum(axis=0)).ravel()
+
+    # Strata that neither the groups nor the golden set have any variants in are left out
+    present_strata = np.flatnonzero((retrieved_counts.sum(axis=0) > 0) | (relevant_counts > 0))
+    if len(present_strata) == 0:
+        present_strata = np.arange(min(len(strata), 1))
+    strata = strata.iloc[present_strata].reset_index(drop=True)
+    retrieved_counts = retrieved_counts[:, present_strata].T.ravel()
+    true_positives = true_positives[:, present_strata].T.ravel()
+    relevant_counts = np.repeat(relevant_counts[present_strata], len(sets_labels))
+
+    df = pd.DataFrame(
+        [list(set_labels) for set_labels in sets_labels] * len(strata),
+        columns=grouping_columns,
+    )
+    for strata_column in strata.columns:
+        df[strata_column] = np.repeat(strata[strata_column].to_numpy(), len(sets_labels))
+    df['TP'] = true_positives
+    df['FP'] = retrieved_counts - true_positives
+    df['FN'] = relevant_counts - true_positives
+    df['Precision'] = _ratio(true_positives, retrieved_counts)
+    df['Recall'] = _ratio(true_positives, relevant_counts)
+    df['F1'] = _ratio(2 * df['Precision'] * df['Recall'], df['Precision'] + df['Recall'])
+
+    return df
+
+
+def _strata_columns(stratify_by: list) -> list:
+    return [column for option, column in [
+        ('variant_type', 'Variant Type'),
+        ('chromosome', 'Chromosome'),
+        ('regions', 'Regions'),
+    ] if option in stratify_by]
+
+
+def _strata_indicators(variant_sets: list, stratify_by: list) -> (pd.DataFrame, list):
+    variants = pd.concat([variant_set[['CHROM', 'POS', 'REF', 'ALT']] for variant_set in variant_sets], ignore_index=True)
+    cells = pd.DataFrame(index=variants.index)
+
+    if 'variant_type' in stratify_by:
+        is_snp = (variants['REF'].str.len() == 1) & (variants['ALT'].str.len() == 1)
+        cells['Variant Type'] = pd.Categorical(np.where(is_snp, 'SNP', 'Indel'), categories=['SNP', 'Indel'])
+
+    if 'chromosome' in stratify_by:
+        chroms = variants['CHROM'].astype(str)
+        present_chroms = set(chroms.unique())
+        cells['Chromosome'] = pd.Categorical(chroms, categories=(
+            [chrom for chrom in standard_chroms + ['null_chr'] if chrom in present_chroms] +
+            sorted(present_chroms.difference(standard_chroms + ['null_chr']))
+        ))
+
+    # Every variant counts towards "All regions", and towards each bundled region set it falls in
+    region_labels = ['All regions']
+    region_memberships = [np.ones(len(variants), dtype=bool)]
+    if 'regions' in stratify_by:
+        for region_set in bundled_region_sets():
+            region_labels.append(region_set[:-4])
+            region_memberships.append(within_regions_mask(variants, get_bundled_region_index(region_set)))
+
+    if len(cells.columns) > 0:
+        cell_groups = cells.groupby(list(cells.columns), sort=True, observed=True)
+        cell_codes = cell_groups.ngroup().to_numpy()
+        cell_labels = cell_groups.size().index.to_frame(index=False)
+    else:
+        cell_codes = np.zeros(len(variants), dtype=np.int64)
+        cell_labels = pd.DataFrame(index=[0])
+
+    strata = cell_labels.loc[cell_labels.index.repeat(len(region_labels))].reset_index(drop=True)
+    if 'regions' in stratify_by:
+        strata['Regions'] = region_labels * len(cell_labels)
+
+    variant_indices, region_indices = np.nonzero(np.column_stack(region_memberships))
+    indicators = sparse.csr_matrix(
+        (np.ones(len(variant_indices), dtype=np.int64),
+         (variant_indices, cell_codes[variant_indices] * len(region_labels) + region_indices)),
+        shape=(len(variants), len(strata)),
+    )
 
-    correct_findings = _intersection_size(retrieved_set, relevant_set)
-    precision_value = correct_findings / len(retrieved_set)
-    return precision_value
+    bounds = np.cumsum([0] + [len(variant_set) for variant_set in variant_sets])
+    return strata, [indicators[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
 
 
-def _recall(retrieved_set: set, relevant_set: set) -> float:
-    if len(relevant_set) == 0:
-        return 0.0
+def _ratio(numerators, denominators) -> np.ndarray:
+    numerators = np.asarray(numerators, dtype=float)
+    denominators = np.asarray(denominators, dtype=float)
 
-    correct_findings = _intersection_size(retrieved_set, relevant_set)
-    recall_value = correct_findings / len(relevant_set)
-    return recall_value
+    ratios = np.zeros(len(numerators))
+    np.divide(numerators, denominators, out=ratios, where=denominators != 0)
+    return ratios
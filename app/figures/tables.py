@@ -1,10 +1,22 @@
+import re
+import struct
+import zlib
 from datetime import datetime
+from gzip import GzipFile
+from io import BytesIO
+from zipfile import ZipFile, ZIP_DEFLATED
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
 from dash import dash_table
+from pyarrow import csv as arrow_csv
 
-from figures.helpers import _sets_from_files, _extract_single_element_list, _str_to_tuple, _clean_tuple
+from figures.helpers import _group_incidence, _extract_single_element_list, _str_to_tuple, _clean_tuple
+
+bgzf_block_size = 0xff00
+bgzf_compression_level = 6
+bgzf_eof = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
 
 
 def df_to_table(
@@ -78,7 +90,7 @@ def grouped_variant_counts(
         pivoting_columns: list = (),
         return_updated_df: bool = False,
 ) -> (dash_table.DataTable, pd.DataFrame):
-    comparing_column = 'KEY'
+    comparing_column = 'VID'
     counting_column = '# of Variants'
 
     groups = metadata.groupby(_extract_single_element_list(grouping_columns))
@@ -88,13 +100,13 @@ def grouped_variant_counts(
     sets_labels = [_str_to_tuple(set_labels) for set_labels in sets_labels]
     sets_labels_transposed = np.array(sets_labels).T
 
-    sets = _sets_from_files(data, sets_files, grouping_method, comparing_column)
+    group_matrix, _ = _group_incidence(data, sets_files, grouping_method, comparing_column)
 
     data_dict = {}
     for grouping_column, sets_label in zip(grouping_columns, sets_labels_transposed):
         data_dict[grouping_column] = sets_label
 
-    data_dict[counting_column] = [len(each_set) for each_set in sets]
+    data_dict[counting_column] = np.diff(group_matrix.indptr).tolist()
 
     df = pd.DataFrame(data_dict)
 
@@ -148,39 +160,173 @@ def _calculate_totals_2d(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def df_to_csv(df: pd.DataFrame) -> str:
-    csv_str = ','.join(df.columns) + '\n'
+    csv_bytes = BytesIO()
+    write_csv(csv_bytes, df)
+    return csv_bytes.getvalue().decode('utf-8')
+
+
+def write_csv(file, df: pd.DataFrame, compress: bool = False, chunk_size: int = 100_000):
+    for csv_chunk in csv_chunks(df_chunks(df, chunk_size), compress, csv_column_types(df)):
+        file.write(csv_chunk)
+    return
+
+
+def csv_chunks(frames, compress: bool = False, column_types: list = None):
+    # Types are fixed up front, by the first frame unless given, so every chunk is quoted and formatted the same way
+    buffer = _ChunkBuffer()
+    output = GzipFile(fileobj=buffer, mode='wb', compresslevel=6) if compress else buffer
+
+    columns = None
+    for frame in frames:
+        if columns is None:
+            if isinstance(frame.columns, pd.MultiIndex):
+                columns = [_clean_tuple(column) for column in frame.columns.values]
+            else:
+                columns = [str(column) for column in frame.columns]
+            column_types = column_types or csv_column_types(frame)
+            include_header = True
+
+        record_batch = pa.RecordBatch.from_arrays(
+            [_csv_column_array(frame.iloc[:, i], column_type) for i, column_type in enumerate(column_types)],
+            names=columns
+        )
+        arrow_csv.write_csv(record_batch, output, arrow_csv.WriteOptions(include_header=include_header))
+        include_header = False
+        yield buffer.drain()
+
+    output.close()
+    yield buffer.drain()
+
+
+def df_chunks(df: pd.DataFrame, chunk_size: int = 100_000):
+    for start in range(0, max(len(df), 1), chunk_size):
+        yield df.iloc[start:start + chunk_size]
 
-    row_strs = []
-    for row in df.itertuples(index=False):
-        row_values = map(lambda x: str(x), row)
-        row_strs.append(','.join(row_values) + '\n')
 
-    csv_str += ''.join(row_strs)
+def csv_column_types(df: pd.DataFrame) -> list:
+    return [_csv_column_type(df.iloc[:, i]) for i in range(len(df.columns))]
 
-    return csv_str
 
+def _csv_column_type(column: pd.Series) -> pa.DataType:
+    try:
+        column_type = pa.array(column, from_pandas=True).type
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type columns, such as counts with a 'TOTAL' label, are written as their string forms
+        return None
 
-def variant_df_to_vcf(input_df: pd.DataFrame) -> str:  # Expected columns: 'CHROM', 'POS', 'REF', 'ALT', 'FILTER'
-    input_df['FILTER'] = input_df['FILTER_PASS'].apply(lambda filter_value: 'PASS' if filter_value else '.')
-    processed_df = input_df.drop(columns=['FILTER_PASS'])
+    # A column that is empty in the frame the types are taken from may have values in later ones
+    return None if column_type == pa.null() else column_type
 
-    processed_df['ID'] = '.'
-    processed_df['QUAL'] = '.'
-    processed_df['INFO'] = '.'
 
-    vcf_df = processed_df[['CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO']]
+def _csv_column_array(column: pd.Series, column_type: pa.DataType) -> pa.Array:
+    if column_type is None:
+        return pa.array(column.astype(str).where(column.notna(), None), type=pa.string(), from_pandas=True)
+    return pa.array(column, type=column_type, from_pandas=True)
 
+
+def variant_df_to_vcf(input_df: pd.DataFrame) -> str:  # Expected columns: 'CHROM', 'POS', 'REF', 'ALT', 'FILTER_PASS'
+    return ''.join(variant_df_to_vcf_chunks(input_df))
+
+
+def variant_df_to_vcf_chunks(input_df: pd.DataFrame, chunk_size: int = 100_000):
     vcf_lines = [
         '##fileformat=VCFv4.3',
         '##fileDate=' + datetime.now().strftime('%Y%m%d'),
         '##source=VCFObserver',
-        '#' + '\t'.join(vcf_df.columns)
+        '#' + '\t'.join(['CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO'])
     ]
+    yield '\n'.join(vcf_lines) + '\n'
+
+    for start in range(0, len(input_df), chunk_size):
+        chunk = input_df.iloc[start:start + chunk_size]
+        filter_values = np.where(chunk['FILTER_PASS'].to_numpy(dtype=bool), 'PASS', '.')
+
+        vcf_lines = (
+            chunk['CHROM'].astype(str) + '\t' +
+            chunk['POS'].astype(str) + '\t.\t' +
+            chunk['REF'].astype(str) + '\t' +
+            chunk['ALT'].astype(str) + '\t.\t' +
+            filter_values + '\t.'
+        )
+
+        yield '\n'.join(vcf_lines.tolist()) + '\n'
+
+
+def write_bgzf(file, text_chunks):
+    for bgzf_chunk in bgzf_chunks(text_chunks):
+        file.write(bgzf_chunk)
+    return
+
+
+def bgzf_chunks(text_chunks):
+    pending = b''
+    for text_chunk in text_chunks:
+        data = pending + text_chunk.encode('utf-8')
+
+        block_starts = range(0, len(data) - bgzf_block_size + 1, bgzf_block_size)
+        yield b''.join(_bgzf_block(data[block_start:block_start + bgzf_block_size]) for block_start in block_starts)
+
+        pending = data[len(block_starts) * bgzf_block_size:]
+
+    if pending:
+        yield _bgzf_block(pending)
+    yield bgzf_eof
+
+
+def _bgzf_block(data: bytes) -> bytes:
+    compressor = zlib.compressobj(bgzf_compression_level, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+
+    # Gzip member header with the 'BC' extra subfield holding the total block size minus one
+    header = struct.pack('<4BI2BH2BHH', 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, len(deflated) + 25)
+    trailer = struct.pack('<2I', zlib.crc32(data), len(data))
+
+    return header + deflated + trailer
+
+
+def write_venn_regions_zip(file, group_labels: list, region_sites: pd.DataFrame):
+    for zip_chunk in venn_regions_zip_chunks(group_labels, region_sites):
+        file.write(zip_chunk)
+    return
+
+
+def venn_regions_zip_chunks(group_labels: list, region_sites: pd.DataFrame):
+    # The archive is written to a buffer that is emptied after every VCF chunk, so no region is held whole
+    buffer = _ChunkBuffer()
+    with ZipFile(buffer, mode='w', compression=ZIP_DEFLATED) as zip_file:
+        for logic, sites in region_sites.groupby('VENN_REGION', observed=True, sort=True):
+            included_labels = [label for label, bit in zip(group_labels, logic) if bit == '1']
+            excluded_labels = [label for label, bit in zip(group_labels, logic) if bit == '0']
+
+            region_name = '_and_'.join(included_labels) + ('_not_' + '_or_'.join(excluded_labels) if excluded_labels else '')
+            region_filename = f'{logic}_' + re.sub(r'[^\w.-]+', '_', region_name) + '.vcf'
+
+            with zip_file.open(region_filename, mode='w') as region_file:
+                for vcf_chunk in variant_df_to_vcf_chunks(sites.drop(columns=['VENN_REGION'])):
+                    region_file.write(vcf_chunk.encode('utf-8'))
+                    yield buffer.drain()
+
+    yield buffer.drain()
+
+
+class _ChunkBuffer:
+    # A write-only file whose contents are taken out as they are written. Without tell and seek,
+    # zip archives are written with data descriptors instead of going back to fill in headers
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
 
-    for row in vcf_df.itertuples(index=False):
-        row_values = map(lambda x: str(x), row)
-        vcf_lines.append('\t'.join(row_values))
+    def flush(self):
+        return
 
-    vcf_str = '\n'.join(vcf_lines) + '\n'
+    def close(self):
+        self.closed = True
 
-    return vcf_str
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
@@ -1,10 +1,13 @@
 from io import BytesIO
 
+import numpy as np
 import pandas as pd
 from matplotlib import pyplot as plt
-from venn import pseudovenn, venn
+from scipy import sparse
+from venn._venn import draw_pseudovenn6, draw_venn, generate_colors, generate_logics
 
-from figures.helpers import _extract_single_element_list, _str_to_tuple, _clean_tuple, _sets_from_files, _intersect_dfs
+from data.incidence import iter_unique_variants
+from figures.helpers import _extract_single_element_list, _str_to_tuple, _clean_tuple, _group_incidence
 
 
 def venn_diagram(
@@ -14,9 +17,10 @@ def venn_diagram(
         grouping_method: str,
         pseudovenn_preference: str = 'venn',
         font_size: float = 8.0,
-        return_intersection: bool = False
-) -> BytesIO:
-    comparing_column = 'KEY'
+        return_intersection: bool = False,
+        return_regions: bool = False
+) -> (BytesIO, pd.DataFrame, pd.DataFrame):
+    comparing_column = 'VID'
     legend_loc = 'upper left'
     prefer_pseudovenn = pseudovenn_preference == 'pseudovenn'
 
@@ -36,34 +40,31 @@ def venn_diagram(
     clean_labels = sets_labels[:]
     clean_labels = [_clean_tuple(clean_label) for clean_label in clean_labels]
 
-    sets = _sets_from_files(data, sets_files, grouping_method, comparing_column)
-
-    sets_dict = {
-        clean_labels[i]: sets[i]
-        for i in range(no_of_groups)
-    }
+    group_matrix, _ = _group_incidence(data, sets_files, grouping_method, comparing_column)
+    membership_codes, petal_sizes = _venn_petal_sizes(group_matrix)
+    group_labels = clean_labels[:]
 
     title_y = -0.01
     pseudovenn_prefix = ''
 
-    if all(len(s) == 0 for s in sets_dict.values()):
-        sets_dict = {', '.join(sets_dict.keys()): set()}
+    if petal_sizes[1:].sum() == 0:
+        clean_labels = [', '.join(clean_labels)]
         no_of_groups = 1
 
     if no_of_groups == 1:
-        _venn1(sets_dict, fontsize=font_size, legend_loc=legend_loc)
+        _venn1({clean_labels[0]: int(petal_sizes[1:].sum())}, fontsize=font_size, legend_loc=legend_loc)
 
     elif no_of_groups == 6 and prefer_pseudovenn:
-        pseudovenn(sets_dict, fontsize=font_size, legend_loc=legend_loc, fmt='{size:,} ({percentage:.1f}%)', hint_hidden=False)
+        _draw_venn(draw_pseudovenn6, petal_sizes, clean_labels, '{size:,} ({percentage:.1f}%)', font_size, legend_loc)
         pseudovenn_prefix = 'Pseudo-'
         title_at_top_y = None
         title_y = title_at_top_y
 
     elif no_of_groups == 6:
-        venn(sets_dict, fontsize=font_size, legend_loc=legend_loc, fmt='{size:,}')
+        _draw_venn(draw_venn, petal_sizes, clean_labels, '{size:,}', font_size, legend_loc)
 
     else:
-        venn(sets_dict, fontsize=font_size, legend_loc=legend_loc, fmt='{size:,} ({percentage:.1f}%)')
+        _draw_venn(draw_venn, petal_sizes, clean_labels, '{size:,} ({percentage:.1f}%)', font_size, legend_loc)
 
     plt.title(
         f'{pseudovenn_prefix}Venn Diagram' + (f' Grouped by {_clean_tuple(grouping_columns)}' if grouping_columns != ['FILENAME'] else ''),
@@ -74,27 +75,80 @@ def venn_diagram(
     venn_figure = plt.gcf()
     plt.close()
 
+    results = [_fig_to_png_bytes(venn_figure)]
+
     if return_intersection:
-        intersection_set = sets[0].intersection(*sets[1:])
-        
-        compare_set = data.copy(deep=True)
+        in_intersection = membership_codes == 2 ** group_matrix.shape[0] - 1
 
         intersection_df = (
-            compare_set
-            .drop_duplicates('KEY')
-            .loc[compare_set['KEY'].isin(intersection_set)]
+            _variants_where(data, in_intersection)
             .drop(columns=['FILENAME'])
-            .drop(columns=['KEY'])
+            .drop(columns=['VID'])
             .sort_values(by=['CHROM', 'POS'])
         )
 
-        return _fig_to_png_bytes(venn_figure), intersection_df
+        results.append(intersection_df)
+
+    # Region sites are only built from the membership codes once they are downloaded
+    if return_regions:
+        results.append((group_labels, membership_codes.astype(np.uint8)))
+
+    return tuple(results) if len(results) > 1 else results[0]
+
+
+def _venn_petal_sizes(group_matrix: sparse.csr_matrix) -> (np.ndarray, np.ndarray):
+    no_of_groups = group_matrix.shape[0]
+
+    # The first group is the most significant bit, matching the venn library's petal logic strings
+    group_bits = 2 ** np.arange(no_of_groups - 1, -1, -1, dtype=np.int64)
+    membership_codes = group_matrix.T.astype(np.int64) @ group_bits
+
+    return membership_codes, np.bincount(membership_codes, minlength=2 ** no_of_groups)
+
+
+def venn_region_sites(data: pd.DataFrame, membership_codes: np.ndarray, no_of_groups: int) -> pd.DataFrame:
+    in_any_group = membership_codes > 0
 
-    return _fig_to_png_bytes(venn_figure)
+    logics = np.array(list(generate_logics(no_of_groups)), dtype=object)
+
+    return (
+        _variants_where(data, in_any_group)
+        .drop(columns=['FILENAME', 'VID'])
+        .assign(VENN_REGION=pd.Categorical.from_codes(membership_codes[in_any_group].astype(np.int64) - 1, categories=logics))
+        .sort_values(by=['VENN_REGION', 'CHROM', 'POS'])
+    )
+
+
+def _variants_where(data: pd.DataFrame, variant_mask: np.ndarray) -> pd.DataFrame:
+    # Unique variants come out in the same order as the incidence matrix columns, so the selected ones
+    # line up with the mask's selected columns
+    return pd.concat([
+        variants.loc[variant_mask[variant_columns]] for variants, variant_columns in iter_unique_variants(data)
+    ])
+
+
+def _draw_venn(draw_function, petal_sizes: np.ndarray, dataset_labels: list, fmt: str, fontsize: float, legend_loc: str):
+    universe_size = petal_sizes[1:].sum()
+
+    petal_labels = {}
+    for logic in generate_logics(len(dataset_labels)):
+        petal_size = int(petal_sizes[int(logic, 2)])
+        petal_labels[logic] = fmt.format(logic=logic, size=petal_size, percentage=(100 * petal_size / universe_size))
+
+    return draw_function(
+        petal_labels=petal_labels,
+        dataset_labels=dataset_labels,
+        hint_hidden=False,
+        colors=generate_colors(n_colors=len(dataset_labels), cmap='viridis', alpha=.4),
+        figsize=(8, 8),
+        fontsize=fontsize,
+        legend_loc=legend_loc,
+        ax=None,
+    )
 
 
-def _venn1(a_set: dict, fontsize: float = 8.0, legend_loc: str = 'upper right'):
-    label = list(a_set.keys())[0]
+def _venn1(set_sizes: dict, fontsize: float = 8.0, legend_loc: str = 'upper right'):
+    label = list(set_sizes.keys())[0]
 
     plt.rcParams['figure.figsize'] = (8, 8)
 
@@ -115,7 +169,7 @@ def _venn1(a_set: dict, fontsize: float = 8.0, legend_loc: str = 'upper right'):
         label=label
     ))
 
-    set_size = len(a_set[label])
+    set_size = set_sizes[label]
     set_percentage = 100 if set_size > 0 else 0
 
     ax.text(0, 0, f'{set_size:,} ({set_percentage:.1f}%)', ha='center', va='center', fontsize=fontsize)
@@ -0,0 +1,195 @@
+import json
+import pickle
+import uuid
+
+import diskcache
+from dash import CeleryManager, DiskcacheManager
+
+import config
+
+JOBS_CONFIG = {
+    'JOBS_DIR': './__pycache__/jobs',
+    'JOBS_DEFAULT_TIMEOUT': 24*60*60,
+    'JOBS_LOCK_TIMEOUT': 60,
+}
+
+
+class SessionJobs:
+    # Job keys hash the callback's arguments, session id included, so a repeated submit from the same
+    # session, e.g. after a reload, joins the running job instead of starting another one. Every request
+    # that joins gets its own job handle, so one of them cancelling or reading the result leaves the others be
+    def call_job_fn(self, key, job_fn, args, context):
+        subscriber = uuid.uuid4().hex
+
+        with self.records.lock(_get_lock_key(key)):
+            job = self.records.get(_get_job_key(key))
+            if job is not None and super().job_running(job):
+                subscribers = self.records.get(_get_subscribers_key(key), set())
+                self.records.set(_get_subscribers_key(key), subscribers | {subscriber}, self.expire)
+                return _get_job_handle(job, subscriber)
+
+            job = super().call_job_fn(key, job_fn, args, context)
+
+            self.records.set(_get_job_key(key), job, self.expire)
+            self.records.set(_get_subscribers_key(key), {subscriber}, self.expire)
+            self.records.set(_get_job_owner_key(job), key, self.expire)
+
+        return _get_job_handle(job, subscriber)
+
+    def get_result(self, key, job_handle):
+        job, subscriber = _parse_job_handle(job_handle)
+        if subscriber not in self.records.get(_get_subscribers_key(key), set()):
+            return self.UNDEFINED
+
+        if not self.result_ready(key):
+            return self.UNDEFINED
+
+        # Every subscriber reads the result once, and the last one clears it
+        if self._unsubscribe(key, subscriber):
+            return self._read_result(key)
+
+        self._forget_job(key, job)
+        return super().get_result(key, job)
+
+    def job_running(self, job_handle):
+        job, subscriber = _parse_job_handle(job_handle)
+
+        key = self.records.get(_get_job_owner_key(job))
+        if key is None or subscriber not in self.records.get(_get_subscribers_key(key), set()):
+            return False
+
+        return super().job_running(job)
+
+    def terminate_job(self, job_handle):
+        if job_handle is None:
+            return
+
+        # A cancel only stops the job once no other subscriber is waiting for it
+        job, subscriber = _parse_job_handle(job_handle)
+        key = self.records.get(_get_job_owner_key(job))
+        if key is not None:
+            if self._unsubscribe(key, subscriber):
+                return
+            self._forget_job(key, job)
+            self.clear_cache_entry(self._make_progress_key(key))
+
+        super().terminate_job(job)
+
+    def _unsubscribe(self, key, subscriber) -> bool:
+        with self.records.lock(_get_lock_key(key)):
+            subscribers = self.records.get(_get_subscribers_key(key), set()) - {subscriber}
+            if subscribers:
+                self.records.set(_get_subscribers_key(key), subscribers, self.expire)
+            else:
+                self.records.delete(_get_subscribers_key(key))
+
+        return bool(subscribers)
+
+    def _forget_job(self, key, job):
+        self.records.delete(_get_job_key(key))
+        self.records.delete(_get_subscribers_key(key))
+        self.records.delete(_get_job_owner_key(job))
+
+
+class SessionJobManager(SessionJobs, DiskcacheManager):
+    # Jobs are processes of this host, so their records stay in a directory of this host
+    def __init__(self, cache, expire: int):
+        super().__init__(cache, expire=expire)
+        self.records = DiskcacheJobRecords(cache)
+
+    def _read_result(self, key):
+        return self.handle.get(key, self.UNDEFINED)
+
+
+class CelerySessionJobManager(SessionJobs, CeleryManager):
+    # Jobs are Celery tasks run by workers on any host, and their results and records live in Redis,
+    # so any web worker can poll, join or cancel a job that another one started
+    def __init__(self, celery_app, client, expire: int):
+        super().__init__(celery_app, expire=expire)
+        self.records = RedisJobRecords(client)
+
+    def _read_result(self, key):
+        return json.loads(self.handle.backend.get(key))
+
+
+class DiskcacheJobRecords:
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get(self, key: str, default=None):
+        return self.cache.get(key, default)
+
+    def set(self, key: str, value, expire: int):
+        self.cache.set(key, value, expire=expire)
+
+    def delete(self, key: str):
+        self.cache.delete(key)
+
+    def lock(self, key: str):
+        return diskcache.Lock(self.cache, key, expire=JOBS_CONFIG['JOBS_LOCK_TIMEOUT'])
+
+
+class RedisJobRecords:
+    def __init__(self, client, prefix: str = 'vcf_observer:job:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str, default=None):
+        value = self.client.get(self.prefix + key)
+        return default if value is None else pickle.loads(value)
+
+    def set(self, key: str, value, expire: int):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=expire)
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def lock(self, key: str):
+        return self.client.lock(self.prefix + key, timeout=JOBS_CONFIG['JOBS_LOCK_TIMEOUT'])
+
+
+def get_job_manager():
+    # Process ids only mean something on the host that started the job, so jobs only leave the host
+    # once Redis can queue them for Celery workers, see worker.py
+    if config.redis_url is None:
+        return SessionJobManager(diskcache.Cache(JOBS_CONFIG['JOBS_DIR']), JOBS_CONFIG['JOBS_DEFAULT_TIMEOUT'])
+
+    import celery
+    import redis
+
+    celery_app = celery.Celery(__name__, broker=config.redis_url, backend=config.redis_url)
+    celery_app.conf.update(
+        result_expires=JOBS_CONFIG['JOBS_DEFAULT_TIMEOUT'],
+        worker_prefetch_multiplier=1,
+        worker_concurrency=config.job_workers,
+    )
+    return CelerySessionJobManager(celery_app, redis.Redis.from_url(config.redis_url), JOBS_CONFIG['JOBS_DEFAULT_TIMEOUT'])
+
+
+def _get_job_handle(job, subscriber: str) -> str:
+    return f'{job}.{subscriber}'
+
+
+def _parse_job_handle(job_handle) -> (str, str):
+    # Neither process ids nor Celery task ids contain a dot, and Dash passes bare job ids back in
+    job, _, subscriber = str(job_handle).partition('.')
+    return job, subscriber
+
+
+def _get_job_key(key: str) -> str:
+    return key + '-job'
+
+
+def _get_subscribers_key(key: str) -> str:
+    return key + '-subscribers'
+
+
+def _get_lock_key(key: str) -> str:
+    return key + '-lock'
+
+
+def _get_job_owner_key(job) -> str:
+    return f'job-{job}-owner'
+
+
+job_manager = get_job_manager()
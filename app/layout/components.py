@@ -1,4 +1,5 @@
-from dash import dcc, html
+from dash import dash_table, dcc, html
+import dash_bootstrap_components as dbc
 
 from layout import styles
 
@@ -7,12 +8,23 @@ def button(id_value, text):
     return html.Button(text, id=id_value, style=styles.button, className='button')
 
 
-def download_button(id_value, text):
-    return html.Button(text, id=id_value, style=styles.download_button, className='button')
+def download_button(id_value, text, hidden=False):
+    return html.Button(text, id=id_value, style=styles.download_button, className='button', hidden=hidden)
 
 
-def download_button_secondary(id_value, text):
-    return html.Button(text, id=id_value, style=styles.download_button_secondary, className='button')
+def download_button_secondary(id_value, text, hidden=False):
+    return html.Button(text, id=id_value, style=styles.download_button_secondary, className='button', hidden=hidden)
+
+
+def download_iframe(id_value):
+    return html.Iframe(id=id_value, style=styles.download_iframe)
+
+
+def job_progress(div_id, bar_id, cancel_button_id):
+    return html.Div(id=div_id, hidden=True, children=[
+        dbc.Progress(id=bar_id, value=0, striped=True, animated=True, style=styles.job_progress),
+        button(cancel_button_id, 'Cancel'),
+    ])
 
 
 def dropdown_label(label):
@@ -62,3 +74,27 @@ def font_size_selector(id_value, default_value=12, div_id=''):
             )
         ],
     ))
+
+
+def paged_table(id_value, page_size):
+    return dash_table.DataTable(
+        id=id_value,
+        cell_selectable=False,
+        page_current=0,
+        page_size=page_size,
+        page_action='custom',
+        sort_action='custom',
+        sort_mode='multi',
+        sort_by=[],
+        filter_action='custom',
+        filter_query='',
+        style_cell={'textAlign': 'left'},
+        style_cell_conditional=[
+            {
+                'if': {'column_id': ''},
+                'textAlign': 'right',
+                'minWidth': 'fit-content',
+                'width': '1.2em',
+            },
+        ]
+    )
@@ -1,16 +1,24 @@
-from dash import html
+from dash import dcc, html
 
-from layout import ids, styles
+import config
+from callbacks.helpers import placeholder
+from layout import components, ids, styles
 
 analyze_display = (
     html.Div(id=ids.display_analyze__display__div, children=[
-        html.Div(id=ids.display_analyze__venn_display__div, style=styles.display_pane),
-        html.Div(id=ids.display_analyze__clustergram_display__div, style=styles.clustergram_display_pane),
-        html.Div(id=ids.display_analyze__prerec_display__div, style=styles.display_pane),
+        html.Div(id=ids.display_analyze__venn_display__div, style=styles.display_pane, children=placeholder),
+        html.Div(id=ids.display_analyze__clustergram_display__div, style=styles.clustergram_display_pane, children=placeholder),
+        html.Div(id=ids.display_analyze__prerec_display__div, style=styles.display_pane, children=placeholder),
         html.Div(id=ids.display_analyze__summary_display__div, children=[
             html.Div(id=ids.display_analyze__filename_summary_display__div, style=styles.display_pane),
             html.Div(id=ids.display_analyze__metadata_summary_display__div, style=styles.display_pane),
-            html.Div(id=ids.display_analyze__raw_summary_display__div, style=styles.display_pane)
+            html.Div(id=ids.display_analyze__raw_summary_display__div, style=styles.display_pane, children=[
+                html.Div(id=ids.display_analyze__raw_summary_notices__div),
+                html.Div(id=ids.display_analyze__raw_summary_table__div, hidden=True, children=[
+                    components.paged_table(ids.display_analyze__raw_summary__table, config.raw_table_page_size),
+                ]),
+                dcc.Store(id=ids.display_analyze__raw_summary_view__store),
+            ])
         ]),
     ])
 )
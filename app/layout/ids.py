@@ -7,6 +7,10 @@ display_analyze__summary_display__div = 'display_analyze__summary_display__div'
 display_analyze__filename_summary_display__div = 'display_analyze__filename_summary_display__div'
 display_analyze__metadata_summary_display__div = 'display_analyze__metadata_summary_display__div'
 display_analyze__raw_summary_display__div = 'display_analyze__raw_summary_display__div'
+display_analyze__raw_summary_notices__div = 'display_analyze__raw_summary_notices__div'
+display_analyze__raw_summary_table__div = 'display_analyze__raw_summary_table__div'
+display_analyze__raw_summary__table = 'display_analyze__raw_summary__table'
+display_analyze__raw_summary_view__store = 'display_analyze__raw_summary_view__store'
 
 # display/upload.py
 display_upload__display__div = 'display_upload__display__div'
@@ -35,6 +39,9 @@ navbar_analyze_clustergram__labeling_columns__dropdown = 'navbar_analyze_cluster
 navbar_analyze_clustergram__labeling_method__checklist = 'navbar_analyze_clustergram__labeling_method__checklist'
 navbar_analyze_clustergram__heatmap_colors__dropdown = 'navbar_analyze_clustergram__heatmap_colors__dropdown'
 navbar_analyze_clustergram__font_size__input = 'navbar_analyze_clustergram__font_size__input'
+navbar_analyze_clustergram__cancel__button = 'navbar_analyze_clustergram__cancel__button'
+navbar_analyze_clustergram__progress__div = 'navbar_analyze_clustergram__progress__div'
+navbar_analyze_clustergram__progress__bar = 'navbar_analyze_clustergram__progress__bar'
 
 # navbar/analyze/prerec.py
 navbar_analyze_prerec__submit__button = 'navbar_analyze_prerec__submit__button'
@@ -44,7 +51,11 @@ navbar_analyze_prerec__grouping_method__dropdown = 'navbar_analyze_prerec__group
 navbar_analyze_prerec__labeling_columns__dropdown = 'navbar_analyze_prerec__labeling_columns__dropdown'
 navbar_analyze_prerec__coloring_columns__dropdown = 'navbar_analyze_prerec__coloring_columns__dropdown'
 navbar_analyze_prerec__shaping_columns__dropdown = 'navbar_analyze_prerec__shaping_columns__dropdown'
+navbar_analyze_prerec__stratify_by__checklist = 'navbar_analyze_prerec__stratify_by__checklist'
 navbar_analyze_prerec__font_size__input = 'navbar_analyze_prerec__font_size__input'
+navbar_analyze_prerec__cancel__button = 'navbar_analyze_prerec__cancel__button'
+navbar_analyze_prerec__progress__div = 'navbar_analyze_prerec__progress__div'
+navbar_analyze_prerec__progress__bar = 'navbar_analyze_prerec__progress__bar'
 
 # navbar/analyze/summary.py
 navbar_analyze_summary__options__div = 'navbar_analyze_summary__options__div'
@@ -57,7 +68,7 @@ navbar_analyze_summary__filename_visualization__div = 'navbar_analyze_summary__f
 navbar_analyze_summary__font_size__div = 'navbar_analyze_summary__font_size__div'
 navbar_analyze_summary__font_size__input = 'navbar_analyze_summary__font_size__input'
 navbar_analyze_summary__filename_download__button = 'navbar_analyze_summary__filename_download__button'
-navbar_analyze_summary__filename_download__download = 'navbar_analyze_summary__filename_download__download'
+navbar_analyze_summary__filename_download__iframe = 'navbar_analyze_summary__filename_download__iframe'
 
 navbar_analyze_summary__metadata_submit__button = 'navbar_analyze_summary__metadata_submit__button'
 navbar_analyze_summary__metadata_options__div = 'navbar_analyze_summary__metadata_options__div'
@@ -66,13 +77,13 @@ navbar_analyze_summary__metadata_grouping_method__dropdown = 'navbar_analyze_sum
 navbar_analyze_summary__metadata_all__checklist = 'navbar_analyze_summary__metadata_all__checklist'
 navbar_analyze_summary__metadata_pivoting_columns__dropdown = 'navbar_analyze_summary__metadata_pivoting_columns__dropdown'
 navbar_analyze_summary__metadata_download__button = 'navbar_analyze_summary__metadata_download__button'
-navbar_analyze_summary__metadata_download__download = 'navbar_analyze_summary__metadata_download__download'
+navbar_analyze_summary__metadata_download__iframe = 'navbar_analyze_summary__metadata_download__iframe'
 
 navbar_analyze_summary__raw_submit__button = 'navbar_analyze_summary__raw_submit__button'
 navbar_analyze_summary__raw_options__div = 'navbar_analyze_summary__raw_options__div'
 navbar_analyze_summary__raw_type__dropdown = 'navbar_analyze_summary__raw_type__dropdown'
 navbar_analyze_summary__raw_download__button = 'navbar_analyze_summary__raw_download__button'
-navbar_analyze_summary__raw_download__download = 'navbar_analyze_summary__raw_download__download'
+navbar_analyze_summary__raw_download__iframe = 'navbar_analyze_summary__raw_download__iframe'
 
 # navbar/analyze/venn.py
 navbar_analyze_venn__submit__button = 'navbar_analyze_venn__submit__button'
@@ -81,10 +92,15 @@ navbar_analyze_venn__grouping_columns__dropdown = 'navbar_analyze_venn__grouping
 navbar_analyze_venn__grouping_method__dropdown = 'navbar_analyze_venn__grouping_method__dropdown'
 navbar_analyze_venn__prefer_pseudovenn__checklist = 'navbar_analyze_venn__prefer_pseudovenn__checklist'
 navbar_analyze_venn__font_size__input = 'navbar_analyze_venn__font_size__input'
+navbar_analyze_venn__cancel__button = 'navbar_analyze_venn__cancel__button'
+navbar_analyze_venn__progress__div = 'navbar_analyze_venn__progress__div'
+navbar_analyze_venn__progress__bar = 'navbar_analyze_venn__progress__bar'
 navbar_analyze_venn__figure_download__button = 'navbar_analyze_venn__figure_download__button'
 navbar_analyze_venn__figure_download__download = 'navbar_analyze_venn__figure_download__download'
 navbar_analyze_venn__sites_download__button = 'navbar_analyze_venn__sites_download__button'
-navbar_analyze_venn__sites_download__download = 'navbar_analyze_venn__sites_download__download'
+navbar_analyze_venn__sites_download__iframe = 'navbar_analyze_venn__sites_download__iframe'
+navbar_analyze_venn__regions_download__button = 'navbar_analyze_venn__regions_download__button'
+navbar_analyze_venn__regions_download__iframe = 'navbar_analyze_venn__regions_download__iframe'
 
 # navbar/navbar.py
 navbar_navbar__tabs__tabs = 'navbar_navbar__tabs__tabs'
@@ -106,6 +122,19 @@ navbar_upload__compare_set_valid__store = 'navbar_upload__compare_set_valid__sto
 navbar_upload__golden_set_valid__store = 'navbar_upload__golden_set_valid__store'
 navbar_upload__metadata_valid__store = 'navbar_upload__metadata_valid__store'
 navbar_upload__regions_valid__store = 'navbar_upload__regions_valid__store'
+navbar_upload__compare_set_parsed__store = 'navbar_upload__compare_set_parsed__store'
+navbar_upload__golden_set_parsed__store = 'navbar_upload__golden_set_parsed__store'
+navbar_upload__regions_parsed__store = 'navbar_upload__regions_parsed__store'
+navbar_upload__compare_set_staged__button = 'navbar_upload__compare_set_staged__button'
+navbar_upload__compare_set_staged__store = 'navbar_upload__compare_set_staged__store'
+navbar_upload__golden_set_staged__button = 'navbar_upload__golden_set_staged__button'
+navbar_upload__golden_set_staged__store = 'navbar_upload__golden_set_staged__store'
+navbar_upload__compare_set_append__checklist = 'navbar_upload__compare_set_append__checklist'
+navbar_upload__compare_set_remove__dropdown = 'navbar_upload__compare_set_remove__dropdown'
+navbar_upload__compare_set_remove__button = 'navbar_upload__compare_set_remove__button'
+navbar_upload__compare_set_progress__div = 'navbar_upload__compare_set_progress__div'
+navbar_upload__golden_set_progress__div = 'navbar_upload__golden_set_progress__div'
+navbar_upload__regions_progress__div = 'navbar_upload__regions_progress__div'
 
 # navbar/welcome.py
 navbar_upload__go_to_upload__button = 'navbar_upload__go_to_upload__button'
@@ -1,9 +1,8 @@
-import os
-
 from dash import dcc, html
 
 import config
-import data.file_readers
+import data.regions
+import data.variants
 from layout.navbar.analyze.venn import venn_options
 from layout.navbar.analyze.clustergram import clustergram_options
 from layout.navbar.analyze.prerec import prerec_options
@@ -16,7 +15,7 @@ BED_dict = {
     'custom': 'Genomic regions: Custom',
 }
 if not config.bundled_mode:
-    BED_dict = {**BED_dict, **{filename: filename[:-4] for filename in os.listdir('../BED Files') if filename[0] != '.'}}
+    BED_dict = {**BED_dict, **{filename: filename[:-4] for filename in data.regions.bundled_region_sets()}}
 
 analyze_tab = (
     dcc.Tab(label='Analyze', value='tab-analyze', style=styles.tab, selected_style=styles.tab_selected, children=[
@@ -79,7 +78,7 @@ analyze_tab = (
                     value='any',
                     options={
                         chrom.lower(): f'On chromosome: {chrom.replace("chr", "")}'
-                        for chrom in ['Any'] + data.file_readers.standard_chroms
+                        for chrom in ['Any'] + data.variants.standard_chroms
                     }
                 ),
                 dcc.Dropdown(
@@ -42,6 +42,11 @@ clustergram_options = (
         components.font_size_selector(ids.navbar_analyze_clustergram__font_size__input),
 
         components.button(ids.navbar_analyze_clustergram__submit__button, 'Submit'),
+        components.job_progress(
+            ids.navbar_analyze_clustergram__progress__div,
+            ids.navbar_analyze_clustergram__progress__bar,
+            ids.navbar_analyze_clustergram__cancel__button,
+        ),
     ])
 )
 
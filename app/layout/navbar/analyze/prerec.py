@@ -1,4 +1,4 @@
-from dash import html
+from dash import dcc, html
 from layout import components, ids, styles
 
 prerec_options = (
@@ -17,8 +17,26 @@ prerec_options = (
         components.dropdown_label('Set Point Shapes On'),
         components.multi_dropdown(ids.navbar_analyze_prerec__shaping_columns__dropdown),
 
+        components.dropdown_label('Stratify By'),
+        dcc.Checklist(
+            id=ids.navbar_analyze_prerec__stratify_by__checklist,
+            style=styles.checklist,
+            labelStyle={'display': 'block'},
+            options={
+                'variant_type': ' Variant type',
+                'chromosome': ' Chromosome',
+                'regions': ' Bundled genomic regions',
+            },
+            value=[]
+        ),
+
         components.font_size_selector(ids.navbar_analyze_prerec__font_size__input),
 
         components.button(ids.navbar_analyze_prerec__submit__button, 'Submit'),
+        components.job_progress(
+            ids.navbar_analyze_prerec__progress__div,
+            ids.navbar_analyze_prerec__progress__bar,
+            ids.navbar_analyze_prerec__cancel__button,
+        ),
     ])
 )
@@ -35,7 +35,7 @@ filename_div = (
         html.Div([
             components.download_button(ids.navbar_analyze_summary__filename_download__button, 'Download Data'),
 
-            dcc.Download(id=ids.navbar_analyze_summary__filename_download__download),
+            components.download_iframe(ids.navbar_analyze_summary__filename_download__iframe),
         ])
     ])
 )
@@ -61,7 +61,7 @@ metadata_div = (
         html.Div([
             components.download_button(ids.navbar_analyze_summary__metadata_download__button, 'Download Data'),
 
-            dcc.Download(id=ids.navbar_analyze_summary__metadata_download__download),
+            components.download_iframe(ids.navbar_analyze_summary__metadata_download__iframe),
         ])
     ])
 )
@@ -87,7 +87,7 @@ raw_div = (
         html.Div([
             components.download_button(ids.navbar_analyze_summary__raw_download__button, 'Download Data'),
 
-            dcc.Download(id=ids.navbar_analyze_summary__raw_download__download),
+            components.download_iframe(ids.navbar_analyze_summary__raw_download__iframe),
         ])
     ])
 )
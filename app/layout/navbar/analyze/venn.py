@@ -19,13 +19,20 @@ venn_options = (
         components.font_size_selector(ids.navbar_analyze_venn__font_size__input, default_value=8),
 
         components.button(ids.navbar_analyze_venn__submit__button, 'Submit'),
+        components.job_progress(
+            ids.navbar_analyze_venn__progress__div,
+            ids.navbar_analyze_venn__progress__bar,
+            ids.navbar_analyze_venn__cancel__button,
+        ),
 
         html.Div([
-            components.download_button(ids.navbar_analyze_venn__figure_download__button, 'Download Figure'),
-            components.download_button_secondary(ids.navbar_analyze_venn__sites_download__button, 'Download Common Sites'),
+            components.download_button(ids.navbar_analyze_venn__figure_download__button, 'Download Figure', hidden=True),
+            components.download_button_secondary(ids.navbar_analyze_venn__sites_download__button, 'Download Common Sites', hidden=True),
+            components.download_button_secondary(ids.navbar_analyze_venn__regions_download__button, 'Download All Regions', hidden=True),
 
             dcc.Download(id=ids.navbar_analyze_venn__figure_download__download),
-            dcc.Download(id=ids.navbar_analyze_venn__sites_download__download),
+            components.download_iframe(ids.navbar_analyze_venn__sites_download__iframe),
+            components.download_iframe(ids.navbar_analyze_venn__regions_download__iframe),
         ])
 
     ])
@@ -46,7 +46,7 @@ navbar = (
                 upload_tab,
                 analyze_tab,
             ]),
-            dcc.Store(ids.navbar_navbar__session_id__store),
+            dcc.Store(ids.navbar_navbar__session_id__store, storage_type='session'),
         ]
     )
 )
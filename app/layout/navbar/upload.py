@@ -3,6 +3,7 @@ from dash import dcc, html
 from layout import components, ids, styles
 import config
 from data.file_readers import read_local_files_as_b64
+from data.staging import stage_local_files
 
 
 def test_files(directory, filenames):
@@ -15,6 +16,13 @@ def test_files(directory, filenames):
     return None, None
 
 
+def staged_test_files(directory, filenames):
+    if config.auto_upload:
+        return stage_local_files(directory, filenames)
+
+    return None
+
+
 def upload_label(label):
     return html.H6(label)
 
@@ -27,33 +35,72 @@ def multi_upload(id_value, preloaded_files=(None, None)):
                 'Upload all files together'
             ]),
             multiple=True,
-            style={
-                'height': '60px',
-                'lineHeight': '60px',
-                'borderWidth': '1px',
-                'borderStyle': 'dashed',
-                'borderRadius': '5px',
-                'textAlign': 'center',
-                'margin': '10px',
-            },
+            style=styles.upload_zone,
             filename=preloaded_files[0],
             contents=preloaded_files[1],
         )
     )
 
 
+def chunked_upload(id_value, staged_button_id, staged_store_id, staged_files=None):
+    return (
+        html.Div([
+            html.Div(
+                'Upload all files together',
+                id=id_value,
+                className='chunked-upload',
+                style=styles.upload_zone,
+                **{'data-chunk-size': config.upload_chunk_bytes},
+            ),
+            html.Progress(hidden=True, style=styles.upload_zone_progress),
+            html.Button(id=staged_button_id, hidden=True),
+            dcc.Store(id=staged_store_id, data=staged_files),
+        ])
+    )
+
+
 def upload_result(id_value):
     return html.Div(id=id_value, style=styles.file_upload_result)
 
 
+def upload_progress(id_value):
+    return html.Div(id=id_value, style=styles.file_upload_progress)
+
+
 upload_tab = (
     dcc.Tab(label='Upload', value='tab-upload', style=styles.tab, selected_style=styles.tab_selected, children=[
         upload_label('Compare Set'),
-        multi_upload(ids.navbar_upload__compare_set__upload, preloaded_files=test_files(config.test_files_directory, config.compare_set_test_files)),
+        chunked_upload(
+            ids.navbar_upload__compare_set__upload,
+            ids.navbar_upload__compare_set_staged__button,
+            ids.navbar_upload__compare_set_staged__store,
+            staged_files=staged_test_files(config.test_files_directory, config.compare_set_test_files),
+        ),
+        dcc.Checklist(
+            id=ids.navbar_upload__compare_set_append__checklist,
+            style=styles.checklist,
+            options={'append': ' Add to uploaded files'},
+            value=[]
+        ),
+        dcc.Dropdown(
+            id=ids.navbar_upload__compare_set_remove__dropdown,
+            className='multi-dropdown',
+            style=styles.dropdown_with_related_element_below,
+            placeholder='Select files to remove',
+            multi=True,
+        ),
+        components.button(ids.navbar_upload__compare_set_remove__button, 'Remove'),
+        upload_progress(ids.navbar_upload__compare_set_progress__div),
         upload_result(ids.navbar_upload__compare_set_upload_result__div),
 
         upload_label('Golden Set'),
-        multi_upload(ids.navbar_upload__golden_set__upload, preloaded_files=test_files(config.test_files_directory, config.golden_set_test_files)),
+        chunked_upload(
+            ids.navbar_upload__golden_set__upload,
+            ids.navbar_upload__golden_set_staged__button,
+            ids.navbar_upload__golden_set_staged__store,
+            staged_files=staged_test_files(config.test_files_directory, config.golden_set_test_files),
+        ),
+        upload_progress(ids.navbar_upload__golden_set_progress__div),
         upload_result(ids.navbar_upload__golden_set_upload_result__div),
 
         upload_label('Metadata'),
@@ -62,6 +109,7 @@ upload_tab = (
 
         upload_label('Genomic Regions'),
         multi_upload(ids.navbar_upload__regions__upload, preloaded_files=test_files(config.test_files_directory, config.regions_test_files)),
+        upload_progress(ids.navbar_upload__regions_progress__div),
         upload_result(ids.navbar_upload__regions_upload_result__div),
 
         html.Div('*Max size per file: 200 MB', style={'fontSize': '0.8em', 'fontStyle': 'italic', 'paddingTOp': '1em'}),
@@ -71,6 +119,10 @@ upload_tab = (
         dcc.Store(id=ids.navbar_upload__metadata_valid__store, data='metadata_is_invalid'),
         dcc.Store(id=ids.navbar_upload__regions_valid__store, data='regions_is_invalid'),
 
+        dcc.Store(id=ids.navbar_upload__compare_set_parsed__store),
+        dcc.Store(id=ids.navbar_upload__golden_set_parsed__store),
+        dcc.Store(id=ids.navbar_upload__regions_parsed__store),
+
         components.button(ids.navbar_upload__go_to_analyze__button, 'Analyze >'),
     ])
 )
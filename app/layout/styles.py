@@ -20,6 +20,8 @@ download_button = {**button, 'marginRight': '1em'}
 download_button.pop('float')
 download_button_secondary = download_button.copy()
 download_button_secondary.pop('marginTop')
+download_iframe = {'display': 'none'}
+job_progress = {'clear': 'both', 'height': '1.5em'}
 tab = {
     'padding': '2px',
     'paddingTop': '6px',
@@ -48,6 +50,17 @@ file_upload_result = {
     'paddingBottom': '1em',
     'fontSize': '0.9em',
 }
+upload_zone = {
+    'height': '60px',
+    'lineHeight': '60px',
+    'borderWidth': '1px',
+    'borderStyle': 'dashed',
+    'borderRadius': '5px',
+    'textAlign': 'center',
+    'margin': '10px',
+}
+upload_zone_progress = {'width': 'calc(100% - 20px)', 'marginLeft': '10px', 'marginRight': '10px'}
+file_upload_progress = {**file_upload_result, 'paddingBottom': '0', 'fontStyle': 'italic'}
 demo_image = {
     'width': '30%',
     'alignSelf': 'center',
@@ -0,0 +1,36 @@
+import argparse
+
+from gunicorn.app.base import BaseApplication
+
+import config
+
+
+class ServerApplication(BaseApplication):
+    # Every worker imports the app itself, so none of them share the diskcache or Redis connections
+    # that are opened at import time
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app import app
+        return app.server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve VCF Observer with several worker processes.')
+    parser.add_argument('--workers', type=int, default=config.server_workers)
+    parser.add_argument('--bind', default=config.server_bind)
+    parser.add_argument('--timeout', type=int, default=300, help='seconds a request may run before its worker is restarted')
+    args = parser.parse_args()
+
+    ServerApplication({
+        'workers': args.workers,
+        'bind': args.bind,
+        'timeout': args.timeout,
+        'preload_app': False,
+    }).run()
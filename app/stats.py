@@ -0,0 +1,12 @@
+from flask import Blueprint, jsonify
+
+from data.parsed_files import get_parsed_files_stats
+from data.staging import get_staging_stats
+from data.store import get_store_stats
+
+stats_blueprint = Blueprint('stats', __name__, url_prefix='/stats')
+
+
+@stats_blueprint.route('/sessions', methods=['GET'])
+def get_session_store_stats():
+    return jsonify({**get_store_stats(), 'parsed_files': get_parsed_files_stats(), 'staged_uploads': get_staging_stats()})
@@ -0,0 +1,90 @@
+import errno
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import Blueprint, abort, jsonify, request
+
+import config
+from data.file_readers import ingest_staged_vcf_file
+from data.staging import get_staged_file_paths, get_staged_size, remove_expired_uploads, write_staged_chunk
+
+upload_blueprint = Blueprint('uploads', __name__, url_prefix='/upload')
+
+# Parses run in worker processes like every other ingest, so they never hold the GIL of the process
+# serving requests. The pool's processes are only started by the first completed upload
+parse_executor = ProcessPoolExecutor(max_workers=config.staged_parse_workers)
+
+
+@upload_blueprint.record_once
+def start_upload_sweep(_):
+    _sweep_expired_uploads()
+
+
+@upload_blueprint.before_request
+def limit_upload_chunk():
+    # Dash callbacks still carry whole files from the other upload zones, so the limit is only set here
+    if request.content_length is not None and request.content_length > config.upload_chunk_bytes:
+        abort(413)
+
+
+@upload_blueprint.route('/<upload_id>/<int:file_index>', methods=['GET'])
+def get_upload_status(upload_id: str, file_index: int):
+    try:
+        received = get_staged_size(request.headers.get('X-Session-Id'), upload_id, file_index)
+    except PermissionError:
+        abort(403)
+    except ValueError:
+        abort(400)
+
+    return jsonify(received=received)
+
+
+@upload_blueprint.route('/<upload_id>/<int:file_index>', methods=['PUT'])
+def put_upload_chunk(upload_id: str, file_index: int):
+    session_id = request.headers.get('X-Session-Id')
+    offset = request.args.get('offset', type=int)
+    file_size = request.args.get('size', type=int)
+    filename = request.args.get('filename', '')
+
+    if offset is None or file_size is None or not 0 <= file_size <= config.upload_max_file_bytes:
+        abort(400)
+
+    try:
+        received, complete = write_staged_chunk(session_id, upload_id, file_index, offset, file_size, request.stream)
+    except PermissionError:
+        abort(403)
+    except ValueError:
+        abort(400)
+    except OSError as e:
+        # A file that does not fit the staging budget is refused rather than retried
+        if e.errno != errno.ENOSPC:
+            raise
+        abort(413)
+
+    # Each file is parsed as soon as its last chunk arrives, while the remaining files are still
+    # uploading. Failures are left for the ingest to repeat and report, since nothing is waiting on this parse
+    if complete:
+        _submit_staged_parse(filename, get_staged_file_paths(session_id, upload_id, [file_index])[0])
+
+    return jsonify(received=received)
+
+
+def _submit_staged_parse(filename: str, file_path: str):
+    global parse_executor
+
+    try:
+        parse_executor.submit(ingest_staged_vcf_file, filename, file_path)
+    except BrokenProcessPool:
+        parse_executor = ProcessPoolExecutor(max_workers=config.staged_parse_workers)
+        parse_executor.submit(ingest_staged_vcf_file, filename, file_path)
+
+
+def _sweep_expired_uploads():
+    # Every worker sweeps on its own timer, and removing an upload twice gives its bytes back once
+    try:
+        remove_expired_uploads()
+    finally:
+        timer = threading.Timer(config.staged_uploads_sweep_seconds, _sweep_expired_uploads)
+        timer.daemon = True
+        timer.start()
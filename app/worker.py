@@ -0,0 +1,18 @@
+import argparse
+
+import config
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run VCF Observer background jobs queued in Redis.')
+    parser.add_argument('--concurrency', type=int, default=config.job_workers, help='jobs this worker runs at once')
+    args = parser.parse_args()
+
+    if config.redis_url is None:
+        parser.error('VCF_OBSERVER_REDIS_URL must be set, without it background jobs run in the web workers')
+
+    # Importing the app registers every background callback as a task of the job manager's Celery app
+    import app
+    from jobs import job_manager
+
+    job_manager.handle.worker_main(['worker', '--concurrency', str(args.concurrency), '--loglevel', 'INFO'])